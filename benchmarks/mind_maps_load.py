@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# pylint: disable=missing-docstring
+#
+# Load and save throughput of ``MindMaps`` for generated registries, e.g.:
+#
+#     python benchmarks/mind_maps_load.py --sizes 1000 100000 1000000
+#     python benchmarks/mind_maps_load.py --lazy
+#     python benchmarks/mind_maps_load.py --format binary
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from datetime import (datetime, timedelta, timezone)
+
+from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MindMaps,
+)
+
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+
+def write_registry(filepath, size):
+    start = datetime(2001, 6, 25, 17, 53, 33, 78, tzinfo=timezone.utc)
+    data = {}
+    for index in range(size):
+        created = start + timedelta(seconds=index)
+        # Every other entry without microseconds, as written by iThoughts
+        # shares that happened on a whole second.
+        modified = created + timedelta(days=1,
+                                       microseconds=(index % 2) * 250)
+        data['folder{}/map{}.itmz'.format(index % 100, index)] = {
+            'created': created.isoformat(),
+            'modified': modified.isoformat()}
+    with open(filepath, 'w') as handle:
+        json.dump(data, handle, sort_keys=True, indent=2)
+
+
+def best_time(repeat, function, *args, **kwargs):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def save_loaded(filepath, file_format, lazy):
+    # A first save after loading, every map is encoded.
+    mind_maps = MindMaps.loadf(filepath, lazy=lazy)
+    mind_maps.file_format = file_format
+    start = time.perf_counter()
+    mind_maps.dumpf()
+    return time.perf_counter() - start, mind_maps
+
+
+def resave(mind_maps, changes=10):
+    # A save after a few maps were shared, only those are encoded again.
+    for key in itertools.islice(mind_maps, 0, None, len(mind_maps) // changes):
+        mind_maps[key].touch()
+    start = time.perf_counter()
+    mind_maps.dumpf()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='best of this many loads, per size')
+    parser.add_argument('--lazy', action='store_true',
+                        help='only index the entries, as the map picker does')
+    parser.add_argument('--format', choices=(FORMAT_JSON, FORMAT_BINARY),
+                        default=FORMAT_JSON, help='registry file format')
+    args = parser.parse_args(argv)
+
+    print('{:>10} {:>10} {:>10} {:>10} {:>10} {:>14}'.format(
+        'entries', 'MiB', 'load s', 'save s', 'resave s', 'loaded/s'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            filepath = os.path.join(directory, 'mind_maps.json')
+            write_registry(filepath, size)
+            save = resave_time = None
+            for _ in range(args.repeat):
+                seconds, mind_maps = save_loaded(filepath, args.format,
+                                                 args.lazy)
+                save = seconds if save is None else min(save, seconds)
+                seconds = resave(mind_maps)
+                resave_time = (seconds if resave_time is None
+                               else min(resave_time, seconds))
+                del mind_maps
+            load = best_time(args.repeat, MindMaps.loadf, filepath,
+                             lazy=args.lazy)
+            print('{:>10} {:>10.1f} {:>10.3f} {:>10.3f} {:>10.3f} {:>14,.0f}'
+                  .format(size, os.path.getsize(filepath) / 1024 / 1024, load,
+                          save, resave_time, size / load))
+
+
+if __name__ == '__main__':
+    main()
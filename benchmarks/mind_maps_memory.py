@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# pylint: disable=missing-docstring
+#
+# Memory held per mind map, comparing ``MindMap`` with the previous layout of
+# a ``_data`` dict holding two ``datetime`` objects, e.g.:
+#
+#     python benchmarks/mind_maps_memory.py --size 1000000
+
+import argparse
+import gc
+import tracemalloc
+from datetime import (datetime, timedelta, timezone)
+
+from ithoughtsshare.mind_maps import MindMap
+
+
+class DictMindMap():
+    # pylint: disable=too-few-public-methods
+    # The layout ``MindMap`` had before it used ``__slots__``.
+    def __init__(self, created, modified):
+        self._data = {
+            'created': created,
+            'modified': modified}
+        self.on_touch = None
+
+
+def timestamps(size):
+    start = datetime(2001, 6, 25, 17, 53, 33, 78, tzinfo=timezone.utc)
+    for index in range(size):
+        created = start + timedelta(seconds=index)
+        yield created, created + timedelta(days=1, microseconds=index)
+
+
+def bytes_per_entry(factory, size):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        entries = [factory(created, modified)
+                   for created, modified in timestamps(size)]
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del entries
+    return current / size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    before = bytes_per_entry(DictMindMap, args.size)
+    after = bytes_per_entry(MindMap, args.size)
+    print('{:>10} {:>16} {:>16}'.format('entries', 'before B/entry',
+                                        'after B/entry'))
+    print('{:>10} {:>16.1f} {:>16.1f}'.format(args.size, before, after))
+    print('{:>10} {:>16.1f} MiB {:>12.1f} MiB'.format(
+        '', before * args.size / 1024 / 1024,
+        after * args.size / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
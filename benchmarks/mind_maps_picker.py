@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# pylint: disable=missing-docstring
+#
+# Time and memory for the map picker to open on a registry and list the
+# first screen of its root folder, with every map in the root folder (flat)
+# or spread over sub folders (nested).  The first open loads the registry
+# and builds its indexes, later ones reuse them from the process wide cache,
+# e.g.:
+#
+#     python benchmarks/mind_maps_picker.py --size 100000
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import (
+    MagicMock,
+    Mock,
+)
+
+from ithoughtsshare.ithoughts_notes import (
+    MapPicker,
+    StateData,
+)
+from ithoughtsshare.map_list import MapListDataSource
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_cache import clear_cache
+
+
+# Rows on the first screen of the picker.
+SCREEN = 12
+
+
+def generate_keys(size, nested):
+    for index in range(size):
+        if nested:
+            yield '/Folder {}/Map {}'.format(index % 100, index)
+        else:
+            yield '/Map {}'.format(index)
+
+
+def write_registry(filepath, size, nested):
+    mind_maps = MindMaps(filepath=filepath)
+    mind_map = MindMap.create()
+    mind_maps.add_all((key, MindMap(mind_map.created, mind_map.modified))
+                      for key in generate_keys(size, nested))
+    mind_maps.dumpf()
+
+
+def open_picker(state_data):
+    widgets = {name: Mock() for name in ('ok', 'cancel', 'add', 'search',
+                                         'map_list_table_view')}
+    view = MagicMock()
+    view.__getitem__.side_effect = widgets.__getitem__
+    picker = MapPicker(view=view, list_data_source=MapListDataSource(),
+                       form_dialog=Mock())
+    picker.handle(state_data, Mock())
+    source = picker.list_data_source
+    count = source.tableview_number_of_rows(None, 0)
+    return count, [source.item(row) for row in range(min(count, SCREEN))]
+
+
+def timed_opens(state_data):
+    # Times of the first open and a reopen, then their peak memory in a
+    # second run, as tracing slows Python down.
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        count, _ = open_picker(state_data)
+        times.append(time.perf_counter() - start)
+    clear_cache()
+    peaks = []
+    for _ in range(2):
+        tracemalloc.start()
+        open_picker(state_data)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    clear_cache()
+    return count, times, peaks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for nested in (False, True):
+            state_data = StateData()
+            state_data.initializer = {'mind_maps_file': os.path.join(
+                directory, 'nested.json' if nested else 'flat.json')}
+            write_registry(state_data.initializer['mind_maps_file'],
+                           args.size, nested)
+            count, times, peaks = timed_opens(state_data)
+            for label, elapsed, peak in zip(('first', 'reopen'), times,
+                                            peaks):
+                print('{:>6} {:>6}: {} rows, first screen in {:9.2f} ms, '
+                      'peak {:10.1f} KiB'.format(
+                          'nested' if nested else 'flat', label, count,
+                          elapsed * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# pylint: disable=missing-docstring
+#
+# Time to build the map picker's search index and to run each keystroke of
+# a few queries against it, e.g.:
+#
+#     python benchmarks/mind_maps_search.py --size 100000
+
+import argparse
+import random
+import time
+
+from ithoughtsshare.mind_maps_search import PathSearch
+
+
+WORDS = ('Notes', 'Work', 'Project', 'Reading', 'Inbox', 'Ideas', 'Research',
+         'Python', 'Travel', 'Recipes', 'Meeting', 'Archive', 'Books',
+         'Health', 'Finance', 'Garden', 'Music', 'Photos', 'Family',
+         'Learning')
+QUERIES = ('notes inbox', 'projct', 'travel 1234', 'py')
+
+
+def generate_keys(size, seed=0):
+    generator = random.Random(seed)
+    for index in range(size):
+        folders = generator.sample(WORDS, generator.randint(1, 4))
+        yield '/{} {}'.format('/'.join(folders), index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    keys = list(generate_keys(args.size))
+    start = time.perf_counter()
+    search = PathSearch(keys)
+    print('build {:.3f}s for {} keys'.format(time.perf_counter() - start,
+                                             len(keys)))
+    for query in QUERIES:
+        slowest = 0.0
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            results = search.search(query[:length])
+            slowest = max(slowest, time.perf_counter() - start)
+        print('{!r:>16}: slowest keystroke {:6.2f} ms, top {!r}'.format(
+            query, slowest * 1000, results[0] if results else None))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 # pylint: disable=missing-docstring
-from ithoughtsshare.ithoughts_notes import StateDispatcher
 
 
-def run():
-    dispatcher = StateDispatcher()
+def run(trace_file=None, trace_memory=False):
+    # Imported here so that importing the package stays cheap.
+    # pylint: disable=import-outside-toplevel
+    from ithoughtsshare.instrumentation import Tracer
+    from ithoughtsshare.ithoughts_notes import StateDispatcher
+    tracer = (Tracer(filepath=trace_file, trace_memory=trace_memory)
+              if trace_file else None)
+    dispatcher = StateDispatcher(tracer=tracer)
     dispatcher.next_state('FORWARD')
@@ -0,0 +1,81 @@
+# pylint: disable=missing-docstring
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging as log
+import sys
+
+from ithoughtsshare.ithoughts_notes import (
+    build_ithoughts_url,
+    dispatch,
+)
+from ithoughtsshare.page_cache import PageCache
+from ithoughtsshare.web_page import WebPageNote
+
+
+DEFAULT_WORKERS = 8
+
+BatchResult = namedtuple('BatchResult', ('url', 'ithoughts_url', 'error'))
+
+
+def share_urls(urls, map_path, max_workers=DEFAULT_WORKERS, cache=None,
+               session=None):
+    # Results come back in the order of ``urls``, as soon as each one and
+    # all of those before it are done.  A failing URL yields a result with
+    # ``error`` set instead of stopping the batch.
+    def share(url):
+        try:
+            note = WebPageNote.from_url(url, cache=cache, session=session)
+        except Exception as exception:  # pylint: disable=broad-except
+            return BatchResult(url, None, exception)
+        ithoughts_url = build_ithoughts_url(
+            map_path, note.title, note.url, note.body, create=False)
+        return BatchResult(url, ithoughts_url, None)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(share, urls)
+
+
+def read_urls(handle):
+    for line in handle:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Create iThoughts notes for a list of URLs.')
+    parser.add_argument('map_path',
+                        help='mind map to add the notes to, e.g. /Notes/Inbox')
+    parser.add_argument('urls', nargs='?', type=argparse.FileType('r'),
+                        default=sys.stdin,
+                        help='file with one URL per line (default: stdin)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of concurrent fetches')
+    parser.add_argument('--cache-dir',
+                        help='directory of the page cache to use')
+    parser.add_argument('--dispatch', action='store_true',
+                        help='open each note in iThoughts instead of '
+                             'printing its URL')
+    args = parser.parse_args(argv)
+
+    cache = PageCache(args.cache_dir) if args.cache_dir else None
+    failures = 0
+    with args.urls:
+        for result in share_urls(list(read_urls(args.urls)), args.map_path,
+                                 max_workers=args.workers, cache=cache):
+            if result.error is not None:
+                failures += 1
+                log.error('Failed to share %s: %s', result.url, result.error)
+            elif args.dispatch:
+                dispatch(result.ithoughts_url)
+            else:
+                print(result.ithoughts_url)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    log.basicConfig(level=log.INFO)
+    sys.exit(main())
@@ -0,0 +1,68 @@
+# pylint: disable=missing-docstring
+
+import threading
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 4
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_LOCK = threading.Lock()
+_SESSION = None
+_SETTINGS = {}
+
+
+def create_session(retries=DEFAULT_RETRIES,
+                   backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                   pool_connections=DEFAULT_POOL_CONNECTIONS,
+                   pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    # ``pool_connections`` is the number of hosts kept warm and
+    # ``pool_maxsize`` the number of connections per host.  Blocking on the
+    # pool caps concurrent connections to a single host at that size.
+    # ``requests`` is by far the most expensive import of the package, so it
+    # is only loaded once a session is needed.
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(total=retries, connect=retries, read=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUSES,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=retry,
+                          pool_block=True)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    # pylint: disable=global-statement
+    global _SESSION
+    with _LOCK:
+        if _SESSION is None:
+            _SESSION = create_session(**_SETTINGS)
+        return _SESSION
+
+
+def configure_session(**settings):
+    # Settings apply to the shared session from the next ``get_session()``
+    # on; connections of the current one are closed.
+    with _LOCK:
+        _SETTINGS.clear()
+        _SETTINGS.update(settings)
+    close_session()
+
+
+def close_session():
+    # pylint: disable=global-statement
+    global _SESSION
+    with _LOCK:
+        session, _SESSION = _SESSION, None
+    if session is not None:
+        session.close()
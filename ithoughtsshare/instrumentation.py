@@ -0,0 +1,113 @@
+# pylint: disable=missing-docstring
+
+import contextlib
+import json
+import time
+import tracemalloc
+
+
+class NullTracer():
+    # Default tracer, records nothing.
+    def enter_state(self, state):
+        pass
+
+    @contextlib.contextmanager
+    def span(self, name):
+        # pylint: disable=unused-argument
+        yield
+
+    def add(self, name, seconds):
+        pass
+
+    def finish(self):
+        pass
+
+
+class Tracer(NullTracer):
+    # Records, for each state the workflow goes through, the wall time spent
+    # in it (user think time included), the time spent in named sub-steps
+    # and, with ``trace_memory``, the ``tracemalloc`` peak.
+    def __init__(self, filepath=None, trace_memory=False,
+                 clock=time.perf_counter):
+        super().__init__()
+        self._filepath = filepath
+        self._trace_memory = trace_memory
+        self._clock = clock
+        self._origin = clock()
+        self._states = []
+        self._current = None
+        self._started_tracemalloc = False
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    @property
+    def states(self):
+        return self._states
+
+    def enter_state(self, state):
+        now = self._clock()
+        self._leave_state(now)
+        if self._trace_memory:
+            self._reset_memory_peak()
+        self._current = {
+            'state': state,
+            'start': now - self._origin,
+            'seconds': None,
+            'steps': {}}
+        self._states.append(self._current)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, self._clock() - start)
+
+    def add(self, name, seconds):
+        if self._current is None:
+            return
+        step = self._current['steps'].setdefault(
+            name, {'seconds': 0.0, 'count': 0})
+        step['seconds'] += seconds
+        step['count'] += 1
+
+    def finish(self):
+        self._leave_state(self._clock())
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self._filepath:
+            self.dumpf()
+
+    def trace(self):
+        return {
+            'seconds': sum(state['seconds'] or 0.0 for state in self._states),
+            'states': self._states}
+
+    def dumpf(self, filepath=None):
+        filepath = filepath if filepath is not None else self._filepath
+        with open(filepath, 'w') as handle:
+            json.dump(self.trace(), handle, indent=2)
+
+    def dumps(self):
+        return json.dumps(self.trace(), indent=2)
+
+    def _leave_state(self, now):
+        if self._current is None:
+            return
+        self._current['seconds'] = now - self._origin - self._current['start']
+        if self._trace_memory and tracemalloc.is_tracing():
+            self._current['memory_peak'] = tracemalloc.get_traced_memory()[1]
+        self._current = None
+
+    def _reset_memory_peak(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.clear_traces()
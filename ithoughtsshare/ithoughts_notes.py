@@ -1,14 +1,24 @@
 # pylint: disable=missing-docstring
 
 from urllib import parse
-import webbrowser
+import collections
 import logging as log
 import os
 
-import requests
-from bs4 import BeautifulSoup
-
-from ithoughtsshare.mind_maps import MindMaps
+from ithoughtsshare.instrumentation import NullTracer
+from ithoughtsshare.map_list import (
+    FolderRows,
+    MapListDataSource,
+)
+from ithoughtsshare.mind_maps_cache import (
+    get_index,
+    get_mind_maps,
+    is_cached,
+)
+from ithoughtsshare.mind_maps_index import PathIndex
+from ithoughtsshare.mind_maps_recent import RecentMaps
+from ithoughtsshare.mind_maps_search import PathSearch
+from ithoughtsshare.mind_maps_sharded import is_sharded
 
 
 DEFAULT_CONFIG_DIR = os.path.abspath(
@@ -77,13 +87,17 @@ class Canceler(StateHandler): pass  # NOQA
 
 
 class StateData():
-    # pylint: disable=too-few-public-methods
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
     def __init__(self):
         self.initializer = None
         self.url_editor = None
         self.note_editor = None
         self.map_picker = None
         self.ithoughts_dispatcher = None
+        self.prefetch = None
+        # Registry loaded by the map picker, for later states to reuse.
+        self.mind_maps = None
+        self.tracer = NullTracer()
 
 
 class Initializer(StateHandler):
@@ -91,9 +105,11 @@ class Initializer(StateHandler):
         super().handle(state_data, callback)
         self.create_dir_if_missing(DEFAULT_CONFIG_DIR)
         state_data.initializer = {
-            'mind_maps_file': os.path.join(DEFAULT_CONFIG_DIR,
-                                           'mind_maps.json'),
+            'mind_maps_file': mind_maps_path(DEFAULT_CONFIG_DIR),
+            'page_cache_dir': os.path.join(DEFAULT_CONFIG_DIR, 'page_cache'),
             'input_url': get_input_url()}
+        # The page is fetched while a map is picked and the URL reviewed.
+        state_data.prefetch = start_prefetch(state_data.initializer)
         callback('FORWARD')
 
     def create_dir_if_missing(self, directory):
@@ -137,12 +153,38 @@ class NoteEditor(UiPanelStateHandler):
     def handle(self, state_data, callback):
         super().handle(state_data, callback)
         state_data.note_editor = None
-        web_note = WebPageNote.from_url(state_data.url_editor['url'])
+        url = state_data.url_editor['url']
+        tracer = state_data.tracer
+        with tracer.span('prefetch_wait'):
+            web_note = self.prefetched_note(state_data, url)
+        # Steps of a prefetch overlapped with earlier states.
+        prefix = 'prefetch_' if web_note is not None else ''
+        if web_note is None:
+            from ithoughtsshare.page_cache import PageCache
+            from ithoughtsshare.web_page import WebPageNote
+            page_cache = PageCache(state_data.initializer['page_cache_dir'])
+            web_note = WebPageNote.from_url(url, cache=page_cache)
+        for step, seconds in web_note.timings.items():
+            tracer.add(prefix + step, seconds)
         self.view['title'].text = web_note.title
         self.view['url'].text = web_note.url
         self.view['body'].text = web_note.body
         self.view.present('sheet')
 
+    def prefetched_note(self, state_data, url):
+        prefetch, state_data.prefetch = state_data.prefetch, None
+        if prefetch is None:
+            return None
+        if prefetch.url != url:
+            self.log.info('URL changed, discarding prefetch: %s', prefetch.url)
+            prefetch.cancel()
+            return None
+        try:
+            return prefetch.result()
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception('Prefetch failed, fetching again: %s', url)
+            return None
+
     def handle_ok(self, sender, state_data):
         state_data.note_editor = {
             'title': self.view['title'].text,
@@ -151,6 +193,10 @@ class NoteEditor(UiPanelStateHandler):
 
 
 class MapPicker(UiPanelStateHandler):
+    # pylint: disable=too-many-instance-attributes
+    # Number of recently used maps listed above the root folder.
+    recent_count = 5
+
     def __init__(self, view=None, list_data_source=None, mind_maps=None,
                  form_dialog=None):
         # pylint: disable=import-error,no-member
@@ -158,8 +204,7 @@ class MapPicker(UiPanelStateHandler):
             import ui
             view = ui.load_view('map_picker')
         if not list_data_source:
-            import ui
-            list_data_source = ui.ListDataSource(list())
+            list_data_source = MapListDataSource()
         if not form_dialog:
             import dialogs
             form_dialog = dialogs.form_dialog
@@ -173,6 +218,12 @@ class MapPicker(UiPanelStateHandler):
         self.mind_maps = mind_maps
         self.form_dialog = form_dialog
         self.capitalization = capitalization
+        self.path_index = None
+        self.search_index = None
+        self.recent_maps = None
+        # Registry the indexes above are of.
+        self.indexed = None
+        self.folder = ''
 
     def handle(self, state_data, callback):
         super().handle(state_data, callback)
@@ -183,17 +234,66 @@ class MapPicker(UiPanelStateHandler):
         self.view['map_list_table_view'].delegate = self.list_data_source
         self.view['ok'].enabled = False
         self.view['add'].action = self.add_callback(state_data, callback)
+        self.view['search'].delegate = self
+        self.view['search'].text = ''
 
         # Populate list
         if not self.mind_maps:
             mind_maps_file = state_data.initializer['mind_maps_file']
-            self.mind_maps = MindMaps.loadf(mind_maps_file, create=True)
-        self.list_data_source.items = self.mind_maps
+            with state_data.tracer.span('map_load'):
+                self.mind_maps = get_mind_maps(mind_maps_file)
+        state_data.mind_maps = self.mind_maps
+        with state_data.tracer.span('map_index'):
+            self.index_mind_maps()
+        self.show_folder('')
         self.view.present('sheet')
 
+    def index_mind_maps(self):
+        # The indexes of a cached registry are shared by every picker, and
+        # only built the first time one is opened.
+        if self.indexed is self.mind_maps:
+            return
+        if self.indexed is not None and not is_cached(self.indexed):
+            for index in (self.path_index, self.search_index,
+                          self.recent_maps):
+                index.close()
+        self.path_index = get_index(self.mind_maps, PathIndex)
+        self.search_index = get_index(self.mind_maps, PathSearch)
+        self.recent_maps = get_index(self.mind_maps, RecentMaps)
+        self.indexed = self.mind_maps
+
+    def textfield_did_change(self, textfield):
+        # Called by ``ui.TextField`` on every keystroke in the search field.
+        self.search(textfield.text)
+
+    def search(self, query):
+        if not query.strip():
+            self.show_folder(self.folder)
+            return
+        self.list_data_source.items = [
+            {'title': key, 'map_path': key}
+            for key in self.search_index.search(query)]
+        self.view['ok'].enabled = False
+
+    def show_folder(self, folder):
+        self.folder = folder
+        self.list_data_source.items = self.folder_rows(folder)
+        self.view['ok'].enabled = False
+
+    def folder_rows(self, folder):
+        # Sub folders open on selection, ``..`` goes back up.  Rows are only
+        # built as the table view shows them.
+        head = []
+        if folder:
+            head.append({'title': '..', 'folder': folder.rpartition('/')[0]})
+        elif self.recent_maps is not None:
+            head.extend({'title': key, 'map_path': key} for key
+                        in self.recent_maps.most_recent(self.recent_count))
+        return FolderRows(self.path_index, folder, head)
+
     def handle_ok(self, sender, state_data):
         index = self.list_data_source.selected_row
-        map_path = self.list_data_source.items[index]
+        map_path = self.list_data_source.items[index]['map_path']
         self.log.info('Item selected: %s', map_path)
         state_data.map_picker = {'map_path': map_path}
 
@@ -210,6 +310,10 @@ class MapPicker(UiPanelStateHandler):
     def select(self, sender):
         self.log.info('Picked = %s', sender.selected_row)
         if sender.selected_row > -1:
+            item = sender.items[sender.selected_row]
+            if 'folder' in item:
+                self.show_folder(item['folder'])
+                return
             self.view['ok'].enabled = True
         else:
             self.view['ok'].enabled = False
@@ -237,8 +341,10 @@ class MapAdder(UiPanelStateHandler):
     def handle_ok(self, sender, state_data):
         map_path = self.view['new_path'].text
         self.log.info('Creating mind map: %s', map_path)
+        tracer = state_data.tracer
         self.add_to_mind_maps(state_data.initializer['mind_maps_file'],
-                              map_path)
+                              map_path, tracer=tracer,
+                              mind_maps=state_data.mind_maps)
 
         url = 'https://github.com/pedrohdz/ios-ithoughs-share'
         body = ('## Mind Map Inbox\n\n'
@@ -248,30 +354,54 @@ class MapAdder(UiPanelStateHandler):
                 '_Inbox for notes created by [ios-ithoughs-share]({})_.'
                 .format(url))
         title = '# Mind Map Inbox'
-        ithoughs_url = build_ithoughts_url(map_path, title, url, body,
-                                           create=True)
-        dispatch(ithoughs_url)
-
-    def add_to_mind_maps(self, mind_maps_file, map_path):
+        with tracer.span('url_build'):
+            ithoughs_url = build_ithoughts_url(map_path, title, url, body,
+                                               create=True)
+        with tracer.span('dispatch'):
+            dispatch(ithoughs_url)
+
+    def add_to_mind_maps(self, mind_maps_file, map_path, tracer=None,
+                         mind_maps=None):
+        # Adding through an already loaded registry keeps its indexes, like
+        # the map picker's, up to date.  Otherwise the registry comes from
+        # the process wide cache, which only reads the file if it changed.
+        tracer = tracer if tracer else NullTracer()
         self.log.info('Adding "%s" to "%s"', map_path, mind_maps_file)
-        mind_maps = MindMaps.loadf(mind_maps_file, create=True)
-        mind_maps.add(map_path)
-        mind_maps.dumpf()
+        if mind_maps is None or mind_maps.filepath != mind_maps_file:
+            with tracer.span('map_load'):
+                mind_maps = get_mind_maps(mind_maps_file)
+        with tracer.span('map_save'):
+            mind_maps.add(map_path)
 
 
 class IThoughtsDispatcher(StateHandler):
     def handle(self, state_data, callback):
         super().handle(state_data, callback)
         map_path = state_data.map_picker['map_path']
-        ithoughs_url = build_ithoughts_url(
-            map_path,
-            state_data.note_editor['title'],
-            state_data.note_editor['url'],
-            state_data.note_editor['body'],
-            create=False)
-        dispatch(ithoughs_url)
+        with state_data.tracer.span('url_build'):
+            ithoughs_url = build_ithoughts_url(
+                map_path,
+                state_data.note_editor['title'],
+                state_data.note_editor['url'],
+                state_data.note_editor['body'],
+                create=False)
+        with state_data.tracer.span('dispatch'):
+            dispatch(ithoughs_url)
+        with state_data.tracer.span('map_touch'):
+            self.touch_map(state_data, map_path)
         callback('FORWARD')
 
+    def touch_map(self, state_data, map_path):
+        # Marks the map as used, a journal append rather than a rewrite of
+        # the registry.
+        mind_maps = state_data.mind_maps
+        if mind_maps is None:
+            mind_maps = get_mind_maps(state_data.initializer['mind_maps_file'])
+        try:
+            mind_maps[map_path].touch()
+        except KeyError:
+            self.log.warning('Not in the mind maps registry: %s', map_path)
+
 
 class _StateMetaClass(type):
     @property
@@ -317,6 +447,7 @@ class State(metaclass=_StateMetaClass):
 
 
 class StateDispatcher():
+    # pylint: disable=too-many-instance-attributes
     state_map = {
         State.start: {
             'FORWARD': State.initialize},
@@ -337,6 +468,17 @@ class StateDispatcher():
             'FORWARD': State.end},
     }
 
+    handler_factories = {
+        State.initialize: Initializer,
+        State.edit_url: UrlEditor,
+        State.edit_note: NoteEditor,
+        State.pick_mind_map: MapPicker,
+        State.add_mind_map: MapAdder,
+        State.create_ithoughs_note: IThoughtsDispatcher,
+        State.end: Finisher,
+        State.cancel: Canceler,
+    }
+
     def __init__(self,
                  state_data=None,
                  initializer=None,
@@ -346,54 +488,47 @@ class StateDispatcher():
                  map_adder=None,
                  ithoughts_dispatcher=None,
                  finisher=None,
-                 canceler=None):
+                 canceler=None,
+                 tracer=None):
         # pylint: disable=too-many-arguments
         self._log = log.getLogger(type(self).__name__)
 
         if not state_data:
             state_data = StateData()
 
-        if not initializer:
-            initializer = Initializer()
-
-        if not url_editor:
-            url_editor = UrlEditor()
-
-        if not note_editor:
-            note_editor = NoteEditor()
-
-        if not map_picker:
-            map_picker = MapPicker()
-
-        if not map_adder:
-            map_adder = MapAdder()
-
-        if not ithoughts_dispatcher:
-            ithoughts_dispatcher = IThoughtsDispatcher()
+        if not tracer:
+            tracer = NullTracer()
+        state_data.tracer = tracer
 
-        if not finisher:
-            finisher = Finisher()
-
-        if not canceler:
-            canceler = Canceler()
-
-        self._handlers = {
-            State.edit_url: url_editor,
+        # Handlers passed in are used as is, the others are created by their
+        # factory the first time their state is entered.
+        handlers = {
             State.initialize: initializer,
+            State.edit_url: url_editor,
             State.edit_note: note_editor,
             State.pick_mind_map: map_picker,
             State.add_mind_map: map_adder,
             State.create_ithoughs_note: ithoughts_dispatcher,
             State.end: finisher,
             State.cancel: canceler}
+        self._handlers = {state: handler
+                          for state, handler in handlers.items() if handler}
+        self._factories = dict(StateDispatcher.handler_factories)
         self._state_data = state_data
+        self._tracer = tracer
         self._current_state = State.start
         self._canceled = False
+        self._steps = collections.deque()
+        self._running = False
 
     @property
     def log(self):
         return self._log
 
+    @property
+    def tracer(self):
+        return self._tracer
+
     @property
     def current_state(self):
         return self._current_state
@@ -406,16 +541,81 @@ class StateDispatcher():
     def is_canceled(self):
         return self._canceled
 
+    def register_factory(self, state, factory):
+        self._factories[state] = factory
+        self._handlers.pop(state, None)
+
+    def handler(self, state):
+        try:
+            return self._handlers[state]
+        except KeyError:
+            self.log.info('Creating handler for "%s"', state)
+            handler = self._handlers[state] = self._factories[state]()
+            return handler
+
     def next_state(self, step):
+        # Handlers call this from within ``handle()``, so instead of handling
+        # the new state right away the step is queued and picked up by the
+        # loop below once the running handler returns.  That keeps the stack
+        # depth constant however many transitions a workflow goes through.
+        self._steps.append(step)
+        if self._running:
+            return
+        self._running = True
+        try:
+            while self._steps:
+                self._transition(self._steps.popleft())
+        except BaseException:
+            self._steps.clear()
+            raise
+        finally:
+            self._running = False
+
+    def run_until_end(self, step='FORWARD'):
+        # For flows whose handlers all call back synchronously, i.e. that do
+        # not wait on a UI panel.
+        self.next_state(step)
+        if not (self.is_end or self.is_canceled):
+            raise RuntimeError(
+                'Stopped in "{}", waiting on its handler'
+                .format(self.current_state))
+        return self.current_state
+
+    def _transition(self, step):
         last_state = self.current_state
         if step != 'CANCEL':
-            new_state = StateDispatcher.state_map[last_state][step]
+            new_state = self.state_map[last_state][step]
         else:
             new_state = State.cancel
             self._canceled = True
         self.log.info('Changing from "%s" to "%s"', last_state, new_state)
         self._current_state = new_state
-        self._handlers[new_state].handle(self._state_data, self.next_state)
+        self.tracer.enter_state(new_state)
+        with self.tracer.span('handler_setup'):
+            handler = self.handler(new_state)
+        with self.tracer.span('handle'):
+            handler.handle(self._state_data, self.next_state)
+        if new_state in (State.end, State.cancel):
+            self.tracer.finish()
+
+
+def mind_maps_path(config_dir):
+    # The sharded registry if there is one, see ``mind_maps_sharded``.
+    sharded = os.path.join(config_dir, 'mind_maps')
+    if is_sharded(sharded):
+        return sharded
+    return os.path.join(config_dir, 'mind_maps.json')
+
+
+def start_prefetch(initializer):
+    # The networking and parsing libraries are only loaded on the prefetch
+    # thread, see ``http_session``.
+    from ithoughtsshare.page_cache import PageCache
+    from ithoughtsshare.web_page import PagePrefetch
+    log.getLogger(__name__).info('Prefetching: %s', initializer['input_url'])
+    return PagePrefetch.start(
+        initializer['input_url'],
+        cache=PageCache(initializer['page_cache_dir']))
 
 
 def get_input_url():
@@ -448,48 +648,10 @@ def build_ithoughts_url(mind_map_path, title, url, body, create):
 def dispatch(url):
     try:
         # pylint: disable=bare-except
+        import webbrowser
         webbrowser.open(url)
     except:  # NOQA
         # pylint: disable=import-error
         from objc_util import UIApplication, nsurl
         app = UIApplication.sharedApplication()
         app.openURL_(nsurl(url))
-
-
-class WebPageNote():
-    def __init__(self, url, html):
-        self._url = url
-        self._soup = BeautifulSoup(html, 'html.parser')
-
-    @classmethod
-    def from_url(cls, url):
-        return cls(url, requests.get(url).text)
-
-    @property
-    def url(self):
-        return self._url
-
-    @property
-    def raw_title(self):
-        return self._soup.title.text.strip(' \t\n\r')
-
-    @property
-    def title(self):
-        return '# {}'.format(self.raw_title)
-
-    @property
-    def body(self):
-        description = ''
-        blocks_processed = 0
-        for block in self._soup.find_all('p'):
-            text = block.text.strip(' \t\n\r')
-            if not text:
-                continue
-            description += (
-                ('\n\n' if description else '')
-                + text)
-            blocks_processed += 1
-            if blocks_processed > 4:
-                break
-        return ('## {}\n\n{}\n\n_[quick link]({})_'
-                .format(self.raw_title, description, self.url))
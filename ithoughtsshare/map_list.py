@@ -0,0 +1,168 @@
+# pylint: disable=missing-docstring
+
+import bisect
+import collections
+import itertools
+
+
+# Rows built at a time by ``MapListDataSource``, and how many of those pages
+# it keeps around.
+PAGE_SIZE = 50
+MAX_PAGES = 8
+# Rows between the positions ``FolderRows`` records while counting.
+CURSOR_STEP = 200
+
+
+class MapListDataSource():
+    # Data source and delegate for the map picker's ``ui.TableView``.  Unlike
+    # ``ui.ListDataSource`` it builds no cells up front, ``items`` can be any
+    # sequence that supports ``len()`` and slicing, such as ``FolderRows``,
+    # and its rows are only sliced out a page at a time as they are shown.
+    def __init__(self, items=()):
+        self._items = items
+        self._pages = collections.OrderedDict()
+        self.tableview = None
+        self.selected_row = -1
+        self.action = None
+        self.delete_enabled = False
+
+    @property
+    def items(self):
+        return self._items
+
+    @items.setter
+    def items(self, items):
+        self._items = items
+        self._pages.clear()
+        self.selected_row = -1
+        self.reload()
+
+    def reload(self):
+        if self.tableview is not None:
+            self.tableview.reload()
+
+    def item(self, row):
+        number, offset = divmod(row, PAGE_SIZE)
+        page = self._pages.get(number)
+        if page is None:
+            start = number * PAGE_SIZE
+            page = self._pages[number] = self._items[start:start + PAGE_SIZE]
+            if len(self._pages) > MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page[offset]
+
+    def tableview_number_of_sections(self, tableview):
+        self.tableview = tableview
+        return 1
+
+    def tableview_number_of_rows(self, tableview, section):
+        # pylint: disable=unused-argument
+        self.tableview = tableview
+        return len(self._items)
+
+    def tableview_cell_for_row(self, tableview, section, row):
+        # pylint: disable=import-error,unused-argument
+        import ui
+        item = self.item(row)
+        cell = ui.TableViewCell()
+        cell.text_label.text = item['title']
+        cell.accessory_type = item.get('accessory_type', '')
+        return cell
+
+    def tableview_can_delete(self, tableview, section, row):
+        # pylint: disable=unused-argument
+        return self.delete_enabled
+
+    def tableview_can_move(self, tableview, section, row):
+        # pylint: disable=unused-argument
+        return False
+
+    def tableview_did_select(self, tableview, section, row):
+        # pylint: disable=unused-argument
+        self.selected_row = row
+        if self.action:
+            self.action(self)
+
+
+class FolderRows():
+    # Rows listing ``folder`` of a ``PathIndex``: the ``head`` rows, then for
+    # each name in the folder a row to open it if it is a folder and a row
+    # per map at that path.  The index keeps count of the rows, so none are
+    # built until sliced out.  Walking the folder records where every
+    # ``CURSOR_STEP`` rows start in the index, so that a slice is built by
+    # walking on from the closest one.
+    def __init__(self, path_index, folder='', head=()):
+        self._path_index = path_index
+        self._folder = folder
+        self._head = list(head)
+        self._version = None
+        # Rows and index positions of the names the cursors point at, the
+        # first cursor has no position and starts the walk at the top.
+        self._cursor_rows = []
+        self._cursor_positions = []
+        self._walked = False
+
+    @property
+    def folder(self):
+        return self._folder
+
+    def __len__(self):
+        return len(self._head) + self._path_index.child_count(self._folder)
+
+    def __iter__(self):
+        return self._iter_from(0)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            rows = list(itertools.islice(self._iter_from(start),
+                                         max(stop - start, 0)))
+            return rows[::step]
+        row = item + len(self) if item < 0 else item
+        if not 0 <= row < len(self):
+            raise IndexError('Row out of range: {}'.format(item))
+        return next(self._iter_from(row))
+
+    def _iter_from(self, row):
+        if row < len(self._head):
+            yield from self._head[row:]
+            row = len(self._head)
+        cursor_row, position = self._seek(row)
+        rows = itertools.chain.from_iterable(
+            self._name_rows(name, keys, is_folder)
+            for _, name, keys, is_folder in self._path_index.iter_children(
+                self._folder, position))
+        yield from itertools.islice(rows, row - cursor_row, None)
+
+    def _seek(self, row):
+        # The closest cursor at or before ``row``, walking on from the last
+        # one and recording new ones if it is too far behind.
+        if self._version != self._path_index.version:
+            self._version = self._path_index.version
+            self._cursor_rows = [len(self._head)]
+            self._cursor_positions = [None]
+            self._walked = False
+        if not self._walked and row >= self._cursor_rows[-1] + CURSOR_STEP:
+            name_row = self._cursor_rows[-1]
+            for position, _, keys, is_folder in self._path_index.iter_children(
+                    self._folder, self._cursor_positions[-1]):
+                if name_row >= self._cursor_rows[-1] + CURSOR_STEP:
+                    self._cursor_rows.append(name_row)
+                    self._cursor_positions.append(position)
+                    if name_row > row:
+                        break
+                name_row += len(keys) + is_folder
+            else:
+                self._walked = True
+        cursor = bisect.bisect_right(self._cursor_rows, row) - 1
+        return self._cursor_rows[cursor], self._cursor_positions[cursor]
+
+    def _name_rows(self, name, keys, is_folder):
+        path = self._folder + '/' + name if self._folder else name
+        if is_folder:
+            yield {'title': name, 'folder': path,
+                   'accessory_type': 'disclosure_indicator'}
+        for key in keys:
+            yield {'title': name, 'map_path': key}
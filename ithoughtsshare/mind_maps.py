@@ -1,47 +1,195 @@
 # pylint: disable=missing-docstring
 
+import bisect
 import collections
+import contextlib
+import fcntl
+import functools
 import logging as log
 import json
+import os
+import re
+import threading
 
-from datetime import (datetime, timezone)
+from datetime import (datetime, timedelta, timezone)
+
+
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+# Maps written to a JSON file at a time.
+_JSON_CHUNK = 4096
 
 
 class MindMaps(collections.abc.MutableMapping):
-    # pylint: disable=too-many-ancestors
+    # pylint: disable=too-many-ancestors,too-many-instance-attributes
     def __init__(self, data=None, filepath=None):
         self._log = log.getLogger(type(self).__name__)
         self._data = data if data else {}
         self._filepath = filepath
+        self._listeners = []
+        # Format ``dumpf()`` writes in by default, that of the loaded file.
+        self.file_format = FORMAT_JSON
+        # Called with the registry after it wrote to its own file, as long as
+        # it holds all the changes in the file, see ``is_current()``.
+        self.on_write = None
+        # Generation and state of the file as last loaded or committed, and
+        # the adds, touches and deletes made since, as key -> (event, map).
+        self.generation = 0
+        self._file_state = None
+        self._changes = {}
+        self._merging = False
+        # The sorted keys and each map's encoded JSON as of the last save,
+        # kept up to date as maps change, see ``_iter_json()``.
+        self._sorted_keys = None
+        self._fragments = {}
 
     @classmethod
-    def loadf(cls, filepath, create=False):
+    def loadf(cls, filepath, create=False, lazy=False):
+        # The format, JSON or binary, is detected from the file.  With
+        # ``lazy``, each map is only decoded the first time it is accessed, so
+        # listing the keys stays cheap.
+        # pylint: disable=cyclic-import
+        from ithoughtsshare import mind_maps_binary
+        # Read before the file, so that a commit in between is seen as a
+        # newer generation.
+        state = cls._read_state(filepath)
         try:
-            # pylint: disable=protected-access
-            with open(filepath, 'r') as handle:
-                maps = json.load(handle, object_hook=_object_hook)
-            maps._filepath = filepath
-            return maps
+            with open(filepath, 'rb') as handle:
+                prefix = handle.read(len(mind_maps_binary.MAGIC))
+                handle.seek(0)
+                if mind_maps_binary.is_binary(prefix):
+                    file_format = FORMAT_BINARY
+                    data = mind_maps_binary.load(handle, lazy=lazy)
+                else:
+                    file_format = FORMAT_JSON
+                    data = json.load(
+                        handle, object_hook=None if lazy else _object_hook)
+            mind_maps = cls(data, filepath=filepath)
+            mind_maps.file_format = file_format
         except FileNotFoundError as exception:
-            if create:
-                return MindMaps(filepath=filepath)
-            raise exception
+            if not create:
+                raise exception
+            mind_maps = cls(filepath=filepath)
+        mind_maps.generation = state[0]
+        mind_maps._file_state = state
+        return mind_maps
 
     @classmethod
     def loads(cls, string):
-        return json.loads(string, object_hook=_object_hook)
-
-    def _dump(self, handle):
-        return json.dump(self, handle, cls=_MindMapsEncoder, sort_keys=True,
-                         indent=2)
-
-    def dumpf(self, filepath=None):
+        return cls(json.loads(string, object_hook=_object_hook))
+
+    def _dump(self, filepath, file_format):
+        if file_format == FORMAT_BINARY:
+            # pylint: disable=cyclic-import
+            from ithoughtsshare import mind_maps_binary
+            with open(filepath, 'wb') as handle:
+                mind_maps_binary.dump(
+                    ((key, _decoded(value))
+                     for key, value in self._data.items()), handle)
+        elif file_format == FORMAT_JSON:
+            with open(filepath, 'w') as handle:
+                handle.writelines(self._iter_json())
+        else:
+            raise ValueError('Unknown file format: {}'.format(file_format))
+
+    def dumpf(self, filepath=None, file_format=None):
         filepath = filepath if filepath is not None else self.filepath
-        with open(filepath, 'w') as handle:
-            self._dump(handle)
+        if filepath is not None and filepath == self.filepath:
+            self._commit(file_format or self.file_format)
+        else:
+            self._dump(filepath, file_format or self.file_format)
+
+    def _commit(self, file_format):
+        # Writes the next generation of the registry file, to a temporary
+        # file renamed over it.  If other writers committed since this
+        # registry was loaded, their maps are merged in first.  A registry
+        # that was never loaded from its file replaces it.  Only checking
+        # that and the rename happen under the registry's lock, so writers
+        # never wait on each other's serialization.
+        while True:
+            state = self._read_state(self.filepath)
+            if self._file_state is not None and state != self._file_state:
+                self._merge(self._reload())
+            temp_path = '{}.{}.{}.tmp'.format(self.filepath, os.getpid(),
+                                              threading.get_ident())
+            self._dump(temp_path, file_format)
+            with commit_lock(self.filepath) as lock:
+                if self._read_state(self.filepath) == state:
+                    os.replace(temp_path, self.filepath)
+                    self._committed()
+                    self.generation = _write_generation(lock, state[0] + 1)
+                    self._file_state = self._read_state(self.filepath)
+                    break
+            # Lost the race to another writer, merge again.
+            os.remove(temp_path)
+        self._changes.clear()
+        self._written()
+
+    @classmethod
+    def _read_state(cls, filepath):
+        return read_generation(filepath), file_stat(filepath)
+
+    def _reload(self):
+        return type(self).loadf(self.filepath, create=True, lazy=True)
+
+    def _committed(self):
+        pass
+
+    def _merge(self, current):
+        # Takes the maps of ``current``, a newer generation of the file, with
+        # the changes made here since on top.  A map added or touched on both
+        # sides keeps the earliest creation and the latest modification time.
+        # Listeners are told about the maps the other writers added and
+        # deleted.  Maps already handed out stay those of the registry, with
+        # the merged times, so that touching them is still saved.
+        data = current._data  # pylint: disable=protected-access
+        for key, (event, mind_map) in self._changes.items():
+            if event == 'delete':
+                data.pop(key, None)
+            elif key in data:
+                theirs = _decoded(data[key])
+                data[key] = MindMap(min(theirs.created, mind_map.created),
+                                    max(theirs.modified, mind_map.modified))
+            elif event == 'add':
+                data[key] = mind_map
+        _keep_decoded(self._data, data)
+        previous, self._data = self._data, data
+        self._sorted_keys = None
+        self._fragments.clear()
+        self._merging = True
+        try:
+            for key in previous.keys() - data.keys():
+                self._notify('delete', key, _decoded(previous[key]))
+            for key in data.keys() - previous.keys():
+                self._notify('add', key, self._entry(key))
+        finally:
+            self._merging = False
 
     def dumps(self):
-        return json.dumps(self, cls=_MindMapsEncoder, sort_keys=True, indent=2)
+        return ''.join(self._iter_json())
+
+    def _iter_json(self):
+        # The registry as ``json.dump(..., sort_keys=True, indent=2)`` writes
+        # it, in chunks.  Only the maps changed since the last save are
+        # encoded again.
+        if not self._data:
+            yield '{}'
+            return
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._data)
+        keys = self._sorted_keys
+        data = self._data
+        fragments = self._fragments
+        yield '{\n'
+        for start in range(0, len(keys), _JSON_CHUNK):
+            chunk = []
+            for key in keys[start:start + _JSON_CHUNK]:
+                fragment = fragments.get(key)
+                if fragment is None:
+                    fragment = fragments[key] = _encode_entry(key, data[key])
+                chunk.append(fragment)
+            yield (',\n' if start else '') + ',\n'.join(chunk)
+        yield '\n}'
 
     @property
     def filepath(self):
@@ -50,8 +198,76 @@ class MindMaps(collections.abc.MutableMapping):
     def add(self, key):
         self[key] = MindMap.create()
 
+    def add_all(self, items):
+        # Adds all the ``(key, MindMap)`` pairs of ``items``, or none of them
+        # if any is not allowed by ``__setitem__()``.  Listeners are told
+        # about each map, as with ``add()``.
+        items = dict(items)
+        if not items.keys().isdisjoint(self._data.keys()):
+            raise TypeError('Replacing an existing MindMap is not allowed')
+        if not all(isinstance(value, MindMap) for value in items.values()):
+            raise TypeError('Value must be of type MindMap')
+        self._data.update(items)
+        if self._sorted_keys is not None:
+            self._sorted_keys.extend(items)
+            self._sorted_keys.sort()
+        for key, value in items.items():
+            value.on_touch = functools.partial(self._notify, 'touch', key)
+            self._notify('add', key, value)
+
+    def iter_modified(self):
+        # ``(key, modification time)`` of every map, in microseconds since
+        # the epoch, without decoding lazily loaded maps into the registry.
+        for key, value in self._data.items():
+            if isinstance(value, MindMap):
+                yield key, value.modified_timestamp
+            elif isinstance(value, tuple):
+                yield key, value[1]
+            else:
+                yield key, to_timestamp(fromisoformat(value['modified']))
+
+    def subscribe(self, listener):
+        # ``listener(event, key, mind_map)`` is called after every 'add',
+        # 'delete' and 'touch' of a mind map in this registry.
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def is_current(self):
+        # Whether the file is as this registry last loaded or committed it.
+        return self._file_state == self._read_state(self.filepath)
+
+    def _written(self):
+        if self.on_write is not None:
+            self.on_write(self)
+
+    def _notify(self, event, key, mind_map):
+        self._fragments.pop(key, None)
+        if not self._merging:
+            change = event
+            if change == 'touch' and self._changes.get(key, ('',))[0] == 'add':
+                change = 'add'
+            self._changes[key] = (change, mind_map)
+        for listener in self._listeners:
+            listener(event, key, mind_map)
+
+    def _entry(self, key):
+        mind_map = self._data[key]
+        if not isinstance(mind_map, MindMap):
+            mind_map = self._data[key] = _decoded(mind_map)
+            # Written back as decoded from now on.
+            self._fragments.pop(key, None)
+        return mind_map
+
     def __getitem__(self, key):
-        return self._data[key]
+        mind_map = self._entry(key)
+        if mind_map.on_touch is None:
+            mind_map.on_touch = functools.partial(self._notify, 'touch', key)
+        return mind_map
+
+    def __contains__(self, key):
+        return key in self._data
 
     def __iter__(self):
         return iter(self._data)
@@ -60,7 +276,12 @@ class MindMaps(collections.abc.MutableMapping):
         return len(self._data)
 
     def __delitem__(self, key):
+        mind_map = self._entry(key)
         del self._data[key]
+        if self._sorted_keys is not None:
+            del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+        mind_map.on_touch = None
+        self._notify('delete', key, mind_map)
 
     def __setitem__(self, key, value):
         if key in self._data:
@@ -68,29 +289,128 @@ class MindMaps(collections.abc.MutableMapping):
         if not isinstance(value, MindMap):
             raise TypeError('Value must be of type MindMap')
         self._data[key] = value
+        if self._sorted_keys is not None:
+            bisect.insort(self._sorted_keys, key)
+        # Touching the map as passed in counts too.
+        value.on_touch = functools.partial(self._notify, 'touch', key)
+        self._notify('add', key, value)
+
+
+@contextlib.contextmanager
+def commit_lock(filepath):
+    # Exclusive lock of the registry at ``filepath`` across processes and
+    # threads, held only while committing.  The lock file also holds the
+    # generation of the registry.
+    descriptor = os.open(lock_path(filepath), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        yield descriptor
+    finally:
+        # Closing releases the lock.
+        os.close(descriptor)
 
 
-def _object_hook(dictionary):
-    if set(('created', 'modified')).issubset(set(dictionary.keys())):
-        return MindMap.decode(**dictionary)
-    return MindMaps(dictionary)
+def read_generation(filepath):
+    # Number of commits made to the registry at ``filepath``, 0 for none.
+    try:
+        with open(lock_path(filepath), 'r') as handle:
+            return int(handle.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
 
+def _write_generation(descriptor, generation):
+    os.ftruncate(descriptor, 0)
+    os.pwrite(descriptor, str(generation).encode('ascii'), 0)
+    return generation
 
-class _MindMapsEncoder(json.JSONEncoder):
-    def default(self, o):
-        # pylint: disable=method-hidden
-        if isinstance(o, (MindMap, MindMaps)):
-            return dict(o)
-        if isinstance(o, datetime):
-            return o.isoformat()
-        return super().default(o)
+
+def file_stat(filepath):
+    # ``(inode, size, mtime)`` of the file, None if it is missing.
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def lock_path(filepath):
+    return filepath + '.lock'
+
+
+def _keep_decoded(previous, data):
+    # Puts the maps decoded in ``previous`` back in ``data``, with its times,
+    # and detaches those it no longer has.
+    # pylint: disable=protected-access
+    for key, mind_map in previous.items():
+        if not isinstance(mind_map, MindMap):
+            continue
+        if key not in data:
+            mind_map.on_touch = None
+        elif data[key] is not mind_map:
+            merged = _decoded(data[key])
+            mind_map._created = merged._created
+            mind_map._created_tz = merged._created_tz
+            mind_map._modified = merged._modified
+            mind_map._modified_tz = merged._modified_tz
+            data[key] = mind_map
+
+
+def _decoded(value):
+    # Lazily loaded maps are kept as read, a dict of ISO strings from JSON or
+    # a ``(created, modified)`` tuple of timestamps from the binary format.
+    if isinstance(value, MindMap):
+        return value
+    if isinstance(value, tuple):
+        return MindMap.from_timestamps(*value)
+    return _object_hook(value)
+
+
+def _object_hook(dictionary):
+    # Called for every JSON object, keep the common path cheap.
+    if 'modified' in dictionary and 'created' in dictionary:
+        return MindMap(fromisoformat(dictionary['created']),
+                       fromisoformat(dictionary['modified']))
+    return dictionary
+
+
+def _encode_entry(key, value):
+    # ``"key": {...}`` as the JSON encoder indents it, one level deep.
+    if isinstance(value, tuple):
+        value = MindMap.from_timestamps(*value)
+    if isinstance(value, MindMap):
+        created = value.created.isoformat()
+        modified = value.modified.isoformat()
+    elif (isinstance(value, dict) and len(value) == 2
+          and isinstance(value.get('created'), str)
+          and isinstance(value.get('modified'), str)):
+        # Undecoded, written back as it was read.
+        created = value['created']
+        modified = value['modified']
+    else:
+        return '  {}: {}'.format(
+            _encode_string(key),
+            json.dumps(value, sort_keys=True, indent=2).replace('\n', '\n  '))
+    return _ENTRY.format(_encode_string(key), _encode_string(created),
+                         _encode_string(modified))
+
+
+_ENTRY = '  {}: {{\n    "created": {},\n    "modified": {}\n  }}'
+_encode_string = json.encoder.encode_basestring_ascii  # pylint: disable=C0103
 
 
 class MindMap(collections.abc.Mapping):
+    # Registries hold a lot of these, so the timestamps are kept as
+    # microseconds since the epoch.  The timezone is only kept when it is not
+    # UTC, so that encoding gives back the original string.
+    __slots__ = ('_created', '_created_tz', '_modified', '_modified_tz',
+                 'on_touch')
+
     def __init__(self, created, modified):
-        self._data = {
-            'created': created,
-            'modified': modified}
+        self._created, self._created_tz = _split(created)
+        self._modified, self._modified_tz = _split(modified)
+        # Set by the ``MindMaps`` holding this map, see ``touch()``.
+        self.on_touch = None
 
     @classmethod
     def create(cls):
@@ -103,37 +423,128 @@ class MindMap(collections.abc.Mapping):
             fromisoformat(created),
             fromisoformat(modified))
 
+    @classmethod
+    def from_timestamps(cls, created, modified):
+        # From UTC microseconds since the epoch, see ``to_timestamp()``.
+        mind_map = cls.__new__(cls)
+        mind_map._created = created
+        mind_map._created_tz = None
+        mind_map._modified = modified
+        mind_map._modified_tz = None
+        mind_map.on_touch = None
+        return mind_map
+
     @property
     def created(self):
-        return self._data['created']
+        return _join(self._created, self._created_tz)
 
     @property
     def modified(self):
-        return self._data['modified']
+        return _join(self._modified, self._modified_tz)
+
+    @property
+    def created_timestamp(self):
+        return self._created
+
+    @property
+    def modified_timestamp(self):
+        return self._modified
 
     def touch(self):
         now = utcnow()
-        self._data['modified'] = now
+        self._modified, self._modified_tz = _split(now)
+        if self.on_touch is not None:
+            self.on_touch(self)
         return now
 
     def __getitem__(self, key):
-        return self._data[key]
+        if key == 'created':
+            return self.created
+        if key == 'modified':
+            return self.modified
+        raise KeyError(key)
 
     def __iter__(self):
-        return iter(self._data)
+        return iter(('created', 'modified'))
 
     def __len__(self):
-        return len(self._data)
+        return 2
+
+
+def _split(value):
+    tzinfo = value.tzinfo
+    if tzinfo is timezone.utc or value.utcoffset() == _ZERO:
+        tzinfo = None
+    return to_timestamp(value), tzinfo
+
+
+def _join(timestamp, tzinfo):
+    value = from_timestamp(timestamp)
+    return value if tzinfo is None else value.astimezone(tzinfo)
+
+
+# ``datetime.fromisoformat()`` is only available from Python 3.7.
+_NATIVE_FROMISOFORMAT = getattr(datetime, 'fromisoformat', None)
+
+_ISOFORMAT = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?'
+    r'([+-])(\d{2}):?(\d{2})$')
+
+_TIMEZONES = {}
 
 
 def fromisoformat(string):
-    import re
-    string = re.sub(r'([+-])(\d{2}):(\d{2})$', r'\1\2\3', string)
-    try:
-        return datetime.strptime(string, '%Y-%m-%dT%H:%M:%S.%f%z')
-    except ValueError:
-        return datetime.strptime(string, '%Y-%m-%dT%H:%M:%S%z')
+    # Parses what ``datetime.isoformat()`` writes for aware datetimes, plus
+    # offsets without a colon.
+    if _NATIVE_FROMISOFORMAT is not None:
+        try:
+            value = _NATIVE_FROMISOFORMAT(string)
+        except ValueError:
+            pass
+        else:
+            if value.tzinfo is not None:
+                return value
+    return _parse_isoformat(string)
+
+
+def _parse_isoformat(string):
+    match = _ISOFORMAT.match(string)
+    if match is None:
+        raise ValueError('Invalid isoformat string: {!r}'.format(string))
+    (year, month, day, hour, minute, second, fraction,
+     sign, offset_hours, offset_minutes) = match.groups()
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    return datetime(int(year), int(month), int(day), int(hour), int(minute),
+                    int(second), microsecond,
+                    _timezone(sign, offset_hours, offset_minutes))
+
+
+def _timezone(sign, hours, minutes):
+    key = (sign, hours, minutes)
+    tzinfo = _TIMEZONES.get(key)
+    if tzinfo is None:
+        offset = timedelta(hours=int(hours), minutes=int(minutes))
+        tzinfo = timezone(-offset if sign == '-' else offset)
+        if not offset:
+            tzinfo = timezone.utc
+        _TIMEZONES[key] = tzinfo
+    return tzinfo
 
 
 def utcnow():
     return datetime.now(timezone.utc)
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ZERO = timedelta(0)
+
+
+def to_timestamp(value):
+    # Microseconds since the epoch, exact unlike ``datetime.timestamp()``.
+    delta = value - _EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1000000
+            + delta.microseconds)
+
+
+def from_timestamp(timestamp):
+    return _EPOCH + timedelta(microseconds=timestamp)
@@ -0,0 +1,114 @@
+# pylint: disable=missing-docstring
+
+import argparse
+import array
+import itertools
+import struct
+import sys
+
+from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MindMap,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+
+
+# Layout, all little endian:
+#   header      magic, format version, reserved, number of maps
+#   lengths     uint32 per map, length of its UTF-8 encoded path
+#   paths       the UTF-8 encoded paths, back to back
+#   created     int64 per map, microseconds since the epoch (UTC)
+#   modified    int64 per map, microseconds since the epoch (UTC)
+MAGIC = b'ITMM'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+
+
+def is_binary(prefix):
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def dump(entries, handle):
+    # ``entries`` are ``(path, MindMap)`` pairs, ``handle`` a binary file.
+    paths = []
+    created = array.array('q')
+    modified = array.array('q')
+    for path, mind_map in entries:
+        paths.append(path.encode('utf-8'))
+        created.append(mind_map.created_timestamp)
+        modified.append(mind_map.modified_timestamp)
+    lengths = array.array('I', map(len, paths))
+    handle.write(HEADER.pack(MAGIC, VERSION, 0, len(paths)))
+    handle.write(_little_endian(lengths).tobytes())
+    handle.write(b''.join(paths))
+    handle.write(_little_endian(created).tobytes())
+    handle.write(_little_endian(modified).tobytes())
+
+
+def load(handle, lazy=False):
+    # Returns a dict of path to ``MindMap`` in file order or, with ``lazy``,
+    # to ``(created, modified)`` timestamps.
+    header = handle.read(HEADER.size)
+    if len(header) < HEADER.size or not is_binary(header):
+        raise ValueError('Not a binary mind maps file')
+    _, version, _, count = HEADER.unpack(header)
+    if version != VERSION:
+        raise ValueError(
+            'Unsupported mind maps file version: {}'.format(version))
+    lengths = _read_array(handle, 'I', count)
+    paths = _read(handle, sum(lengths))
+    created = _read_array(handle, 'q', count)
+    modified = _read_array(handle, 'q', count)
+
+    # Iterators all the way, so no Python code runs per map.
+    ends = itertools.accumulate(lengths)
+    starts = itertools.chain((0,), itertools.accumulate(lengths))
+    keys = map(bytes.decode, map(paths.__getitem__, map(slice, starts, ends)))
+    if lazy:
+        return dict(zip(keys, zip(created, modified)))
+    return dict(zip(keys, map(MindMap.from_timestamps, created, modified)))
+
+
+def convert(source, target, file_format=None):
+    # Rewrites the registry ``source`` as ``target``, by default in the
+    # other format, with the changes still in its journal.
+    mind_maps = JournaledMindMaps.loadf(source, lazy=True)
+    if file_format is None:
+        file_format = (FORMAT_JSON if mind_maps.file_format == FORMAT_BINARY
+                       else FORMAT_BINARY)
+    mind_maps.dumpf(target, file_format=file_format)
+    return file_format
+
+
+def _read(handle, size):
+    data = handle.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated binary mind maps file')
+    return data
+
+
+def _read_array(handle, typecode, count):
+    values = array.array(typecode)
+    values.frombytes(_read(handle, values.itemsize * count))
+    return _little_endian(values)
+
+
+def _little_endian(values):
+    # Swaps in place, only needed on big endian machines.
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convert a mind maps registry between the JSON and '
+                    'binary formats.')
+    parser.add_argument('source', help='registry file to read')
+    parser.add_argument('target', help='registry file to write')
+    parser.add_argument('--to', choices=(FORMAT_JSON, FORMAT_BINARY),
+                        help='format to write (default: the other one)')
+    args = parser.parse_args(argv)
+    convert(args.source, args.target, args.to)
+    return 0
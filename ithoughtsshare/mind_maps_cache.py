@@ -0,0 +1,107 @@
+# pylint: disable=missing-docstring
+
+import os
+import threading
+
+from ithoughtsshare.mind_maps import file_stat
+from ithoughtsshare.mind_maps_journal import (
+    JournaledMindMaps,
+    journal_path,
+)
+from ithoughtsshare.mind_maps_recent import RecentMaps
+from ithoughtsshare.mind_maps_sharded import (
+    ShardedMindMaps,
+    files_state,
+    is_sharded,
+)
+
+
+_LOCK = threading.RLock()
+# Absolute registry path -> (state of its files, registry, its indexes by
+# factory)
+_CACHE = {}
+
+
+def get_mind_maps(filepath):
+    # The journaled registry at ``filepath``, or the sharded one if it is a
+    # directory of shards, loaded lazily the first time and handed out again
+    # for as long as its files are as this process last saw them.  Writes
+    # through the registry record the new state of its files, so they do
+    # not evict it, unless other writers changed them too.
+    path = os.path.abspath(filepath)
+    with _LOCK:
+        cached = _CACHE.get(path)
+        if cached is not None:
+            if cached[0] == file_state(path):
+                return cached[1]
+            _drop(cached)
+        if is_sharded(path):
+            mind_maps = ShardedMindMaps.loadf(filepath)
+        else:
+            mind_maps = JournaledMindMaps.loadf(filepath, create=True,
+                                                lazy=True)
+        mind_maps.on_write = _written
+        _CACHE[path] = (file_state(path), mind_maps, {})
+        return mind_maps
+
+
+def get_index(mind_maps, factory):
+    # ``factory.of(mind_maps)``, e.g. a ``PathIndex``, built once for a
+    # registry from ``get_mind_maps()`` and kept up to date until the
+    # registry is reloaded, when it is closed.  Any other registry gets a
+    # new index, for the caller to close.
+    with _LOCK:
+        cached = _cached(mind_maps)
+        if cached is None:
+            return factory.of(mind_maps)
+        indexes = cached[2]
+        index = indexes.get(factory)
+        if index is None:
+            index = indexes[factory] = factory.of(mind_maps)
+        return index
+
+
+def is_cached(mind_maps):
+    with _LOCK:
+        return _cached(mind_maps) is not None
+
+
+def clear_cache():
+    with _LOCK:
+        for cached in _CACHE.values():
+            _drop(cached)
+        _CACHE.clear()
+
+
+def file_state(filepath):
+    # ``(inode, size, mtime)`` of the registry file and of its journal, or
+    # None for a missing one.
+    if is_sharded(filepath):
+        return files_state(filepath)
+    return file_stat(filepath), file_stat(journal_path(filepath))
+
+
+def _cached(mind_maps):
+    if mind_maps.filepath is None:
+        return None
+    cached = _CACHE.get(os.path.abspath(mind_maps.filepath))
+    return cached if cached is not None and cached[1] is mind_maps else None
+
+
+def _drop(cached):
+    _, mind_maps, indexes = cached
+    mind_maps.on_write = None
+    for index in indexes.values():
+        index.close()
+
+
+def _written(mind_maps):
+    with _LOCK:
+        cached = _cached(mind_maps)
+        if cached is not None:
+            path = os.path.abspath(mind_maps.filepath)
+            _CACHE[path] = (file_state(path), mind_maps, cached[2])
+            # Once per write, however many maps it changed.
+            for index in cached[2].values():
+                if isinstance(index, RecentMaps):
+                    index.flush()
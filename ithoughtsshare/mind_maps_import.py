@@ -0,0 +1,171 @@
+# pylint: disable=missing-docstring
+
+from collections import namedtuple
+from xml.etree import ElementTree
+import argparse
+import logging as log
+import os
+import re
+import sys
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    utcnow,
+)
+from ithoughtsshare.mind_maps_binary import (
+    MAGIC,
+    is_binary,
+)
+from ithoughtsshare.mind_maps_cache import get_mind_maps
+from ithoughtsshare.mind_maps_journal import (
+    JournaledMindMaps,
+    journal_path,
+)
+from ithoughtsshare.mind_maps_sharded import (
+    ShardedMindMaps,
+    is_sharded,
+)
+
+
+SOURCE_TEXT = 'text'
+SOURCE_OPML = 'opml'
+SOURCE_REGISTRY = 'registry'
+
+# Why a path was left out of an import.
+CONFLICT_INVALID = 'invalid'
+CONFLICT_EXISTS = 'exists'
+CONFLICT_DUPLICATE = 'duplicate'
+
+Conflict = namedtuple('Conflict', ('key', 'reason'))
+ImportReport = namedtuple('ImportReport', ('added', 'conflicts'))
+
+_CONTROL = re.compile('[\x00-\x1f\x7f]')
+
+
+def import_maps(mind_maps, entries, dry_run=False):
+    # Adds the ``(key, MindMap)`` pairs of ``entries`` to ``mind_maps`` with
+    # a single ``add_all()``, a map of None being created now.  Paths that
+    # are not valid, already registered or repeated are reported and left
+    # out, and nothing is added with ``dry_run``.  Journaled and sharded
+    # registries write the maps while adding them, a plain ``MindMaps`` with
+    # a file is saved once after.
+    now = utcnow()
+    maps = {}
+    conflicts = []
+    for key, mind_map in entries:
+        if not is_valid_map_path(key):
+            conflicts.append(Conflict(key, CONFLICT_INVALID))
+        elif key in maps:
+            conflicts.append(Conflict(key, CONFLICT_DUPLICATE))
+        elif key in mind_maps:
+            conflicts.append(Conflict(key, CONFLICT_EXISTS))
+        else:
+            maps[key] = mind_map if mind_map is not None else MindMap(now, now)
+    if maps and not dry_run:
+        mind_maps.add_all(maps)
+        if (not isinstance(mind_maps, (JournaledMindMaps, ShardedMindMaps))
+                and mind_maps.filepath is not None):
+            mind_maps.dumpf()
+    return ImportReport(sorted(maps), conflicts)
+
+
+def is_valid_map_path(key):
+    # Names separated by ``/``, the leading one being optional, without
+    # control characters, or empty, ``.`` and ``..`` names.
+    if not isinstance(key, str) or _CONTROL.search(key):
+        return False
+    names = key[1:] if key.startswith('/') else key
+    return all(name.strip() and name not in ('.', '..')
+               for name in names.split('/'))
+
+
+def read_source(path, source_format=None):
+    # ``(key, MindMap or None)`` pairs for the maps listed in ``path``, in
+    # the format it is detected to be in when not given.
+    source_format = source_format or detect_format(path)
+    if source_format == SOURCE_REGISTRY:
+        return read_registry(path)
+    if source_format == SOURCE_OPML:
+        return read_opml(path)
+    if source_format == SOURCE_TEXT:
+        return read_text(path)
+    raise ValueError('Unknown source format: {}'.format(source_format))
+
+
+def detect_format(path):
+    if os.path.isdir(path) or os.path.exists(journal_path(path)):
+        return SOURCE_REGISTRY
+    with open(path, 'rb') as handle:
+        prefix = handle.read(max(len(MAGIC), 64)).lstrip()
+    if is_binary(prefix) or prefix.startswith(b'{'):
+        return SOURCE_REGISTRY
+    if prefix.startswith(b'<'):
+        return SOURCE_OPML
+    return SOURCE_TEXT
+
+
+def read_text(path):
+    # One path per line, blank lines and ``#`` comments are skipped.
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line, None
+
+
+def read_opml(path):
+    # Each outline without children is a map, its path made of its own and
+    # its parents' ``text``.
+    def outlines(element, parent):
+        for outline in element.iterfind('outline'):
+            key = parent + '/' + outline.get('text', outline.get('title', ''))
+            if outline.find('outline') is None:
+                yield key, None
+            else:
+                yield from outlines(outline, key)
+
+    body = ElementTree.parse(path).getroot().find('body')
+    if body is None:
+        raise ValueError('Not an OPML file, no body: {}'.format(path))
+    yield from outlines(body, '')
+
+
+def read_registry(path):
+    # The maps of another registry, file or sharded, keeping their times.
+    if is_sharded(path):
+        source = ShardedMindMaps.loadf(path)
+    else:
+        source = JournaledMindMaps.loadf(path, lazy=True)
+    for key in source:
+        mind_map = source[key]
+        yield key, MindMap(mind_map.created, mind_map.modified)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Add the mind maps listed in a text file, an OPML export '
+                    'or another registry to a mind maps registry, and list '
+                    'those that were left out.')
+    parser.add_argument('registry',
+                        help='registry file or sharded directory to add to')
+    parser.add_argument('source', help='file or directory to read maps from')
+    parser.add_argument('--format',
+                        choices=(SOURCE_TEXT, SOURCE_OPML, SOURCE_REGISTRY),
+                        help='format of the source (default: detected)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='only report what would be added')
+    args = parser.parse_args(argv)
+
+    report = import_maps(get_mind_maps(args.registry),
+                         read_source(args.source, args.format),
+                         dry_run=args.dry_run)
+    for conflict in report.conflicts:
+        print('{}\t{}'.format(conflict.reason, conflict.key))
+    log.info('%s %d maps, left out %d', 'Would add' if args.dry_run else
+             'Added', len(report.added), len(report.conflicts))
+    return 0
+
+
+if __name__ == '__main__':
+    log.basicConfig(level=log.INFO)
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# pylint: disable=missing-docstring
+
+import bisect
+import collections
+import operator
+
+
+# Path separators are replaced by the lowest character when sorting, so that
+# a folder and everything below it form one contiguous, name ordered range.
+_SEPARATOR = '\0'
+_AFTER_SEPARATOR = '\x01'
+
+
+class PathIndex():
+    # Sorted index of mind map keys by folder.  Keys are slash separated
+    # paths, leading and trailing slashes are ignored, so ``/Notes/Inbox`` is
+    # the map ``Inbox`` in the folder ``Notes``, and ``''`` is the root
+    # folder.  Lookups bisect the index rather than scanning every key.
+    def __init__(self, keys=()):
+        self._entries = sorted((_sort_key(key), key) for key in keys)
+        self._mind_maps = None
+        # Every folder, and folder -> number of maps and folders directly in
+        # it.  The maps are counted in bulk, then the folders they are in.
+        self._folders = set()
+        self._child_counts = collections.Counter(map(
+            operator.itemgetter(0),
+            map(operator.methodcaller('rpartition', _SEPARATOR),
+                map(operator.itemgetter(0), self._entries))))
+        for folder in list(self._child_counts):
+            self._add_folders(folder)
+        # Bumped on every change, positions from ``iter_children()`` are only
+        # valid for the version they were taken at.
+        self.version = 0
+
+    @classmethod
+    def of(cls, mind_maps):
+        # Indexes ``mind_maps`` and keeps the index up to date with its adds
+        # and deletes, until ``close()``.
+        index = cls(mind_maps)
+        index._mind_maps = mind_maps
+        mind_maps.subscribe(index._changed)
+        return index
+
+    def close(self):
+        if self._mind_maps is not None:
+            self._mind_maps.unsubscribe(self._changed)
+            self._mind_maps = None
+
+    def add(self, key):
+        sort_key = _sort_key(key)
+        bisect.insort(self._entries, (sort_key, key))
+        self._added(sort_key)
+        self.version += 1
+
+    def discard(self, key):
+        entry = (_sort_key(key), key)
+        position = bisect.bisect_left(self._entries, entry)
+        if (position < len(self._entries)
+                and self._entries[position] == entry):
+            del self._entries[position]
+            self._removed(entry[0])
+            self.version += 1
+
+    def count(self, folder=''):
+        # Number of maps in ``folder`` and its sub folders.
+        start, end = self._range(_sort_key(folder))
+        return end - start
+
+    def iter_prefix(self, folder=''):
+        # Keys of the maps in ``folder`` and its sub folders, in path order.
+        start, end = self._range(_sort_key(folder))
+        for position in range(start, end):
+            yield self._entries[position][1]
+
+    def child_count(self, folder=''):
+        # Number of maps and folders directly in ``folder``, a folder that is
+        # also a map counts twice.
+        return self._child_counts[_sort_key(folder)]
+
+    def children(self, folder=''):
+        # Sorted names of the maps and folders directly in ``folder``.
+        return [name for _, name, _, _ in self.iter_children(folder)]
+
+    def iter_children(self, folder='', position=None):
+        # ``(position, name, keys, is_folder)`` for each name directly in
+        # ``folder``, in name order, with the keys of the maps at that path
+        # and whether it is a folder as well.  Passing a yielded ``position``
+        # back in resumes the walk at that name.
+        prefix = _sort_key(folder)
+        start, end = self._range(prefix)
+        if prefix:
+            prefix += _SEPARATOR
+        entries = self._entries
+        if position is None:
+            position = start
+            while position < end and entries[position][0] < prefix:
+                # The map named like the folder itself.
+                position += 1
+        while position < end:
+            name = entries[position][0][len(prefix):].split(_SEPARATOR, 1)[0]
+            path = prefix + name
+            keys = []
+            following = position
+            while following < end and entries[following][0] == path:
+                keys.append(entries[following][1])
+                following += 1
+            is_folder = (following < end and entries[following][0].startswith(
+                path + _SEPARATOR))
+            if is_folder:
+                following = bisect.bisect_left(
+                    entries, (path + _AFTER_SEPARATOR,), following, end)
+            yield position, name, keys, is_folder
+            position = following
+
+    def keys(self, path):
+        # Keys of the maps at exactly ``path``, there is more than one only
+        # if keys differ just by their leading or trailing slashes.
+        sort_key = _sort_key(path)
+        position = bisect.bisect_left(self._entries, (sort_key,))
+        keys = []
+        while (position < len(self._entries)
+               and self._entries[position][0] == sort_key):
+            keys.append(self._entries[position][1])
+            position += 1
+        return keys
+
+    def is_folder(self, path):
+        prefix = _sort_key(path)
+        if not prefix:
+            return bool(self._entries)
+        return prefix in self._folders
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _range(self, prefix):
+        if not prefix:
+            return 0, len(self._entries)
+        return (bisect.bisect_left(self._entries, (prefix,)),
+                bisect.bisect_left(self._entries,
+                                   (prefix + _AFTER_SEPARATOR,)))
+
+    def _added(self, sort_key):
+        # Counts the map as a child of its folder, and each folder created
+        # for it as a child of its parent, up to the first one that existed.
+        folder = _parent(sort_key)
+        self._child_counts[folder] += 1
+        self._add_folders(folder)
+
+    def _add_folders(self, folder):
+        while folder and folder not in self._folders:
+            self._folders.add(folder)
+            folder = _parent(folder)
+            self._child_counts[folder] += 1
+
+    def _removed(self, sort_key):
+        # The reverse of ``_added()``, for folders left empty.
+        folder = _parent(sort_key)
+        self._count_removed(folder)
+        while folder and not self._has_entries_below(folder):
+            self._folders.discard(folder)
+            folder = _parent(folder)
+            self._count_removed(folder)
+
+    def _count_removed(self, folder):
+        self._child_counts[folder] -= 1
+        if not self._child_counts[folder]:
+            del self._child_counts[folder]
+
+    def _has_entries_below(self, folder):
+        position = bisect.bisect_left(self._entries,
+                                      (folder + _SEPARATOR,))
+        return (position < len(self._entries)
+                and self._entries[position][0].startswith(
+                    folder + _SEPARATOR))
+
+    def _changed(self, event, key, mind_map):
+        # pylint: disable=unused-argument
+        if event == 'add':
+            self.add(key)
+        elif event == 'delete':
+            self.discard(key)
+
+
+def _parent(sort_key):
+    return sort_key.rpartition(_SEPARATOR)[0]
+
+
+def _sort_key(path):
+    return path.strip('/').replace('/', _SEPARATOR)
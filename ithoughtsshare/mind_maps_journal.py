@@ -0,0 +1,196 @@
+# pylint: disable=missing-docstring
+
+import json
+import os
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+    commit_lock,
+    file_stat,
+    fromisoformat,
+)
+
+
+DEFAULT_COMPACT_THRESHOLD = 1000
+
+
+class JournaledMindMaps(MindMaps):
+    # pylint: disable=too-many-ancestors
+    # The registry file is a snapshot in the usual JSON format.  Adds,
+    # deletes and touches are appended to ``<registry file>.journal`` as one
+    # JSON record per line, and replayed on top of the snapshot when
+    # loading.  Once the journal holds ``compact_threshold`` records, the
+    # snapshot is rewritten and the journal emptied.  Appends take the
+    # registry's commit lock, so that records written by other processes
+    # during a compaction are merged into the snapshot rather than lost.
+    def __init__(self, data=None, filepath=None,
+                 compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        super().__init__(data, filepath)
+        self.compact_threshold = compact_threshold
+        self._journal_length = 0
+        self._adding_all = False
+
+    @classmethod
+    def loadf(cls, filepath, create=False, lazy=False,
+              compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        # pylint: disable=arguments-differ
+        try:
+            maps = super().loadf(filepath, lazy=lazy)
+        except FileNotFoundError:
+            if not create and not os.path.exists(journal_path(filepath)):
+                raise
+            maps = super().loadf(filepath, create=True, lazy=lazy)
+        maps.compact_threshold = compact_threshold
+        maps.replay()
+        return maps
+
+    @property
+    def journal_filepath(self):
+        return journal_path(self.filepath)
+
+    @property
+    def journal_length(self):
+        return self._journal_length
+
+    def replay(self):
+        # Applies the journal to the in memory maps, without journaling
+        # anything.  Replaying is idempotent, so a journal that outlived an
+        # interrupted compaction is harmless.
+        try:
+            with open(self.journal_filepath, 'r') as handle:
+                lines = handle.readlines()
+        except FileNotFoundError:
+            return
+        if lines and not lines[-1].endswith('\n'):
+            # Torn last write, the change never completed.  It is cut off, so
+            # that the next record starts on a line of its own.
+            self._log.warning('Ignoring incomplete journal record')
+            lines.pop()
+            self._trim_journal()
+        for line in lines:
+            self._apply(json.loads(line))
+        self._journal_length = len(lines)
+        if lines:
+            self._sorted_keys = None
+            self._fragments.clear()
+
+    def add_all(self, items):
+        # Journals all the maps with one write, or compacts instead if they
+        # would fill the journal.
+        items = dict(items)
+        self._adding_all = True
+        try:
+            super().add_all(items)
+        finally:
+            self._adding_all = False
+        if self._journal_length + len(items) >= self.compact_threshold:
+            self.compact()
+        elif items:
+            self._write_records([_record('add', key, mind_map)
+                                 for key, mind_map in items.items()])
+
+    def compact(self):
+        self._commit(self.file_format)
+
+    def dumpf(self, filepath=None, file_format=None):
+        if filepath is None or filepath == self.filepath:
+            if file_format is not None:
+                self.file_format = file_format
+            self.compact()
+        else:
+            super().dumpf(filepath, file_format)
+
+    @classmethod
+    def _read_state(cls, filepath):
+        return super()._read_state(filepath) + (
+            file_stat(journal_path(filepath)),)
+
+    def _committed(self):
+        with open(self.journal_filepath, 'w'):
+            pass
+        self._journal_length = 0
+
+    def _apply(self, record):
+        operation = record['op']
+        key = record['key']
+        if operation == 'add':
+            self._data[key] = MindMap.decode(record['created'],
+                                             record['modified'])
+        elif operation == 'delete':
+            self._data.pop(key, None)
+        elif operation == 'touch':
+            if key in self._data:
+                self._data[key] = MindMap(self._entry(key).created,
+                                          fromisoformat(record['modified']))
+        else:
+            self._log.warning('Ignoring journal record: %s', record)
+
+    def _notify(self, event, key, mind_map):
+        # Journaled after the listeners ran, so that whatever they keep up
+        # to date is current once the write is reported.
+        super()._notify(event, key, mind_map)
+        self._append(event, key, mind_map)
+
+    def _append(self, event, key, mind_map):
+        if self._merging or self._adding_all:
+            # Already in the journal or snapshot of the other writer, or
+            # written at once by ``add_all()``.
+            return
+        self._write_records([_record(event, key, mind_map)])
+
+    def _trim_journal(self):
+        with commit_lock(self.filepath):
+            unchanged = self._read_state(self.filepath) == self._file_state
+            with open(self.journal_filepath, 'r+b') as handle:
+                _trim_torn(handle)
+            if unchanged:
+                self._file_state = self._read_state(self.filepath)
+
+    def _write_records(self, records):
+        with commit_lock(self.filepath):
+            unchanged = self._read_state(self.filepath) == self._file_state
+            with open(self.journal_filepath, 'a+b') as handle:
+                # Another writer may have been interrupted since the replay.
+                _trim_torn(handle)
+                handle.writelines(
+                    (json.dumps(record, sort_keys=True) + '\n').encode('ascii')
+                    for record in records)
+            if unchanged:
+                # Only this registry's own records are new.
+                self._file_state = self._read_state(self.filepath)
+        # Written changes are replayed from the journal when merging, keeping
+        # them would undo what other writers did since.
+        for record in records:
+            self._changes.pop(record['key'], None)
+        self._journal_length += len(records)
+        if self._journal_length >= self.compact_threshold:
+            self.compact()
+        elif unchanged:
+            # Otherwise other writers' records are not in this registry.
+            self._written()
+
+
+def _record(event, key, mind_map):
+    record = {'op': event, 'key': key}
+    if event == 'add':
+        record['created'] = mind_map.created.isoformat()
+    if event in ('add', 'touch'):
+        record['modified'] = mind_map.modified.isoformat()
+    return record
+
+
+def _trim_torn(handle):
+    # Truncates the binary ``handle`` after its last complete line.
+    end = handle.seek(0, os.SEEK_END)
+    if not end:
+        return
+    handle.seek(end - 1)
+    if handle.read(1) == b'\n':
+        return
+    handle.seek(0)
+    handle.truncate(handle.read().rfind(b'\n') + 1)
+
+
+def journal_path(filepath):
+    return filepath + '.journal'
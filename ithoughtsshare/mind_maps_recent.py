@@ -0,0 +1,132 @@
+# pylint: disable=missing-docstring
+
+import heapq
+import json
+import logging as log
+import operator
+import os
+
+
+DEFAULT_CAPACITY = 200
+
+
+class RecentMaps():
+    # Last use and number of uses of the most recently used maps, kept in a
+    # small file next to the registry so the picker can list them without
+    # decoding or sorting the whole registry.  Adding or touching a map
+    # counts as a use.  Only the ``capacity`` most recently used maps are
+    # kept.  Uses are written to the file by ``flush()``, which the cache
+    # calls once the registry wrote its own files, so that a bulk import or
+    # a merge of many maps rewrites it once.
+    def __init__(self, filepath=None, capacity=DEFAULT_CAPACITY):
+        self._log = log.getLogger(type(self).__name__)
+        self._filepath = filepath
+        self.capacity = capacity
+        # key -> [last use in microseconds since the epoch, uses]
+        self._entries = {}
+        self._dirty = False
+        self._mind_maps = None
+
+    @classmethod
+    def loadf(cls, filepath, capacity=DEFAULT_CAPACITY):
+        recent = cls(filepath, capacity)
+        try:
+            with open(filepath, 'r') as handle:
+                recent._entries = {key: list(entry) for key, entry
+                                   in json.load(handle).items()}
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            recent._log.warning('Ignoring unreadable %s', filepath)
+        return recent
+
+    @classmethod
+    def of(cls, mind_maps, capacity=DEFAULT_CAPACITY):
+        # Recent maps of ``mind_maps``, stored in ``recent_path()`` of its
+        # file and updated on every add, touch and delete until ``close()``,
+        # which flushes them.
+        # Without a stored file, it is seeded once from the modification
+        # times in the registry.
+        filepath = (recent_path(mind_maps.filepath)
+                    if mind_maps.filepath else None)
+        if filepath is not None and os.path.exists(filepath):
+            recent = cls.loadf(filepath, capacity)
+        else:
+            recent = cls(filepath, capacity)
+            recent.seed(mind_maps)
+        recent._mind_maps = mind_maps
+        mind_maps.subscribe(recent._changed)
+        return recent
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    def close(self):
+        if self._mind_maps is not None:
+            self._mind_maps.unsubscribe(self._changed)
+            self._mind_maps = None
+        self.flush()
+
+    def seed(self, mind_maps):
+        # From the modification times, without decoding lazily loaded maps.
+        latest = heapq.nlargest(self.capacity, mind_maps.iter_modified(),
+                                key=operator.itemgetter(1))
+        self._entries = {key: [modified, 0] for key, modified in latest}
+        self.dumpf()
+
+    def use(self, key, timestamp):
+        entry = self._entries.setdefault(key, [timestamp, 0])
+        entry[0] = max(entry[0], timestamp)
+        entry[1] += 1
+        if len(self._entries) > self.capacity:
+            oldest = min(self._entries, key=lambda key: self._entries[key][0])
+            del self._entries[oldest]
+        self._dirty = True
+
+    def discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def flush(self):
+        if self._dirty:
+            self.dumpf()
+
+    def most_recent(self, count):
+        return heapq.nlargest(count, self._entries,
+                              key=lambda key: self._entries[key][0])
+
+    def most_used(self, count):
+        return heapq.nlargest(count, self._entries,
+                              key=lambda key: tuple(self._entries[key][::-1]))
+
+    def uses(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry else 0
+
+    def dumpf(self, filepath=None):
+        filepath = filepath if filepath is not None else self._filepath
+        if filepath is None:
+            return
+        temp_path = '{}.{}.tmp'.format(filepath, os.getpid())
+        with open(temp_path, 'w') as handle:
+            json.dump(self._entries, handle, sort_keys=True)
+        os.replace(temp_path, filepath)
+        if filepath == self._filepath:
+            self._dirty = False
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _changed(self, event, key, mind_map):
+        if event in ('add', 'touch'):
+            self.use(key, mind_map.modified_timestamp)
+        elif event == 'delete':
+            self.discard(key)
+
+
+def recent_path(filepath):
+    return filepath + '.recent'
@@ -0,0 +1,124 @@
+# pylint: disable=missing-docstring
+
+import collections
+import itertools
+import math
+
+
+DEFAULT_LIMIT = 100
+# Share of a query's trigrams a key needs to be a fuzzy match.
+MIN_SIMILARITY = 0.5
+
+
+class PathSearch():
+    # Case insensitive search of mind map keys, backed by an index of the
+    # trigrams in each key.  Keys containing every space separated term of
+    # the query match, or if none does, keys sharing most of the query's
+    # trigrams, which catches typos.
+    #
+    # Ids are handed out shortest key first when the index is built, so
+    # posting lists are already in ranking order and a search can stop as
+    # soon as it has ``limit`` matches.  Keys added later rank after those.
+    def __init__(self, keys=()):
+        self._keys = []
+        self._lowered = []
+        self._ids = {}
+        self._postings = collections.defaultdict(list)
+        self._mind_maps = None
+        for key in sorted(sorted(keys), key=len):
+            self.add(key)
+
+    @classmethod
+    def of(cls, mind_maps):
+        # Indexes ``mind_maps`` and keeps the index up to date with its adds
+        # and deletes, until ``close()``.
+        search = cls(mind_maps)
+        search._mind_maps = mind_maps
+        mind_maps.subscribe(search._changed)
+        return search
+
+    def close(self):
+        if self._mind_maps is not None:
+            self._mind_maps.unsubscribe(self._changed)
+            self._mind_maps = None
+
+    def add(self, key):
+        if key in self._ids:
+            return
+        key_id = len(self._keys)
+        lowered = key.lower()
+        self._ids[key] = key_id
+        self._keys.append(key)
+        self._lowered.append(lowered)
+        for trigram in _trigrams(lowered):
+            self._postings[trigram].append(key_id)
+
+    def discard(self, key):
+        # The id is retired rather than reused, its postings stay behind and
+        # never match.
+        key_id = self._ids.pop(key, None)
+        if key_id is not None:
+            self._keys[key_id] = None
+            self._lowered[key_id] = ''
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        terms = query.lower().split()
+        if not terms:
+            return []
+        trigrams = set()
+        for term in terms:
+            trigrams.update(_trigrams(term))
+        matches = self._exact(terms, trigrams, limit)
+        if trigrams and not matches:
+            matches = self._fuzzy(trigrams, limit)
+        return [self._keys[key_id] for key_id in matches[:limit]]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _exact(self, terms, trigrams, limit):
+        if trigrams:
+            # Every match is in the shortest posting list of the query.
+            candidates = min((self._postings.get(trigram, ())
+                              for trigram in trigrams), key=len)
+        else:
+            candidates = range(len(self._lowered))
+        lowered = self._lowered
+        if len(terms) == 1:
+            term = terms[0]
+            matches = (key_id for key_id in candidates
+                       if term in lowered[key_id])
+        else:
+            matches = (key_id for key_id in candidates
+                       if all(term in lowered[key_id] for term in terms))
+        return list(itertools.islice(matches, limit))
+
+    def _fuzzy(self, trigrams, limit):
+        # At least ``limit`` ids sharing enough of ``trigrams`` if there are
+        # that many, most shared first.
+        counts = collections.Counter()
+        for trigram in trigrams:
+            counts.update(self._postings.get(trigram, ()))
+        needed = math.ceil(len(trigrams) * MIN_SIMILARITY)
+        buckets = collections.defaultdict(list)
+        for key_id, count in counts.items():
+            if count >= needed:
+                buckets[count].append(key_id)
+        similar = []
+        for count in sorted(buckets, reverse=True):
+            similar.extend(key_id for key_id in sorted(buckets[count])
+                           if self._lowered[key_id])
+            if len(similar) >= limit:
+                break
+        return similar
+
+    def _changed(self, event, key, mind_map):
+        # pylint: disable=unused-argument
+        if event == 'add':
+            self.add(key)
+        elif event == 'delete':
+            self.discard(key)
+
+
+def _trigrams(text):
+    return {text[index:index + 3] for index in range(len(text) - 2)}
@@ -0,0 +1,252 @@
+# pylint: disable=missing-docstring
+
+from urllib import parse
+import argparse
+import collections
+import functools
+import json
+import logging as log
+import os
+import zlib
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+    commit_lock,
+    file_stat,
+)
+from ithoughtsshare.mind_maps_journal import (
+    JournaledMindMaps,
+    journal_path,
+)
+
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class ShardedMindMaps(collections.abc.MutableMapping):
+    # Same interface as ``MindMaps``, split by the top level folder of the
+    # keys, so ``/Notes/Inbox`` is in the ``Notes`` shard.  Each shard is a
+    # ``JournaledMindMaps`` file in ``directory``, listed with its number of
+    # maps in the manifest.  A shard is only loaded the first time one of
+    # its maps is needed, and changes only write to its journal.
+    # pylint: disable=too-many-ancestors
+    def __init__(self, directory, manifest=None):
+        self._log = log.getLogger(type(self).__name__)
+        self._directory = directory
+        # Top level folder -> {'file': shard file name, 'count': maps}
+        self._manifest = manifest if manifest else {}
+        self._shards = {}
+        self._listeners = []
+        self._adding_all = False
+        # Called with the registry after it wrote to one of its files, as
+        # long as each loaded shard holds all the changes in its files.
+        self.on_write = None
+
+    @classmethod
+    def loadf(cls, directory, create=False):
+        manifest_path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(manifest_path):
+            if not create:
+                raise FileNotFoundError(manifest_path)
+            os.makedirs(directory, exist_ok=True)
+        return cls(directory, read_manifest(manifest_path))
+
+    @classmethod
+    def from_file(cls, directory, filepath):
+        # Splits the registry file ``filepath``, with the changes still in
+        # its journal, into shards in ``directory``.
+        source = JournaledMindMaps.loadf(filepath, lazy=True)
+        data = collections.defaultdict(dict)
+        for key, mind_map in source.items():
+            data[top_folder(key)][key] = MindMap(mind_map.created,
+                                                 mind_map.modified)
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        for folder, maps in data.items():
+            shard = MindMaps(maps, filepath=os.path.join(
+                directory, shard_filename(folder)))
+            shard.file_format = source.file_format
+            shard.dumpf()
+            manifest[folder] = {'file': shard_filename(folder),
+                                'count': len(maps)}
+        _write_manifest(os.path.join(directory, MANIFEST), manifest)
+        return cls(directory, manifest)
+
+    @property
+    def filepath(self):
+        return self._directory
+
+    @property
+    def loaded_shards(self):
+        return sorted(self._shards)
+
+    def dumpf(self, filepath=None, file_format=None):
+        # Every change is already journaled, so this compacts the journals
+        # of the loaded shards, or exports a single registry file.
+        if filepath is None or filepath == self.filepath:
+            for shard in self._shards.values():
+                shard.dumpf(file_format=file_format)
+        else:
+            MindMaps(dict(self.items())).dumpf(filepath, file_format)
+
+    def add(self, key):
+        self[key] = MindMap.create()
+
+    def add_all(self, items):
+        # Adds all the maps or none of them, with one write per shard and
+        # one to the manifest.
+        shards = collections.defaultdict(dict)
+        for key, value in dict(items).items():
+            shards[top_folder(key)][key] = value
+        for folder, maps in shards.items():
+            shard = self._shard(folder, create=False)
+            if shard is not None and not maps.keys().isdisjoint(shard.keys()):
+                raise TypeError('Replacing an existing MindMap is not allowed')
+            if not all(isinstance(value, MindMap) for value in maps.values()):
+                raise TypeError('Value must be of type MindMap')
+        self._adding_all = True
+        try:
+            for folder, maps in shards.items():
+                self._shard(folder).add_all(maps)
+        finally:
+            self._adding_all = False
+        if shards:
+            self._count(*shards)
+
+    def iter_modified(self):
+        for folder in sorted(self._manifest):
+            yield from self._shard(folder).iter_modified()
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def __getitem__(self, key):
+        shard = self._shard(top_folder(key), create=False)
+        if shard is None:
+            raise KeyError(key)
+        return shard[key]
+
+    def __contains__(self, key):
+        shard = self._shard(top_folder(key), create=False)
+        return shard is not None and key in shard
+
+    def __iter__(self):
+        for folder in sorted(self._manifest):
+            yield from self._shard(folder)
+
+    def __len__(self):
+        return sum(entry['count'] for entry in self._manifest.values())
+
+    def __delitem__(self, key):
+        shard = self._shard(top_folder(key), create=False)
+        if shard is None:
+            raise KeyError(key)
+        del shard[key]
+
+    def __setitem__(self, key, value):
+        self._shard(top_folder(key))[key] = value
+
+    def _shard(self, folder, create=True):
+        shard = self._shards.get(folder)
+        if shard is not None:
+            return shard
+        if folder not in self._manifest and not create:
+            return None
+        shard = JournaledMindMaps.loadf(
+            os.path.join(self._directory, shard_filename(folder)),
+            create=True, lazy=True)
+        shard.subscribe(functools.partial(self._changed, folder))
+        shard.on_write = self._written
+        self._shards[folder] = shard
+        return shard
+
+    def _changed(self, folder, event, key, mind_map):
+        for listener in self._listeners:
+            listener(event, key, mind_map)
+        if event in ('add', 'delete') and not self._adding_all:
+            self._count(folder)
+
+    def _count(self, *folders):
+        # The other shards' counts are taken as they are on disk, other
+        # processes may have changed them.
+        manifest_path = os.path.join(self._directory, MANIFEST)
+        with commit_lock(manifest_path):
+            manifest = read_manifest(manifest_path)
+            for folder in folders:
+                count = len(self._shards[folder])
+                if count:
+                    manifest[folder] = {'file': shard_filename(folder),
+                                        'count': count}
+                else:
+                    manifest.pop(folder, None)
+            _write_manifest(manifest_path, manifest)
+        self._manifest = manifest
+        self._written()
+
+    def _written(self, _=None):
+        if self.on_write is not None and all(
+                shard.is_current() for shard in self._shards.values()):
+            self.on_write(self)
+
+
+def top_folder(key):
+    return key.strip('/').split('/', 1)[0]
+
+
+def shard_filename(folder):
+    # Readable, and distinct even on case insensitive file systems.
+    return '{}-{:08x}.json'.format(parse.quote(folder, safe=' '),
+                                   zlib.crc32(folder.encode('utf-8')))
+
+
+def read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as handle:
+            manifest = json.load(handle)
+    except FileNotFoundError:
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError('Unsupported manifest version: {}'.format(
+            manifest.get('version')))
+    return manifest['shards']
+
+
+def files_state(directory):
+    # ``(inode, size, mtime)`` of the manifest, and of each shard file and
+    # its journal, to tell whether any of them changed.
+    manifest_path = os.path.join(directory, MANIFEST)
+    state = [file_stat(manifest_path)]
+    for entry in sorted(read_manifest(manifest_path).values(),
+                        key=lambda entry: entry['file']):
+        shard_path = os.path.join(directory, entry['file'])
+        state.append(file_stat(shard_path))
+        state.append(file_stat(journal_path(shard_path)))
+    return tuple(state)
+
+
+def is_sharded(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def _write_manifest(manifest_path, manifest):
+    temp_path = '{}.{}.tmp'.format(manifest_path, os.getpid())
+    with open(temp_path, 'w') as handle:
+        json.dump({'version': MANIFEST_VERSION, 'shards': manifest}, handle,
+                  sort_keys=True, indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Split a mind maps registry into one file per top level '
+                    'folder.')
+    parser.add_argument('source', help='registry file to read')
+    parser.add_argument('directory', help='directory to write the shards to')
+    args = parser.parse_args(argv)
+    ShardedMindMaps.from_file(args.directory, args.source)
+    return 0
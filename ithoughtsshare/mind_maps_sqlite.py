@@ -0,0 +1,141 @@
+# pylint: disable=missing-docstring
+
+import collections
+import functools
+import logging as log
+import os
+import sqlite3
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+
+
+_SCHEMA = (
+    # The primary key doubles as the index on path.
+    'CREATE TABLE IF NOT EXISTS mind_maps ('
+    '    path TEXT PRIMARY KEY,'
+    '    created INTEGER NOT NULL,'
+    '    modified INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS mind_maps_modified'
+    '    ON mind_maps (modified)',
+)
+
+
+class SqliteMindMaps(collections.abc.MutableMapping):
+    # Same interface as ``MindMaps``, backed by a SQLite database so that
+    # single lookups, inserts and recency listings do not need the whole
+    # registry in memory.  Timestamps are stored as microseconds since the
+    # epoch and read back in UTC.
+    # pylint: disable=too-many-ancestors
+    def __init__(self, connection, filepath=None):
+        self._log = log.getLogger(type(self).__name__)
+        self._connection = connection
+        self._filepath = filepath
+        with self._connection:
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+
+    @classmethod
+    def loadf(cls, filepath, create=False):
+        if not create and not os.path.exists(filepath):
+            raise FileNotFoundError(filepath)
+        return cls(sqlite3.connect(filepath, check_same_thread=False),
+                   filepath=filepath)
+
+    @classmethod
+    def from_json(cls, filepath, json_filepath):
+        mind_maps = cls.loadf(filepath, create=True)
+        # With the changes still in the registry's journal.
+        mind_maps.import_mind_maps(
+            JournaledMindMaps.loadf(json_filepath, lazy=True))
+        return mind_maps
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    def close(self):
+        self._connection.close()
+
+    def dumpf(self, filepath=None):
+        # Every change is committed as it happens, so this only exports.
+        if filepath is not None and filepath != self.filepath:
+            MindMaps(dict(self.items())).dumpf(filepath)
+
+    def import_mind_maps(self, mind_maps):
+        # Maps already in the database are kept as they are.  Returns the
+        # number of maps imported.
+        rows = ((key, mind_map.created_timestamp,
+                 mind_map.modified_timestamp)
+                for key, mind_map in mind_maps.items())
+        with self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO mind_maps (path, created, modified) '
+                'VALUES (?, ?, ?)', rows)
+            return self._connection.total_changes - before
+
+    def add(self, key):
+        self[key] = MindMap.create()
+
+    def most_recent(self, count):
+        # Keys of the ``count`` most recently modified maps, newest first.
+        cursor = self._connection.execute(
+            'SELECT path FROM mind_maps ORDER BY modified DESC LIMIT ?',
+            (count,))
+        return [path for path, in cursor]
+
+    def __getitem__(self, key):
+        row = self._connection.execute(
+            'SELECT created, modified FROM mind_maps WHERE path = ?',
+            (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        mind_map = MindMap.from_timestamps(*row)
+        mind_map.on_touch = functools.partial(self._touched, key)
+        return mind_map
+
+    def __iter__(self):
+        cursor = self._connection.execute(
+            'SELECT path FROM mind_maps ORDER BY rowid')
+        return (path for path, in cursor)
+
+    def __len__(self):
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM mind_maps').fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connection.execute(
+            'SELECT 1 FROM mind_maps WHERE path = ?',
+            (key,)).fetchone() is not None
+
+    def __delitem__(self, key):
+        with self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM mind_maps WHERE path = ?', (key,))
+        if not cursor.rowcount:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if not isinstance(value, MindMap):
+            raise TypeError('Value must be of type MindMap')
+        try:
+            with self._connection:
+                self._connection.execute(
+                    'INSERT INTO mind_maps (path, created, modified) '
+                    'VALUES (?, ?, ?)',
+                    (key, value.created_timestamp,
+                     value.modified_timestamp))
+        except sqlite3.IntegrityError:
+            raise TypeError(
+                'Replacing an existing MindMap is not allowed') from None
+        value.on_touch = functools.partial(self._touched, key)
+
+    def _touched(self, key, mind_map):
+        with self._connection:
+            self._connection.execute(
+                'UPDATE mind_maps SET modified = ? WHERE path = ?',
+                (mind_map.modified_timestamp, key))
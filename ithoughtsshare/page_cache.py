@@ -0,0 +1,181 @@
+# pylint: disable=missing-docstring
+
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+import hashlib
+import json
+import logging as log
+import os
+import threading
+import time
+
+from ithoughtsshare.web_page import PageContent
+
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+class CacheEntry(namedtuple('CacheEntry', ('url', 'content', 'etag',
+                                           'last_modified', 'expires'))):
+    # pylint: disable=too-few-public-methods
+    __slots__ = ()
+
+    def is_fresh(self, now=None):
+        now = now if now is not None else _now()
+        return self.expires is not None and now < self.expires
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache():
+    # Keeps the extracted content of fetched pages, one small JSON file per
+    # URL, together with what is needed to revalidate it.  The least
+    # recently used entries are evicted once ``max_bytes`` is exceeded.
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self._log = log.getLogger(type(self).__name__)
+        self._directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def log(self):
+        return self._log
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, 'r') as handle:
+                record = json.load(handle)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if record.get('url') != url:
+            return None
+        return CacheEntry(
+            url=url,
+            content=PageContent(record['raw_title'], tuple(record['blocks'])),
+            etag=record['etag'],
+            last_modified=record['last_modified'],
+            expires=record['expires'])
+
+    def store(self, url, content, headers):
+        entry = entry_from_headers(url, content, headers)
+        if entry is not None:
+            self.put(entry)
+        return entry
+
+    def refresh(self, entry, headers):
+        # A ``304 Not Modified`` carries updated freshness information and
+        # possibly new validators, but never a new body.
+        refreshed = entry_from_headers(entry.url, entry.content, headers)
+        if refreshed is None:
+            self.discard(entry.url)
+            return entry
+        refreshed = refreshed._replace(
+            etag=refreshed.etag or entry.etag,
+            last_modified=refreshed.last_modified or entry.last_modified)
+        self.put(refreshed)
+        return refreshed
+
+    def put(self, entry):
+        os.makedirs(self._directory, exist_ok=True)
+        record = {
+            'url': entry.url,
+            'raw_title': entry.content.raw_title,
+            'blocks': list(entry.content.blocks),
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'expires': entry.expires}
+        path = self._path(entry.url)
+        temp_path = '{}.{}.{}.tmp'.format(path, os.getpid(),
+                                          threading.get_ident())
+        with open(temp_path, 'w') as handle:
+            json.dump(record, handle)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def discard(self, url):
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        # Other threads or processes sharing the cache may remove entries
+        # while this one lists them.
+        entries = []
+        total = 0
+        with os.scandir(self._directory) as listing:
+            for item in listing:
+                if not item.name.endswith('.json'):
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.log.info('Evicting: %s', path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, digest + '.json')
+
+
+def entry_from_headers(url, content, headers, now=None):
+    now = now if now is not None else _now()
+    directives = parse_cache_control(headers.get('Cache-Control', ''))
+    if 'no-store' in directives:
+        return None
+    expires = None
+    if 'no-cache' in directives:
+        expires = now
+    elif 'max-age' in directives:
+        try:
+            max_age = int(directives['max-age'])
+            age = int(headers.get('Age', 0))
+        except ValueError:
+            max_age = age = 0
+        expires = now + max(max_age - age, 0)
+    elif 'Expires' in headers:
+        try:
+            expires = parsedate_to_datetime(headers['Expires']).timestamp()
+        except (TypeError, ValueError):
+            expires = now
+    entry = CacheEntry(url=url, content=content, etag=headers.get('ETag'),
+                       last_modified=headers.get('Last-Modified'),
+                       expires=expires)
+    if not entry.is_fresh(now) and not entry.validators():
+        return None
+    return entry
+
+
+def parse_cache_control(value):
+    directives = {}
+    for directive in value.split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def _now():
+    return time.time()
@@ -0,0 +1,358 @@
+# pylint: disable=missing-docstring
+
+from collections import namedtuple
+from concurrent.futures import Future
+from html.parser import HTMLParser
+import codecs
+import threading
+import time
+
+from ithoughtsshare.http_session import get_session
+
+
+MAX_BLOCKS = 5
+MAX_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+TIMEOUT = 15
+
+PageContent = namedtuple('PageContent', ('raw_title', 'blocks'))
+
+
+class FetchCancelled(Exception):
+    pass
+
+
+class WebPageNote():
+    def __init__(self, url, html=None, content=None, bytes_read=None,
+                 timings=None):
+        # pylint: disable=too-many-arguments
+        self._url = url
+        self._content = (content if content is not None
+                         else _soup_content(html))
+        self._bytes_read = bytes_read
+        # Seconds spent on each step of getting the note, see ``from_url``.
+        self.timings = dict(timings) if timings else {}
+
+    @classmethod
+    def from_url(cls, url, max_bytes=MAX_BYTES, chunk_size=CHUNK_SIZE,
+                 timeout=TIMEOUT, cache=None, session=None, cancel=None):
+        # pylint: disable=too-many-arguments,too-many-locals
+        start = time.perf_counter()
+        entry = cache.get(url) if cache is not None else None
+        if entry is not None and entry.is_fresh():
+            return cls(url, content=entry.content, bytes_read=0,
+                       timings={'cache': time.perf_counter() - start})
+        headers = entry.validators() if entry is not None else {}
+        session = session if session is not None else get_session()
+        with session.get(url, stream=True, timeout=timeout,
+                         headers=headers) as response:
+            connected = time.perf_counter()
+            if entry is not None and response.status_code == 304:
+                cache.refresh(entry, response.headers)
+                return cls(url, content=entry.content, bytes_read=0,
+                           timings={'fetch': connected - start})
+            note = cls.from_response(url, response, max_bytes=max_bytes,
+                                     chunk_size=chunk_size, cancel=cancel)
+            note.timings['fetch'] += connected - start
+            if cache is not None and response.status_code == 200:
+                stored = time.perf_counter()
+                cache.store(url, note.content, response.headers)
+                note.timings['cache'] = time.perf_counter() - stored
+            return note
+
+    @classmethod
+    def from_response(cls, url, response, max_bytes=MAX_BYTES,
+                      chunk_size=CHUNK_SIZE, cancel=None):
+        # pylint: disable=too-many-arguments
+        reader = ResponseReader(response, max_bytes=max_bytes,
+                                chunk_size=chunk_size, cancel=cancel)
+        note = cls.from_chunks(url, reader)
+        note._bytes_read = reader.bytes_read
+        return note
+
+    @classmethod
+    def from_chunks(cls, url, chunks):
+        # Time spent waiting on ``chunks`` counts as fetching, time spent in
+        # the parser as extracting.
+        extractor = PageExtractor()
+        timings = {'fetch': 0.0, 'extract': 0.0}
+        mark = time.perf_counter()
+        for chunk in chunks:
+            received = time.perf_counter()
+            timings['fetch'] += received - mark
+            extractor.feed(chunk)
+            mark = time.perf_counter()
+            timings['extract'] += mark - received
+            if extractor.done:
+                break
+        extractor.close()
+        return cls(url, content=extractor.content, timings=timings)
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def bytes_read(self):
+        return self._bytes_read
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def raw_title(self):
+        return self._content.raw_title
+
+    @property
+    def title(self):
+        return '# {}'.format(self.raw_title)
+
+    @property
+    def body(self):
+        description = '\n\n'.join(self._content.blocks)
+        return ('## {}\n\n{}\n\n_[quick link]({})_'
+                .format(self.raw_title, description, self.url))
+
+
+class ResponseReader():
+    # pylint: disable=too-few-public-methods
+    # Iterates over the decoded body of a ``stream=True`` response, stopping
+    # once ``max_bytes`` of the body have been read.  Whatever is not
+    # consumed is never downloaded.  Setting the ``cancel`` event aborts the
+    # read with ``FetchCancelled``.
+    def __init__(self, response, max_bytes=MAX_BYTES, chunk_size=CHUNK_SIZE,
+                 cancel=None):
+        self._response = response
+        self._cancel = cancel
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.truncated = False
+
+    def __iter__(self):
+        decoder = self._decoder()
+        for chunk in self._response.iter_content(self.chunk_size):
+            if self._cancel is not None and self._cancel.is_set():
+                raise FetchCancelled()
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.bytes_read += len(chunk)
+            yield decoder.decode(chunk)
+            if self.bytes_read >= self.max_bytes:
+                self.truncated = True
+                break
+        yield decoder.decode(b'', final=True)
+
+    def _decoder(self):
+        try:
+            factory = codecs.getincrementaldecoder(
+                self._response.encoding or 'utf-8')
+        except LookupError:
+            factory = codecs.getincrementaldecoder('utf-8')
+        return factory(errors='replace')
+
+
+class PagePrefetch():
+    # Fetches a page on a background thread so the download overlaps with
+    # whatever the user is doing in the meantime.
+    def __init__(self, url, **fetch_args):
+        self._url = url
+        self._fetch_args = fetch_args
+        self._cancel = threading.Event()
+        self._future = Future()
+
+    @classmethod
+    def start(cls, url, **fetch_args):
+        prefetch = cls(url, **fetch_args)
+        thread = threading.Thread(target=prefetch.run, daemon=True,
+                                  name='PagePrefetch')
+        thread.start()
+        return prefetch
+
+    @property
+    def url(self):
+        return self._url
+
+    def run(self):
+        if not self._future.set_running_or_notify_cancel():
+            return
+        try:
+            note = WebPageNote.from_url(self._url, cancel=self._cancel,
+                                        **self._fetch_args)
+        except BaseException as exception:  # pylint: disable=broad-except
+            self._future.set_exception(exception)
+        else:
+            self._future.set_result(note)
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    def cancel(self):
+        self._cancel.set()
+        self._future.cancel()
+
+
+def _strip(text):
+    return text.strip(' \t\n\r')
+
+
+def _soup_content(html):
+    # pylint: disable=import-outside-toplevel
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    blocks = []
+    for block in soup.find_all('p'):
+        text = _strip(block.text)
+        if not text:
+            continue
+        blocks.append(text)
+        if len(blocks) >= MAX_BLOCKS:
+            break
+    return PageContent(_strip(soup.title.text), tuple(blocks))
+
+
+class PageExtractor(HTMLParser):
+    # pylint: disable=too-many-instance-attributes
+    # Incremental stand-in for the ``BeautifulSoup`` extraction above.  It
+    # mirrors the ``html.parser`` tree builder closely enough to produce the
+    # same title and paragraph text, without building a tree, and flags
+    # ``done`` once the title and the first ``max_blocks`` non-empty
+    # paragraphs are complete.
+
+    # Same list ``bs4`` uses for tags that are never pushed on the stack.
+    void_elements = frozenset((
+        'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command',
+        'embed', 'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen',
+        'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer',
+        'track', 'wbr'))
+    # ``get_text()`` skips strings inside these.
+    hidden_elements = frozenset(('script', 'style', 'template'))
+    preserve_whitespace_elements = frozenset(('pre', 'textarea'))
+    ascii_spaces = frozenset(' \n\t\x0c\r')
+
+    def __init__(self, max_blocks=MAX_BLOCKS):
+        super().__init__()
+        self.max_blocks = max_blocks
+        self._stack = []
+        self._hidden = 0
+        self._preserve = 0
+        self._text = []
+        self._already_closed = []
+        self._title = None
+        self._title_done = False
+        self._paragraphs = []
+        self._next_paragraph = 0
+        self._blocks = []
+        self._done = False
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def content(self):
+        title = _strip(''.join(self._title)) if self._title is not None else ''
+        return PageContent(title, tuple(self._blocks[:self.max_blocks]))
+
+    def handle_starttag(self, tag, attrs, closing_tag_expected=True):
+        self._flush_text()
+        if tag in self.void_elements:
+            if closing_tag_expected:
+                # A later ``</br>`` for this tag is ignored entirely.
+                self._already_closed.append(tag)
+            return
+        parts = None
+        if tag == 'p':
+            parts = []
+            self._paragraphs.append(parts)
+        elif tag == 'title' and self._title is None:
+            parts = self._title = []
+        if tag in self.hidden_elements:
+            self._hidden += 1
+        if tag in self.preserve_whitespace_elements:
+            self._preserve += 1
+        self._stack.append((tag, parts))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, closing_tag_expected=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        # Like ``bs4``, an end tag closes everything opened after the matching
+        # start tag, and is ignored when there is no matching start tag.
+        if check_already_closed and tag in self._already_closed:
+            self._already_closed.remove(tag)
+            return
+        self._flush_text()
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                self._pop(index)
+                return
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        self._pop(0)
+
+    def _flush_text(self):
+        # ``bs4`` joins the text between two markup events into one string
+        # and collapses it to a single space or newline when it is only
+        # whitespace.
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        if self._hidden:
+            return
+        if not self._preserve and self.ascii_spaces.issuperset(text):
+            text = '\n' if '\n' in text else ' '
+        for _, parts in self._stack:
+            if parts is not None:
+                parts.append(text)
+
+    def _pop(self, index):
+        popped = self._stack[index:]
+        del self._stack[index:]
+        for tag, parts in popped:
+            if tag in self.hidden_elements:
+                self._hidden -= 1
+            if tag in self.preserve_whitespace_elements:
+                self._preserve -= 1
+            if parts is not None and parts is self._title:
+                self._title_done = True
+            elif parts is not None:
+                # A trailing ``None`` marks the paragraph as closed.
+                parts.append(None)
+        self._collect_blocks()
+        self._done = (self._title_done
+                      and len(self._blocks) >= self.max_blocks)
+
+    def _collect_blocks(self):
+        # Paragraphs are taken in start tag order, so stop at the first one
+        # that is still open.
+        paragraphs = self._paragraphs
+        while (self._next_paragraph < len(paragraphs)
+               and len(self._blocks) < self.max_blocks):
+            parts = paragraphs[self._next_paragraph]
+            if not parts or parts[-1] is not None:
+                break
+            text = _strip(''.join(parts[:-1]))
+            if text:
+                self._blocks.append(text)
+            paragraphs[self._next_paragraph] = None
+            self._next_paragraph += 1
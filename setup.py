@@ -56,6 +56,17 @@ setup(
         'beautifulsoup4>=4.7.1',
         'requests>=2.21.0',
     ],
+    entry_points={
+        'console_scripts': [
+            'ithoughts-share-batch = ithoughtsshare.batch:main',
+            'ithoughts-mind-maps-convert = '
+            'ithoughtsshare.mind_maps_binary:main',
+            'ithoughts-mind-maps-shard = '
+            'ithoughtsshare.mind_maps_sharded:main',
+            'ithoughts-mind-maps-import = '
+            'ithoughtsshare.mind_maps_import:main',
+        ],
+    },
     tests_require=_TEST_REQUIRE,
     extras_require={
         'ci': _CI_REQUIRE,
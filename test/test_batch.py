@@ -0,0 +1,102 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import io
+import threading
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare.batch import (
+    main,
+    read_urls,
+    share_urls,
+)
+from ithoughtsshare.ithoughts_notes import build_ithoughts_url
+from ithoughtsshare.web_page import (
+    PageContent,
+    WebPageNote,
+)
+
+
+MAP_PATH = '/Notes/Reading List'
+
+
+def fake_from_url(url, cache=None, session=None):
+    # pylint: disable=unused-argument
+    if 'broken' in url:
+        raise IOError('Connection refused')
+    return WebPageNote(url, content=PageContent('Title ' + url, ('Body',)))
+
+
+@pytest.fixture
+def from_url():
+    with mock.patch('ithoughtsshare.batch.WebPageNote.from_url',
+                    side_effect=fake_from_url) as mocked:
+        yield mocked
+
+
+def expected_url(url):
+    note = fake_from_url(url)
+    return build_ithoughts_url(MAP_PATH, note.title, note.url, note.body,
+                               create=False)
+
+
+# -----------------------------------------------------------------------------
+# share_urls()
+# -----------------------------------------------------------------------------
+def test_share_urls_keeps_order(from_url):
+    urls = ['https://example.com/{}'.format(index) for index in range(50)]
+    results = list(share_urls(urls, MAP_PATH, max_workers=4))
+    assert [result.url for result in results] == urls
+    assert [result.ithoughts_url for result in results] == [
+        expected_url(url) for url in urls]
+    assert all(result.error is None for result in results)
+    assert from_url.call_count == 50
+
+
+def test_share_urls_reports_errors(from_url):
+    # pylint: disable=unused-argument
+    results = list(share_urls(['https://a/', 'https://broken/', 'https://b/'],
+                              MAP_PATH))
+    assert [result.ithoughts_url is None for result in results] == [
+        False, True, False]
+    assert isinstance(results[1].error, IOError)
+
+
+def test_share_urls_is_concurrent():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def blocking_from_url(url, cache=None, session=None):
+        barrier.wait()
+        return fake_from_url(url, cache, session)
+
+    with mock.patch('ithoughtsshare.batch.WebPageNote.from_url',
+                    side_effect=blocking_from_url):
+        results = list(share_urls(['https://a/', 'https://b/', 'https://c/'],
+                                  MAP_PATH, max_workers=3))
+    assert all(result.error is None for result in results)
+
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+def test_read_urls():
+    handle = io.StringIO('# Reading list\nhttps://a/\n\n  https://b/  \n')
+    assert list(read_urls(handle)) == ['https://a/', 'https://b/']
+
+
+def test_main_prints_urls(from_url, tmpdir, capsys):
+    # pylint: disable=unused-argument
+    urls_file = tmpdir.join('urls.txt')
+    urls_file.write('https://a/\nhttps://b/\n')
+    assert main([MAP_PATH, str(urls_file)]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        expected_url('https://a/'), expected_url('https://b/')]
+
+
+@mock.patch('ithoughtsshare.batch.dispatch')
+def test_main_dispatches(mock_dispatch, from_url, tmpdir):
+    # pylint: disable=unused-argument
+    urls_file = tmpdir.join('urls.txt')
+    urls_file.write('https://a/\nhttps://broken/\n')
+    assert main([MAP_PATH, str(urls_file), '--dispatch']) == 1
+    mock_dispatch.assert_called_once_with(expected_url('https://a/'))
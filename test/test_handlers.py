@@ -0,0 +1,269 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+from datetime import (datetime, timezone)
+from unittest.mock import (
+    MagicMock,
+    Mock,
+    patch,
+)
+
+import pytest
+
+from ithoughtsshare.ithoughts_notes import (
+    Initializer,
+    IThoughtsDispatcher,
+    MapAdder,
+    MapPicker,
+    NoteEditor,
+    StateData,
+    mind_maps_path,
+)
+from ithoughtsshare.map_list import MapListDataSource
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_cache import clear_cache
+from ithoughtsshare.mind_maps_index import PathIndex
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+from ithoughtsshare.mind_maps_search import PathSearch
+from ithoughtsshare.mind_maps_sharded import ShardedMindMaps
+from ithoughtsshare.web_page import (
+    PageContent,
+    PagePrefetch,
+    WebPageNote,
+)
+
+
+URL = 'https://example.com/article'
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def state_data(tmpdir):
+    data = StateData()
+    data.initializer = {
+        'mind_maps_file': str(tmpdir.join('mind_maps.json')),
+        'page_cache_dir': str(tmpdir.join('page_cache')),
+        'input_url': URL}
+    data.url_editor = {'url': URL}
+    yield data
+    clear_cache()
+
+
+def panel_view(*names):
+    widgets = {name: Mock() for name in ('ok', 'cancel') + names}
+    view = MagicMock()
+    view.__getitem__.side_effect = widgets.__getitem__
+    return view
+
+
+def web_note(url, title):
+    return WebPageNote(url, content=PageContent(title, ('Body',)))
+
+
+# -----------------------------------------------------------------------------
+# Initializer
+# -----------------------------------------------------------------------------
+@patch('ithoughtsshare.web_page.PagePrefetch.start')
+@patch('ithoughtsshare.ithoughts_notes.get_input_url', return_value=URL)
+def test_initializer_starts_prefetch(_, mock_start, tmpdir):
+    state_data = StateData()
+    callback = Mock()
+    with patch('ithoughtsshare.ithoughts_notes.DEFAULT_CONFIG_DIR',
+               str(tmpdir)):
+        Initializer().handle(state_data, callback)
+    assert state_data.initializer['input_url'] == URL
+    assert mock_start.call_args[0] == (URL,)
+    assert state_data.prefetch is mock_start.return_value
+    assert callback.call_args[0] == ('FORWARD',)
+
+
+# -----------------------------------------------------------------------------
+# NoteEditor
+# -----------------------------------------------------------------------------
+@patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_note_editor_uses_prefetch(mock_from_url, state_data):
+    prefetch = Mock(PagePrefetch, url=URL)
+    prefetch.result.return_value = web_note(URL, 'Prefetched')
+    state_data.prefetch = prefetch
+    note = NoteEditor(view=Mock()).prefetched_note(state_data, URL)
+    assert note.raw_title == 'Prefetched'
+    assert state_data.prefetch is None
+    assert not prefetch.cancel.called
+    assert not mock_from_url.called
+
+
+def test_note_editor_discards_prefetch_for_edited_url(state_data):
+    prefetch = Mock(PagePrefetch, url='https://example.com/other')
+    state_data.prefetch = prefetch
+    assert NoteEditor(view=Mock()).prefetched_note(state_data, URL) is None
+    assert prefetch.cancel.called
+    assert not prefetch.result.called
+
+
+def test_note_editor_ignores_failed_prefetch(state_data):
+    prefetch = Mock(PagePrefetch, url=URL)
+    prefetch.result.side_effect = IOError('Connection refused')
+    state_data.prefetch = prefetch
+    assert NoteEditor(view=Mock()).prefetched_note(state_data, URL) is None
+
+
+@patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_note_editor_handle_without_prefetch(mock_from_url, state_data):
+    mock_from_url.return_value = web_note(URL, 'Fetched')
+    view = panel_view('title', 'url', 'body')
+    NoteEditor(view=view).handle(state_data, Mock())
+    assert mock_from_url.call_args[0] == (URL,)
+    assert view['title'].text == '# Fetched'
+    assert view['url'].text == URL
+    assert view.present.called
+
+
+# -----------------------------------------------------------------------------
+# MapPicker
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def map_picker():
+    # The later in this list, the more recently modified.
+    mind_maps = MindMaps()
+    keys = ('/Notes/Inbox', '/Notes/Work/Project X', '/Notes/Work',
+            '/Reading')
+    for day, key in enumerate(keys, 1):
+        modified = datetime(2019, 1, day, tzinfo=timezone.utc)
+        mind_maps[key] = MindMap(modified, modified)
+    return MapPicker(view=panel_view('map_list_table_view', 'add', 'search'),
+                     list_data_source=MapListDataSource(),
+                     mind_maps=mind_maps, form_dialog=Mock())
+
+
+def pick(map_picker, title):
+    source = map_picker.list_data_source
+    source.selected_row = [item['title'] for item in source.items].index(
+        title)
+    map_picker.select(source)
+
+
+def test_map_picker_shows_folders(map_picker, state_data):
+    map_picker.recent_count = 2
+    map_picker.handle(state_data, Mock())
+    assert list(map_picker.list_data_source.items) == [
+        {'title': '/Reading', 'map_path': '/Reading'},
+        {'title': '/Notes/Work', 'map_path': '/Notes/Work'},
+        {'title': 'Notes', 'folder': 'Notes',
+         'accessory_type': 'disclosure_indicator'},
+        {'title': 'Reading', 'map_path': '/Reading'}]
+    pick(map_picker, 'Notes')
+    assert [item['title'] for item in map_picker.list_data_source.items] == [
+        '..', 'Inbox', 'Work', 'Work']
+    assert not map_picker.view['ok'].enabled
+    pick(map_picker, '..')
+    assert map_picker.folder == ''
+
+
+def test_map_picker_picks_map(map_picker, state_data):
+    map_picker.handle(state_data, Mock())
+    pick(map_picker, 'Notes')
+    pick(map_picker, 'Inbox')
+    assert map_picker.view['ok'].enabled
+    map_picker.handle_ok(None, state_data)
+    assert state_data.map_picker == {'map_path': '/Notes/Inbox'}
+
+
+def test_map_picker_search(map_picker, state_data):
+    map_picker.handle(state_data, Mock())
+    assert map_picker.view['search'].delegate is map_picker
+    map_picker.textfield_did_change(Mock(text='work'))
+    items = map_picker.list_data_source.items
+    assert [item['map_path'] for item in items] == [
+        '/Notes/Work', '/Notes/Work/Project X']
+    pick(map_picker, '/Notes/Work')
+    assert map_picker.view['ok'].enabled
+    map_picker.textfield_did_change(Mock(text=' '))
+    assert map_picker.list_data_source.items[-2]['title'] == 'Notes'
+
+
+def test_map_adder_updates_picker_indexes(map_picker, state_data):
+    map_picker.mind_maps.dumpf(state_data.initializer['mind_maps_file'])
+    map_picker.mind_maps = None
+    map_picker.handle(state_data, Mock())
+    MapAdder(view=Mock()).add_to_mind_maps(
+        state_data.initializer['mind_maps_file'], '/Notes/Archive',
+        mind_maps=state_data.mind_maps)
+    assert map_picker.search_index.search('archive') == ['/Notes/Archive']
+    assert 'Archive' in map_picker.path_index.children('/Notes')
+
+
+def test_map_picker_reuses_indexes(map_picker, state_data):
+    map_picker.mind_maps.dumpf(state_data.initializer['mind_maps_file'])
+    map_picker.mind_maps = None
+    map_picker.handle(state_data, Mock())
+    path_index = map_picker.path_index
+    search_index = map_picker.search_index
+    recent_maps = map_picker.recent_maps
+    with patch.object(PathIndex, 'of') as path_index_of, \
+            patch.object(PathSearch, 'of') as path_search_of:
+        map_picker.handle(state_data, Mock())
+        other = MapPicker(view=panel_view('map_list_table_view', 'add',
+                                          'search'),
+                          list_data_source=MapListDataSource(),
+                          form_dialog=Mock())
+        other.handle(state_data, Mock())
+    assert not path_index_of.called
+    assert not path_search_of.called
+    assert other.path_index is path_index
+    assert other.search_index is search_index
+    assert other.recent_maps is recent_maps
+    MapAdder(view=Mock()).add_to_mind_maps(
+        state_data.initializer['mind_maps_file'], '/Notes/Archive')
+    assert 'Archive' in other.path_index.children('/Notes')
+    assert other.search_index.search('archive') == ['/Notes/Archive']
+
+
+def test_map_adder_shares_cached_mind_maps(map_picker, state_data):
+    map_picker.mind_maps.dumpf(state_data.initializer['mind_maps_file'])
+    map_picker.mind_maps = None
+    map_picker.handle(state_data, Mock())
+    MapAdder(view=Mock()).add_to_mind_maps(
+        state_data.initializer['mind_maps_file'], '/Notes/Archive')
+    assert map_picker.search_index.search('archive') == ['/Notes/Archive']
+
+
+def test_mind_maps_path(tmpdir):
+    config_dir = str(tmpdir)
+    assert mind_maps_path(config_dir) == str(tmpdir.join('mind_maps.json'))
+    ShardedMindMaps.loadf(str(tmpdir.join('mind_maps')), create=True).add(
+        '/Notes/Inbox')
+    assert mind_maps_path(config_dir) == str(tmpdir.join('mind_maps'))
+
+
+# -----------------------------------------------------------------------------
+# IThoughtsDispatcher
+# -----------------------------------------------------------------------------
+@patch('ithoughtsshare.ithoughts_notes.dispatch')
+def test_ithoughts_dispatcher_touches_map(mock_dispatch, map_picker,
+                                          state_data):
+    map_picker.mind_maps.dumpf(state_data.initializer['mind_maps_file'])
+    map_picker.mind_maps = None
+    map_picker.handle(state_data, Mock())
+    state_data.map_picker = {'map_path': '/Notes/Inbox'}
+    state_data.note_editor = {'title': '# Title', 'url': URL, 'body': ''}
+    callback = Mock()
+    IThoughtsDispatcher().handle(state_data, callback)
+    assert mock_dispatch.called
+    callback.assert_called_once_with('FORWARD')
+    assert map_picker.recent_maps.most_recent(1) == ['/Notes/Inbox']
+    reloaded = JournaledMindMaps.loadf(
+        state_data.initializer['mind_maps_file'])
+    assert reloaded['/Notes/Inbox'].modified.year > 2019
+
+
+@patch('ithoughtsshare.ithoughts_notes.dispatch')
+def test_ithoughts_dispatcher_unknown_map(mock_dispatch, state_data):
+    state_data.map_picker = {'map_path': '/Missing'}
+    state_data.note_editor = {'title': '# Title', 'url': URL, 'body': ''}
+    callback = Mock()
+    IThoughtsDispatcher().handle(state_data, callback)
+    assert mock_dispatch.called
+    callback.assert_called_once_with('FORWARD')
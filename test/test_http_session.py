@@ -0,0 +1,53 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import pytest
+
+from ithoughtsshare import http_session
+from ithoughtsshare.http_session import (
+    close_session,
+    configure_session,
+    create_session,
+    get_session,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_session():
+    configure_session()
+    yield
+    configure_session()
+
+
+def test_create_session_defaults():
+    adapter = create_session().get_adapter('https://example.com/')
+    assert adapter.max_retries.total == http_session.DEFAULT_RETRIES
+    assert (adapter.max_retries.backoff_factor
+            == http_session.DEFAULT_BACKOFF_FACTOR)
+    # pylint: disable=protected-access
+    assert adapter._pool_maxsize == http_session.DEFAULT_POOL_MAXSIZE
+    assert adapter._pool_block
+
+
+def test_create_session_settings():
+    session = create_session(retries=0, backoff_factor=2, pool_maxsize=1)
+    for prefix in ('http://example.com/', 'https://example.com/'):
+        adapter = session.get_adapter(prefix)
+        assert adapter.max_retries.total == 0
+        assert adapter.max_retries.backoff_factor == 2
+        assert adapter._pool_maxsize == 1  # pylint: disable=protected-access
+
+
+def test_get_session_is_shared():
+    assert get_session() is get_session()
+
+
+def test_configure_session_replaces_shared_session():
+    session = get_session()
+    configure_session(retries=7)
+    assert get_session() is not session
+    assert get_session().get_adapter('https://x/').max_retries.total == 7
+
+
+def test_close_session():
+    session = get_session()
+    close_session()
+    assert get_session() is not session
@@ -0,0 +1,59 @@
+# pylint: disable=missing-docstring
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='-X importtime needs Python 3.7')
+
+# Only needed on the paths that fetch or parse pages, or dispatch notes.
+NETWORK_MODULES = ('requests', 'urllib3', 'bs4')
+HEAVY_MODULES = NETWORK_MODULES + ('webbrowser', 'concurrent.futures')
+
+
+def imported_modules(module):
+    # Returns the modules that ``import module`` loaded, according to
+    # ``-X importtime``, leaving out whatever the interpreter itself
+    # imported on start up.
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        name = line.rsplit('|', 1)[1][1:]
+        if name.strip() == 'site':
+            modules = []
+        else:
+            modules.append(name.strip())
+    return modules
+
+
+def matching(modules, packages):
+    return sorted(name for name in modules
+                  if any(name == package or name.startswith(package + '.')
+                         for package in packages))
+
+
+@pytest.mark.parametrize('module', (
+    'ithoughtsshare',
+    'ithoughtsshare.ithoughts_notes',
+    'ithoughtsshare.mind_maps',
+))
+def test_start_up_imports_stay_light(module):
+    modules = imported_modules(module)
+    assert module in modules
+    assert matching(modules, HEAVY_MODULES) == []
+
+
+def test_package_import_is_trivial():
+    assert imported_modules('ithoughtsshare') == ['ithoughtsshare']
+
+
+def test_web_page_defers_network_and_soup():
+    modules = imported_modules('ithoughtsshare.web_page')
+    assert 'ithoughtsshare.web_page' in modules
+    assert matching(modules, NETWORK_MODULES) == []
@@ -0,0 +1,110 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import itertools
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from ithoughtsshare.instrumentation import (
+    NullTracer,
+    Tracer,
+)
+from ithoughtsshare.ithoughts_notes import (
+    Finisher,
+    State,
+    StateData,
+    StateDispatcher,
+)
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def clock():
+    # Every reading of the clock advances it by one second.
+    return Mock(side_effect=itertools.count())
+
+
+@pytest.fixture
+def tracer(clock):
+    return Tracer(clock=clock)
+
+
+# -----------------------------------------------------------------------------
+# Tracer
+# -----------------------------------------------------------------------------
+def test_tracer_states_and_steps(tracer):
+    tracer.add('ignored', 1.0)
+    tracer.enter_state('FIRST')                 # 1
+    with tracer.span('fetch'):                  # 2, 3
+        pass
+    tracer.add('fetch', 0.5)
+    tracer.enter_state('SECOND')                # 4
+    tracer.finish()                             # 5
+    assert tracer.states == [
+        {'state': 'FIRST', 'start': 1, 'seconds': 3,
+         'steps': {'fetch': {'seconds': 1.5, 'count': 2}}},
+        {'state': 'SECOND', 'start': 4, 'seconds': 1, 'steps': {}}]
+    assert tracer.trace()['seconds'] == 4
+
+
+def test_tracer_span_records_on_error(tracer):
+    tracer.enter_state('FIRST')
+    with pytest.raises(ValueError):
+        with tracer.span('parse'):
+            raise ValueError('Broken')
+    assert tracer.states[0]['steps']['parse']['count'] == 1
+
+
+def test_tracer_memory_peak():
+    tracer = Tracer(trace_memory=True)
+    tracer.enter_state('ALLOCATING')
+    data = bytearray(4 * 1024 * 1024)
+    del data
+    tracer.enter_state('IDLE')
+    tracer.finish()
+    assert tracer.states[0]['memory_peak'] >= 4 * 1024 * 1024
+    assert tracer.states[1]['memory_peak'] < 4 * 1024 * 1024
+
+
+def test_tracer_finish_writes_trace(clock, tmpdir):
+    trace_file = os.path.join(str(tmpdir), 'trace.json')
+    tracer = Tracer(filepath=trace_file, clock=clock)
+    tracer.enter_state('FIRST')
+    tracer.finish()
+    with open(trace_file, 'r') as handle:
+        assert json.load(handle) == json.loads(tracer.dumps())
+
+
+def test_null_tracer():
+    tracer = NullTracer()
+    tracer.enter_state('FIRST')
+    with tracer.span('fetch'):
+        tracer.add('parse', 1.0)
+    tracer.finish()
+
+
+# -----------------------------------------------------------------------------
+# StateDispatcher
+# -----------------------------------------------------------------------------
+def test_state_dispatcher_traces_states(tracer):
+    def handle(state_data, callback):
+        with state_data.tracer.span('work'):
+            pass
+        callback('FORWARD' if state_data.tracer.states[-1]['state']
+                 != State.pick_mind_map else 'CANCEL')
+
+    handler = Mock(handle=Mock(side_effect=handle))
+    state_data = StateData()
+    state_dispatcher = StateDispatcher(
+        state_data=state_data, initializer=handler, map_picker=handler,
+        canceler=Mock(Finisher), tracer=tracer)
+    assert state_data.tracer is tracer
+    assert state_dispatcher.run_until_end() == State.cancel
+    assert [state['state'] for state in tracer.states] == [
+        State.initialize, State.pick_mind_map, State.cancel]
+    assert all(state['seconds'] is not None for state in tracer.states)
+    assert set(tracer.states[0]['steps']) == {'handler_setup', 'handle',
+                                              'work'}
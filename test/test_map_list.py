@@ -0,0 +1,101 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+from unittest.mock import Mock
+
+import pytest
+
+from ithoughtsshare import map_list
+from ithoughtsshare.map_list import (
+    FolderRows,
+    MapListDataSource,
+)
+from ithoughtsshare.mind_maps_index import PathIndex
+
+
+HEAD = [{'title': '..', 'folder': ''}]
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def path_index():
+    keys = ['/Notes/Map {:03}'.format(number) for number in range(250)]
+    keys += ['/Notes/Work', '/Notes/Work/Project X', '/Reading']
+    return PathIndex(keys)
+
+
+@pytest.fixture
+def cursor_step(monkeypatch):
+    monkeypatch.setattr(map_list, 'CURSOR_STEP', 7)
+
+
+@pytest.fixture
+def page_size(monkeypatch):
+    monkeypatch.setattr(map_list, 'PAGE_SIZE', 10)
+    monkeypatch.setattr(map_list, 'MAX_PAGES', 2)
+
+
+# -----------------------------------------------------------------------------
+# FolderRows
+# -----------------------------------------------------------------------------
+def test_folder_rows(path_index):
+    rows = FolderRows(path_index, 'Notes', HEAD)
+    assert len(rows) == 253
+    assert rows[0] == HEAD[0]
+    assert rows[1] == {'title': 'Map 000', 'map_path': '/Notes/Map 000'}
+    assert rows[-2:] == [
+        {'title': 'Work', 'folder': 'Notes/Work',
+         'accessory_type': 'disclosure_indicator'},
+        {'title': 'Work', 'map_path': '/Notes/Work'}]
+    with pytest.raises(IndexError):
+        rows[253]  # pylint: disable=pointless-statement
+
+
+@pytest.mark.usefixtures('cursor_step')
+def test_folder_rows_slices_from_cursors(path_index):
+    rows = FolderRows(path_index, 'Notes', HEAD)
+    expected = list(rows)
+    assert len(expected) == len(rows)
+    for start in range(0, len(rows), 5):
+        assert rows[start:start + 9] == expected[start:start + 9]
+    assert rows[::50] == expected[::50]
+
+
+def test_folder_rows_follow_index(path_index):
+    rows = FolderRows(path_index)
+    assert [row['title'] for row in rows] == ['Notes', 'Reading']
+    path_index.add('/Archive')
+    assert len(rows) == 3
+    assert rows[0]['map_path'] == '/Archive'
+
+
+# -----------------------------------------------------------------------------
+# MapListDataSource
+# -----------------------------------------------------------------------------
+@pytest.mark.usefixtures('page_size')
+def test_data_source_pages_rows():
+    items = Mock()
+    items.__len__ = Mock(return_value=100)
+    items.__getitem__ = Mock(
+        side_effect=lambda rows: list(range(100))[rows])
+    source = MapListDataSource(items)
+    tableview = Mock()
+    assert source.tableview_number_of_rows(tableview, 0) == 100
+    assert [source.item(row) for row in range(25)] == list(range(25))
+    assert items.__getitem__.call_count == 3
+    assert source.item(5) == 5
+    assert items.__getitem__.call_count == 4
+    source.items = [1, 2]
+    tableview.reload.assert_called_once_with()
+    assert source.item(1) == 2
+
+
+def test_data_source_selects_row():
+    source = MapListDataSource([{'title': 'Map'}])
+    source.action = Mock()
+    source.tableview_did_select(Mock(), 0, 0)
+    assert source.selected_row == 0
+    source.action.assert_called_once_with(source)
+    source.items = []
+    assert source.selected_row == -1
+    assert not source.tableview_can_delete(Mock(), 0, 0)
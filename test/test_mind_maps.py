@@ -1,12 +1,19 @@
 # pylint: disable=missing-docstring,redefined-outer-name
+import json
 import os
+import shutil
+import threading
 from unittest import mock
-from datetime import (datetime, timezone)
+from datetime import (datetime, timedelta, timezone)
 import pytest
 
+from ithoughtsshare import mind_maps as mind_maps_module
 from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
     MindMap,
     MindMaps,
+    fromisoformat,
+    read_generation,
     utcnow,
 )
 
@@ -57,6 +64,13 @@ def mind_maps(mind_maps_json_file):
     return MindMaps.loadf(mind_maps_json_file)
 
 
+@pytest.fixture
+def shared_file(mind_maps_json_file, tmpdir):
+    target = os.path.join(str(tmpdir), 'shared.json')
+    shutil.copy(mind_maps_json_file, target)
+    return target
+
+
 # -----------------------------------------------------------------------------
 # MindMaps
 # -----------------------------------------------------------------------------
@@ -114,6 +128,59 @@ def test_mind_maps_dumps(mind_maps, mind_maps_json):
     assert dumped_string == mind_maps_json
 
 
+def test_mind_maps_loadf_lazy(mind_maps_json_file, fixed_created,
+                              fixed_modified, fixed_now):
+    sample = MindMaps.loadf(mind_maps_json_file, lazy=True)
+    assert list(sample) == ['created/created', 'created/modified',
+                            'created/other', 'modified/other']
+    assert 'created/other' in sample
+    with mock.patch('ithoughtsshare.mind_maps.fromisoformat') as decode:
+        assert 'missing' not in sample
+        assert len(sample) == 4
+        decode.assert_not_called()
+    validate_small_mind_maps(sample, fixed_created, fixed_modified, fixed_now)
+
+
+def test_mind_maps_loadf_lazy_dumpf(mind_maps_json_file, mind_maps_json,
+                                    tmpdir, fixed_now):
+    tmpfile = os.path.join(tmpdir, 'mind_maps+output.json')
+    with open(tmpfile, 'w') as handle:
+        handle.write(mind_maps_json)
+    sample = MindMaps.loadf(tmpfile, lazy=True)
+    assert sample.dumps() == mind_maps_json
+    sample.add('new/map')
+    sample.dumpf()
+    del sample['created/created']
+    reloaded = MindMaps.loadf(tmpfile)
+    assert set(reloaded) == set(MindMaps.loadf(mind_maps_json_file)) | {
+        'new/map'}
+    assert sample['created/other'].modified == fixed_now
+
+
+@pytest.mark.parametrize('content', [
+    '{}',
+    ' { "a\\u00e9\\"b": {"created": "2008-03-28T08:15:46+00:00",'
+    ' "modified": "2008-03-28T08:15:46+00:00"} } ',
+    '{"a": {"created": "2008-03-28T08:15:46+00:00",'
+    ' "modified": "2008-03-28T08:15:46+00:00", "extra": {}}}',
+])
+def test_mind_maps_loadf_lazy_layouts(content, tmpdir):
+    tmpfile = os.path.join(tmpdir, 'mind_maps+output.json')
+    with open(tmpfile, 'w') as handle:
+        handle.write(content)
+    expected = MindMaps.loads(content)
+    sample = MindMaps.loadf(tmpfile, lazy=True)
+    assert dict(sample.items()) == dict(expected.items())
+
+
+def test_mind_maps_loadf_lazy_invalid(tmpdir):
+    tmpfile = os.path.join(tmpdir, 'mind_maps+output.json')
+    with open(tmpfile, 'w'):
+        pass
+    with pytest.raises(ValueError):
+        MindMaps.loadf(tmpfile, lazy=True)
+
+
 def validate_small_mind_maps(sample, fixed_created, fixed_modified, fixed_now):
     assert len(sample) == 4
     assert sample['created/created'].created == fixed_created
@@ -159,6 +226,219 @@ def test_mind_maps_add(mind_maps):
     assert isinstance(mind_maps['something/new/here'], MindMap)
 
 
+@mock.patch('ithoughtsshare.mind_maps.utcnow')
+def test_mind_maps_subscribe(mock_utcnow, mind_maps, fixed_now):
+    mock_utcnow.return_value = fixed_now
+    events = []
+    mind_maps.subscribe(lambda *event: events.append(event))
+    mind_maps.add('something/new/here')
+    new_mind_map = mind_maps['something/new/here']
+    mind_maps['created/created'].touch()
+    touched = mind_maps['created/created']
+    del mind_maps['created/created']
+    touched.touch()
+    assert events == [
+        ('add', 'something/new/here', new_mind_map),
+        ('touch', 'created/created', touched),
+        ('delete', 'created/created', touched)]
+
+
+def test_mind_maps_unsubscribe(mind_maps):
+    events = []
+    listener = events.append
+    mind_maps.subscribe(listener)
+    mind_maps.unsubscribe(listener)
+    mind_maps.add('something/new/here')
+    assert not events
+
+
+# -----------------------------------------------------------------------------
+# MindMaps, concurrent writers
+# -----------------------------------------------------------------------------
+def test_mind_maps_commit_generation(shared_file):
+    mind_maps = MindMaps.loadf(shared_file)
+    assert mind_maps.generation == 0
+    mind_maps.add('new')
+    mind_maps.dumpf()
+    mind_maps.dumpf()
+    assert mind_maps.generation == read_generation(shared_file) == 2
+    assert MindMaps.loadf(shared_file).generation == 2
+    assert not [name for name in os.listdir(os.path.dirname(shared_file))
+                if name.endswith('.tmp')]
+
+
+def test_mind_maps_commit_merges(shared_file):
+    first = MindMaps.loadf(shared_file, lazy=True)
+    second = MindMaps.loadf(shared_file)
+    events = []
+    second.subscribe(lambda event, key, _: events.append((event, key)))
+    first.add('first/new')
+    del first['created/created']
+    first['created/other'].touch()
+    second.add('second/new')
+    second['modified/other'].touch()
+    first.dumpf()
+    second.dumpf()
+    assert events == [
+        ('add', 'second/new'), ('touch', 'modified/other'),
+        ('delete', 'created/created'), ('add', 'first/new')]
+    assert second.generation == 2
+    merged = MindMaps.loadf(shared_file)
+    assert dict(merged) == dict(second)
+    assert sorted(merged) == ['created/modified', 'created/other',
+                              'first/new', 'modified/other', 'second/new']
+    assert merged['created/other'] == first['created/other']
+    assert merged['modified/other'] == second['modified/other']
+
+
+def test_mind_maps_commit_merges_same_map(shared_file, fixed_created):
+    first = MindMaps.loadf(shared_file)
+    second = MindMaps.loadf(shared_file)
+    late = MindMap(fixed_created + timedelta(days=1),
+                   fixed_created + timedelta(days=2))
+    first['new'] = late
+    second['new'] = MindMap(fixed_created, fixed_created)
+    first.dumpf()
+    second.dumpf()
+    assert MindMaps.loadf(shared_file)['new'] == MindMap(
+        fixed_created, late.modified)
+
+
+def test_mind_maps_commit_unloaded_replaces(shared_file, mind_map):
+    MindMaps.loadf(shared_file).dumpf()
+    MindMaps({'only': mind_map}, filepath=shared_file).dumpf()
+    assert list(MindMaps.loadf(shared_file)) == ['only']
+    assert read_generation(shared_file) == 2
+
+
+def test_mind_maps_commit_retries(shared_file):
+    first = MindMaps.loadf(shared_file)
+    second = MindMaps.loadf(shared_file)
+    first.add('first/new')
+    second.add('second/new')
+    dump = first._dump  # pylint: disable=protected-access
+
+    def racing_dump(filepath, file_format):
+        # The second writer commits while the first is serializing.
+        if not second.generation:
+            second.dumpf()
+        dump(filepath, file_format)
+
+    first._dump = racing_dump  # pylint: disable=protected-access
+    first.dumpf()
+    assert first.generation == 2
+    assert {'first/new', 'second/new'} <= set(MindMaps.loadf(shared_file))
+
+
+def test_mind_maps_commit_threads(shared_file):
+    def write(number):
+        mind_maps = MindMaps.loadf(shared_file, lazy=True)
+        mind_maps.add('thread/{}'.format(number))
+        mind_maps.dumpf()
+
+    threads = [threading.Thread(target=write, args=(number,))
+               for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    mind_maps = MindMaps.loadf(shared_file)
+    assert len(mind_maps) == 12
+    assert mind_maps.generation == 8
+
+
+# -----------------------------------------------------------------------------
+# MindMaps, JSON serialization
+# -----------------------------------------------------------------------------
+def reference_json(mind_maps):
+    # What ``json.dump(..., sort_keys=True, indent=2)`` makes of the maps.
+    return json.dumps({key: {'created': mind_map.created.isoformat(),
+                             'modified': mind_map.modified.isoformat()}
+                       for key, mind_map in mind_maps.items()},
+                      sort_keys=True, indent=2)
+
+
+@pytest.fixture
+def varied_mind_maps(fixed_created, fixed_modified):
+    offset = timezone(timedelta(hours=-5, minutes=-30))
+    mind_maps = MindMaps()
+    for number, key in enumerate(['b', 'a', 'Caf\u00e9/"quoted"\\', 'a/b',
+                                  '\U0001f600', 'tab\there', 'B']):
+        created = fixed_created + timedelta(seconds=number)
+        mind_maps[key] = MindMap(created, fixed_modified.astimezone(offset))
+    return mind_maps
+
+
+def test_mind_maps_dumps_matches_json(varied_mind_maps):
+    assert varied_mind_maps.dumps() == reference_json(varied_mind_maps)
+    assert MindMaps().dumps() == json.dumps({}, indent=2)
+
+
+def test_mind_maps_dumps_raw_entries(tmpdir):
+    data = {'z': {'created': '2008-03-28T08:15:46Z',
+                  'modified': '2008-03-28T08:15:46Z'},
+            'extra': {'created': '2008-03-28T08:15:46+00:00',
+                      'modified': '2008-03-28T08:15:46+00:00',
+                      'note': ['a', {'b': 1}]}}
+    tmpfile = str(tmpdir.join('raw.json'))
+    with open(tmpfile, 'w') as handle:
+        json.dump(data, handle)
+    mind_maps = MindMaps.loadf(tmpfile, lazy=True)
+    assert mind_maps.dumps() == json.dumps(data, sort_keys=True, indent=2)
+    mind_maps['z']  # pylint: disable=pointless-statement
+    data['z'] = {'created': '2008-03-28T08:15:46+00:00',
+                 'modified': '2008-03-28T08:15:46+00:00'}
+    assert mind_maps.dumps() == json.dumps(data, sort_keys=True, indent=2)
+
+
+def test_mind_maps_dumps_binary_entries(varied_mind_maps, tmpdir):
+    tmpfile = str(tmpdir.join('mind_maps.bin'))
+    varied_mind_maps.dumpf(tmpfile, file_format=FORMAT_BINARY)
+    mind_maps = MindMaps.loadf(tmpfile, lazy=True)
+    assert mind_maps.dumps() == reference_json(
+        MindMaps.loadf(tmpfile))
+
+
+def test_mind_maps_dumps_only_changes(varied_mind_maps):
+    # pylint: disable=protected-access
+    mind_maps = varied_mind_maps
+    mind_maps.dumps()
+    encode = mock.Mock(wraps=mind_maps_module._encode_entry)
+    with mock.patch.object(mind_maps_module, '_encode_entry', encode):
+        assert mind_maps.dumps() == reference_json(mind_maps)
+        assert not encode.called
+        mind_maps['a'].touch()
+        mind_maps.add('aa')
+        del mind_maps['b']
+        assert mind_maps.dumps() == reference_json(mind_maps)
+        assert sorted(call[0][0] for call in encode.call_args_list) == [
+            'a', 'aa']
+
+
+def test_mind_maps_dumps_touch_after_insert(fixed_created, fixed_modified):
+    mind_maps = MindMaps()
+    inserted = MindMap(fixed_created, fixed_modified)
+    added = MindMap(fixed_created, fixed_modified)
+    mind_maps['/x'] = inserted
+    mind_maps.add_all([('/y', added)])
+    first = mind_maps.dumps()
+    listener = mock.Mock()
+    mind_maps.subscribe(listener)
+    inserted.touch()
+    added.touch()
+    assert listener.call_count == 2
+    assert mind_maps.dumps() != first
+    assert mind_maps.dumps() == reference_json(mind_maps)
+
+
+def test_mind_maps_dumpf_chunks(varied_mind_maps, tmpdir, monkeypatch):
+    monkeypatch.setattr(mind_maps_module, '_JSON_CHUNK', 2)
+    tmpfile = str(tmpdir.join('mind_maps.json'))
+    varied_mind_maps.dumpf(tmpfile)
+    with open(tmpfile, 'r') as handle:
+        assert handle.read() == reference_json(varied_mind_maps)
+
+
 # -----------------------------------------------------------------------------
 # MindMap
 # -----------------------------------------------------------------------------
@@ -195,6 +475,26 @@ def test_mind_map_immutable(mind_map):
         mind_map['foo_bar'] = 'ha ha ha'
 
 
+def test_mind_map_compact(mind_map):
+    assert not hasattr(mind_map, '__dict__')
+    assert mind_map.created_timestamp == 993491613000078
+    assert mind_map.created.tzinfo is timezone.utc
+    assert MindMap.from_timestamps(mind_map.created_timestamp,
+                                   mind_map.modified_timestamp) == mind_map
+    with pytest.raises(KeyError):
+        mind_map['foo_bar']  # pylint: disable=pointless-statement
+
+
+def test_mind_map_keeps_timezone():
+    data = ('{"a": {"created": "2008-03-28T08:15:46-05:30",'
+            ' "modified": "2008-03-28T08:15:46.000001+02:00"}}')
+    mind_maps = MindMaps.loads(data)
+    assert mind_maps['a'].created.utcoffset() == -timedelta(hours=5,
+                                                            minutes=30)
+    assert (mind_maps.dumps().replace('\n', '').replace(' ', '')
+            == data.replace(' ', ''))
+
+
 # -----------------------------------------------------------------------------
 # utcnow()
 # -----------------------------------------------------------------------------
@@ -202,3 +502,39 @@ def test_utcnow():
     now = datetime.now(timezone.utc)
     delta = (now - utcnow()).total_seconds()
     assert abs(delta) < 5
+
+
+# -----------------------------------------------------------------------------
+# fromisoformat()
+# -----------------------------------------------------------------------------
+ISOFORMAT_CASES = [
+    ('2001-06-25T17:53:33.000078+00:00',
+     datetime(2001, 6, 25, 17, 53, 33, 78, tzinfo=TZ)),
+    ('2008-03-28T08:15:46+00:00', datetime(2008, 3, 28, 8, 15, 46, tzinfo=TZ)),
+    ('2008-03-28T08:15:46.5+0000',
+     datetime(2008, 3, 28, 8, 15, 46, 500000, tzinfo=TZ)),
+    ('2008-03-28T08:15:46-05:30',
+     datetime(2008, 3, 28, 8, 15, 46,
+              tzinfo=timezone(-timedelta(hours=5, minutes=30)))),
+]
+
+
+@pytest.mark.parametrize('native', [True, False])
+@pytest.mark.parametrize('string,expected', ISOFORMAT_CASES)
+def test_fromisoformat(string, expected, native, monkeypatch):
+    if not native:
+        monkeypatch.setattr('ithoughtsshare.mind_maps._NATIVE_FROMISOFORMAT',
+                            None)
+    value = fromisoformat(string)
+    assert value == expected
+    assert value.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.parametrize('string', [
+    '2008-03-28T08:15:46',
+    '2008-03-28 08:15',
+    'yesterday',
+])
+def test_fromisoformat_invalid(string):
+    with pytest.raises(ValueError):
+        fromisoformat(string)
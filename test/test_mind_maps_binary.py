@@ -0,0 +1,129 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import os
+import shutil
+import struct
+
+import pytest
+
+from ithoughtsshare import mind_maps_binary
+from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), 'resources')
+
+
+@pytest.fixture
+def json_file(tmpdir):
+    return shutil.copy(os.path.join(RESOURCE_DIR, 'mind_maps_small.json'),
+                       str(tmpdir))
+
+
+@pytest.fixture
+def binary_file(json_file, tmpdir):
+    target = os.path.join(str(tmpdir), 'mind_maps.bin')
+    MindMaps.loadf(json_file).dumpf(target, file_format=FORMAT_BINARY)
+    return target
+
+
+def read(path, mode='r'):
+    with open(path, mode) as handle:
+        return handle.read()
+
+
+def write(path, data):
+    with open(path, 'wb') as handle:
+        handle.write(data)
+
+
+# -----------------------------------------------------------------------------
+# Format
+# -----------------------------------------------------------------------------
+def test_binary_layout(binary_file):
+    data = read(binary_file, 'rb')
+    assert data[:4] == b'ITMM'
+    assert struct.unpack('<HHI', data[4:12]) == (1, 0, 4)
+    paths = len('created/created') + len('created/modified') + len(
+        'created/other') + len('modified/other')
+    assert len(data) == 12 + 4 * 4 + paths + 2 * 8 * 4
+
+
+def test_binary_round_trip(json_file, binary_file):
+    expected = MindMaps.loadf(json_file)
+    mind_maps = MindMaps.loadf(binary_file)
+    assert mind_maps.file_format == FORMAT_BINARY
+    assert list(mind_maps) == list(expected)
+    assert dict(mind_maps.items()) == dict(expected.items())
+    assert mind_maps.dumps() == read(json_file)
+    assert MindMaps.loadf(binary_file, lazy=True).dumps() == read(json_file)
+
+
+def test_binary_dumpf_keeps_format(binary_file):
+    mind_maps = MindMaps.loadf(binary_file, lazy=True)
+    mind_maps.add('new/été')
+    mind_maps.dumpf()
+    reloaded = MindMaps.loadf(binary_file)
+    assert reloaded.file_format == FORMAT_BINARY
+    assert 'new/été' in reloaded
+    assert len(reloaded) == 5
+
+
+def test_binary_journaled_compaction(binary_file):
+    mind_maps = JournaledMindMaps.loadf(binary_file, compact_threshold=1)
+    mind_maps.add('new/map')
+    assert read(binary_file, 'rb')[:4] == b'ITMM'
+    assert 'new/map' in JournaledMindMaps.loadf(binary_file)
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:8],
+    lambda data: data[:-1],
+    lambda data: data[:4] + struct.pack('<H', 2) + data[6:],
+])
+def test_binary_invalid(binary_file, damage):
+    write(binary_file, damage(read(binary_file, 'rb')))
+    with pytest.raises(ValueError):
+        MindMaps.loadf(binary_file)
+
+
+def test_dumpf_unknown_format(json_file):
+    with pytest.raises(ValueError):
+        MindMaps.loadf(json_file).dumpf(file_format='yaml')
+
+
+# -----------------------------------------------------------------------------
+# Converter
+# -----------------------------------------------------------------------------
+def test_convert_both_ways(json_file, tmpdir):
+    binary_file = os.path.join(str(tmpdir), 'converted.bin')
+    json_copy = os.path.join(str(tmpdir), 'converted.json')
+    assert mind_maps_binary.convert(json_file, binary_file) == FORMAT_BINARY
+    assert mind_maps_binary.convert(binary_file, json_copy) == FORMAT_JSON
+    assert read(json_copy) == read(json_file)
+
+
+def test_convert_journaled(json_file, tmpdir):
+    mind_maps = JournaledMindMaps.loadf(json_file)
+    mind_maps.add('/Notes/Journaled')
+    binary_file = os.path.join(str(tmpdir), 'converted.bin')
+    mind_maps_binary.convert(json_file, binary_file)
+    converted = MindMaps.loadf(binary_file)
+    assert sorted(converted) == sorted(mind_maps)
+    assert converted['/Notes/Journaled'] == mind_maps['/Notes/Journaled']
+    only_journal = os.path.join(str(tmpdir), 'new.json')
+    JournaledMindMaps.loadf(only_journal, create=True).add('/Notes/New')
+    mind_maps_binary.convert(only_journal, binary_file)
+    assert list(MindMaps.loadf(binary_file)) == ['/Notes/New']
+
+
+def test_main(json_file, tmpdir):
+    target = os.path.join(str(tmpdir), 'converted.json')
+    assert mind_maps_binary.main([json_file, target, '--to', 'json']) == 0
+    assert read(target) == read(json_file)
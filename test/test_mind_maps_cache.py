@@ -0,0 +1,94 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import pytest
+
+from ithoughtsshare.mind_maps import MindMaps
+from ithoughtsshare.mind_maps_cache import (
+    clear_cache,
+    file_state,
+    get_mind_maps,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+from ithoughtsshare.mind_maps_sharded import ShardedMindMaps
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def mind_maps_file(tmpdir):
+    filepath = str(tmpdir.join('mind-maps.json'))
+    mind_maps = MindMaps(filepath=filepath)
+    mind_maps.add('/Notes/Inbox')
+    mind_maps.dumpf()
+    yield filepath
+    clear_cache()
+
+
+# -----------------------------------------------------------------------------
+# get_mind_maps()
+# -----------------------------------------------------------------------------
+def test_get_mind_maps_is_cached(mind_maps_file, tmpdir):
+    mind_maps = get_mind_maps(mind_maps_file)
+    assert isinstance(mind_maps, JournaledMindMaps)
+    assert list(mind_maps) == ['/Notes/Inbox']
+    with tmpdir.as_cwd():
+        assert get_mind_maps('mind-maps.json') is mind_maps
+
+
+def test_get_mind_maps_after_writes(mind_maps_file):
+    mind_maps = get_mind_maps(mind_maps_file)
+    mind_maps.add('/Notes/Work')
+    mind_maps['/Notes/Inbox'].touch()
+    assert get_mind_maps(mind_maps_file) is mind_maps
+    mind_maps.dumpf()
+    assert get_mind_maps(mind_maps_file) is mind_maps
+    assert file_state(mind_maps_file)[1][1] == 0
+
+
+def test_get_mind_maps_reloads_changed_files(mind_maps_file):
+    mind_maps = get_mind_maps(mind_maps_file)
+    other = JournaledMindMaps.loadf(mind_maps_file)
+    other.add('/Reading')
+    reloaded = get_mind_maps(mind_maps_file)
+    assert reloaded is not mind_maps
+    assert '/Reading' in reloaded
+    assert mind_maps.on_write is None
+
+
+def test_get_mind_maps_creates_missing(tmpdir):
+    filepath = str(tmpdir.join('missing.json'))
+    mind_maps = get_mind_maps(filepath)
+    assert not mind_maps
+    assert file_state(filepath) == (None, None)
+    mind_maps.add('/Notes/Inbox')
+    assert get_mind_maps(filepath) is mind_maps
+    clear_cache()
+    assert get_mind_maps(filepath) is not mind_maps
+    clear_cache()
+
+
+def test_get_mind_maps_after_concurrent_writes(mind_maps_file):
+    mind_maps = get_mind_maps(mind_maps_file)
+    mind_maps.add('/A/1')
+    other = JournaledMindMaps.loadf(mind_maps_file)
+    other.add('/B/1')
+    mind_maps.add('/A/2')
+    reloaded = get_mind_maps(mind_maps_file)
+    assert reloaded is not mind_maps
+    assert {'/A/1', '/A/2', '/B/1'} <= set(reloaded)
+    reloaded.add('/A/3')
+    assert get_mind_maps(mind_maps_file) is reloaded
+
+
+def test_get_mind_maps_sharded_after_concurrent_writes(mind_maps_file,
+                                                       tmpdir):
+    directory = str(tmpdir.join('shards'))
+    ShardedMindMaps.from_file(directory, mind_maps_file)
+    mind_maps = get_mind_maps(directory)
+    mind_maps.add('/Notes/A')
+    other = ShardedMindMaps.loadf(directory)
+    other.add('/Notes/B')
+    mind_maps.add('/Work/A')
+    reloaded = get_mind_maps(directory)
+    assert reloaded is not mind_maps
+    assert {'/Notes/A', '/Notes/B', '/Work/A'} <= set(reloaded)
@@ -0,0 +1,255 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+from datetime import (datetime, timezone)
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare import mind_maps_sharded
+from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_cache import (
+    clear_cache,
+    get_mind_maps,
+)
+from ithoughtsshare.mind_maps_import import (
+    CONFLICT_DUPLICATE,
+    CONFLICT_EXISTS,
+    CONFLICT_INVALID,
+    SOURCE_OPML,
+    SOURCE_REGISTRY,
+    SOURCE_TEXT,
+    Conflict,
+    detect_format,
+    import_maps,
+    is_valid_map_path,
+    main,
+    read_source,
+)
+from ithoughtsshare.mind_maps_index import PathIndex
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+from ithoughtsshare.mind_maps_sharded import ShardedMindMaps
+
+
+OPML = '''<?xml version="1.0" encoding="UTF-8"?>
+<opml version="2.0">
+  <head><title>Team maps</title></head>
+  <body>
+    <outline text="Notes">
+      <outline text="Inbox"/>
+      <outline text="Caf&#233;"/>
+    </outline>
+    <outline text="Reading"/>
+  </body>
+</opml>
+'''
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def fixed_time():
+    return datetime(2008, 3, 28, 8, 15, 46, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def registry_file(tmpdir):
+    filepath = str(tmpdir.join('mind_maps.json'))
+    mind_maps = JournaledMindMaps.loadf(filepath, create=True)
+    mind_maps.add('/Notes/Inbox')
+    yield filepath
+    clear_cache()
+
+
+@pytest.fixture
+def text_file(tmpdir):
+    filepath = tmpdir.join('maps.txt')
+    filepath.write('# Team maps\n/Notes/Inbox\n\n  /Notes/Work  \n'
+                   '/Notes//Empty\n/Reading\n/Reading\n')
+    return str(filepath)
+
+
+@pytest.fixture
+def opml_file(tmpdir):
+    filepath = tmpdir.join('maps.opml')
+    filepath.write_text(OPML, encoding='utf-8')
+    return str(filepath)
+
+
+# -----------------------------------------------------------------------------
+# import_maps()
+# -----------------------------------------------------------------------------
+def test_import_maps(fixed_time):
+    mind_maps = MindMaps()
+    mind_maps.add('/Notes/Inbox')
+    path_index = PathIndex.of(mind_maps)
+    mind_map = MindMap(fixed_time, fixed_time)
+    with mock.patch('ithoughtsshare.mind_maps_import.utcnow',
+                    return_value=fixed_time):
+        report = import_maps(mind_maps, [
+            ('/Notes/Work', None), ('/Notes/Inbox', None), ('', None),
+            ('/Reading', mind_map), ('/Notes/Work', mind_map)])
+    assert report.added == ['/Notes/Work', '/Reading']
+    assert report.conflicts == [Conflict('/Notes/Inbox', CONFLICT_EXISTS),
+                                Conflict('', CONFLICT_INVALID),
+                                Conflict('/Notes/Work', CONFLICT_DUPLICATE)]
+    assert mind_maps['/Reading'] is mind_map
+    assert mind_maps['/Notes/Work'].created == fixed_time
+    assert path_index.children('/Notes') == ['Inbox', 'Work']
+
+
+def test_import_maps_dry_run():
+    mind_maps = MindMaps()
+    report = import_maps(mind_maps, [('/Notes/Inbox', None)], dry_run=True)
+    assert report.added == ['/Notes/Inbox']
+    assert not mind_maps
+
+
+def test_import_maps_single_write(registry_file):
+    # pylint: disable=protected-access
+    mind_maps = JournaledMindMaps.loadf(registry_file)
+    with mock.patch.object(JournaledMindMaps, '_write_records',
+                           wraps=mind_maps._write_records) as write:
+        import_maps(mind_maps, (('/Map {}'.format(number), None)
+                                for number in range(10)))
+    assert write.call_count == 1
+    assert mind_maps.journal_length == 11
+    assert len(JournaledMindMaps.loadf(registry_file)) == 11
+    with mock.patch.object(JournaledMindMaps, '_write_records') as write, \
+            mock.patch.object(JournaledMindMaps, 'compact',
+                              wraps=mind_maps.compact) as compact:
+        import_maps(mind_maps, (('/Other {}'.format(number), None)
+                                for number in range(2000)))
+    assert not write.called
+    assert compact.call_count == 1
+    assert mind_maps.journal_length == 0
+    assert len(MindMaps.loadf(registry_file)) == 2011
+
+
+def test_import_maps_saves_plain_registry(tmpdir):
+    filepath = str(tmpdir.join('plain.json'))
+    mind_maps = MindMaps(filepath=filepath)
+    with mock.patch.object(MindMaps, 'dumpf',
+                           wraps=mind_maps.dumpf) as dumpf:
+        import_maps(mind_maps, [('/Notes/Inbox', None), ('/Reading', None)])
+    assert dumpf.call_count == 1
+    assert sorted(MindMaps.loadf(filepath)) == ['/Notes/Inbox', '/Reading']
+
+
+@pytest.mark.parametrize('key,valid', [
+    ('/Notes/Inbox', True),
+    ('Notes/Inbox', True),
+    ('/Café notes/Map', True),
+    ('', False),
+    ('/', False),
+    ('/Notes/', False),
+    ('/Notes//Inbox', False),
+    ('/Notes/ /Inbox', False),
+    ('/Notes/../Inbox', False),
+    ('/Notes/Tab\there', False),
+    (None, False),
+])
+def test_is_valid_map_path(key, valid):
+    assert is_valid_map_path(key) == valid
+
+
+# -----------------------------------------------------------------------------
+# MindMaps.add_all()
+# -----------------------------------------------------------------------------
+def test_add_all_is_atomic(fixed_time):
+    mind_maps = MindMaps()
+    mind_maps.add('/Notes/Inbox')
+    mind_maps.dumps()
+    with pytest.raises(TypeError):
+        mind_maps.add_all([('/Notes/Work', MindMap(fixed_time, fixed_time)),
+                           ('/Notes/Inbox', MindMap(fixed_time, fixed_time))])
+    with pytest.raises(TypeError):
+        mind_maps.add_all([('/Notes/Work', {})])
+    assert list(mind_maps) == ['/Notes/Inbox']
+    mind_maps.add_all([('/A', MindMap(fixed_time, fixed_time))])
+    assert MindMaps.loads(mind_maps.dumps()).keys() == {'/A', '/Notes/Inbox'}
+
+
+def test_add_all_sharded(registry_file, tmpdir, fixed_time):
+    # pylint: disable=protected-access
+    directory = str(tmpdir.join('shards'))
+    JournaledMindMaps.loadf(registry_file).compact()
+    ShardedMindMaps.from_file(directory, registry_file)
+    mind_maps = ShardedMindMaps.loadf(directory)
+    with pytest.raises(TypeError):
+        mind_maps.add_all([('/Work/Map', MindMap(fixed_time, fixed_time)),
+                           ('/Notes/Inbox', MindMap(fixed_time, fixed_time))])
+    assert len(mind_maps) == 1
+    with mock.patch('ithoughtsshare.mind_maps_sharded._write_manifest',
+                    wraps=mind_maps_sharded._write_manifest) as write:
+        report = import_maps(mind_maps, [
+            ('/Work/Map', None), ('/Notes/Map', None), ('/Work/Other', None)])
+    assert write.call_count == 1
+    assert report.added == ['/Notes/Map', '/Work/Map', '/Work/Other']
+    reloaded = ShardedMindMaps.loadf(directory)
+    assert len(reloaded) == 4
+    assert sorted(reloaded) == ['/Notes/Inbox', '/Notes/Map', '/Work/Map',
+                                '/Work/Other']
+
+
+# -----------------------------------------------------------------------------
+# Sources
+# -----------------------------------------------------------------------------
+def test_read_text(text_file):
+    assert detect_format(text_file) == SOURCE_TEXT
+    assert list(read_source(text_file)) == [
+        ('/Notes/Inbox', None), ('/Notes/Work', None), ('/Notes//Empty', None),
+        ('/Reading', None), ('/Reading', None)]
+
+
+def test_read_opml(opml_file):
+    assert detect_format(opml_file) == SOURCE_OPML
+    assert list(read_source(opml_file)) == [
+        ('/Notes/Inbox', None), ('/Notes/Café', None),
+        ('/Reading', None)]
+
+
+def test_read_opml_without_body(tmpdir):
+    filepath = tmpdir.join('empty.opml')
+    filepath.write('<opml version="2.0"><head/></opml>')
+    with pytest.raises(ValueError):
+        list(read_source(str(filepath), SOURCE_OPML))
+
+
+@pytest.mark.parametrize('file_format', [None, FORMAT_BINARY])
+def test_read_registry(registry_file, tmpdir, fixed_time, file_format):
+    filepath = str(tmpdir.join('other'))
+    other = MindMaps(filepath=filepath)
+    other['/Reading'] = MindMap(fixed_time, fixed_time)
+    other.dumpf(file_format=file_format)
+    assert detect_format(filepath) == SOURCE_REGISTRY
+    assert detect_format(str(tmpdir)) == SOURCE_REGISTRY
+    entries = list(read_source(filepath))
+    assert [key for key, _ in entries] == ['/Reading']
+    assert entries[0][1].created == fixed_time
+    assert entries[0][1].on_touch is None
+    # With the journal replayed.
+    assert [key for key, _ in read_source(registry_file)] == ['/Notes/Inbox']
+
+
+def test_read_source_unknown(text_file):
+    with pytest.raises(ValueError):
+        read_source(text_file, 'csv')
+
+
+# -----------------------------------------------------------------------------
+# main()
+# -----------------------------------------------------------------------------
+def test_main(registry_file, text_file, capsys):
+    assert main([registry_file, text_file, '--dry-run']) == 0
+    assert list(get_mind_maps(registry_file)) == ['/Notes/Inbox']
+    clear_cache()
+    assert main([registry_file, text_file]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        'exists\t/Notes/Inbox', 'invalid\t/Notes//Empty',
+        'duplicate\t/Reading'] * 2
+    assert sorted(JournaledMindMaps.loadf(registry_file)) == [
+        '/Notes/Inbox', '/Notes/Work', '/Reading']
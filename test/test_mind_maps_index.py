@@ -0,0 +1,116 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import pytest
+
+from ithoughtsshare.mind_maps import MindMaps
+from ithoughtsshare.mind_maps_index import PathIndex
+
+
+KEYS = [
+    '/Notes/Inbox',
+    '/Notes/Work/Project X',
+    '/Notes/Work/Project Y',
+    '/Notes/Work',
+    '/Notes/Work x',
+    '/Reading',
+    'Reading/Later',
+]
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def index():
+    return PathIndex(KEYS)
+
+
+# -----------------------------------------------------------------------------
+# PathIndex
+# -----------------------------------------------------------------------------
+def test_children(index):
+    assert index.children() == ['Notes', 'Reading']
+    assert index.children('/Notes') == ['Inbox', 'Work', 'Work x']
+    assert index.children('Notes/') == ['Inbox', 'Work', 'Work x']
+    assert index.children('/Notes/Work') == ['Project X', 'Project Y']
+    assert index.children('/Notes/Inbox') == []
+    assert index.children('/Missing') == []
+
+
+def test_iter_children(index):
+    children = list(index.iter_children('/Notes'))
+    assert [child[1:] for child in children] == [
+        ('Inbox', ['/Notes/Inbox'], False),
+        ('Work', ['/Notes/Work'], True),
+        ('Work x', ['/Notes/Work x'], False)]
+    resumed = list(index.iter_children('/Notes', children[1][0]))
+    assert resumed == children[1:]
+    assert [child[1:] for child in index.iter_children()] == [
+        ('Notes', [], True), ('Reading', ['/Reading'], True)]
+
+
+def test_count(index):
+    assert index.count() == len(KEYS)
+    assert index.count('/Notes') == 5
+    assert index.count('/Notes/Work') == 3
+    assert index.count('/Notes/Wor') == 0
+    assert index.count('/Reading') == 2
+
+
+def test_child_count(index):
+    assert index.child_count() == 3
+    assert index.child_count('/Notes') == 4
+    assert index.child_count('/Notes/Work') == 2
+    assert index.child_count('/Reading') == 1
+    assert index.child_count('/Missing') == 0
+    index.add('/Notes/Archive/2019/Old')
+    assert index.child_count('/Notes') == 5
+    assert index.child_count('/Notes/Archive') == 1
+    index.discard('/Notes/Archive/2019/Old')
+    assert index.child_count('/Notes') == 4
+    assert not index.is_folder('/Notes/Archive')
+    index.discard('Reading/Later')
+    assert index.child_count() == 2
+    assert not index.is_folder('/Reading')
+
+
+def test_iter_prefix(index):
+    assert list(index.iter_prefix('/Notes/Work')) == [
+        '/Notes/Work', '/Notes/Work/Project X', '/Notes/Work/Project Y']
+    assert not list(index.iter_prefix('/Missing'))
+    assert sorted(index.iter_prefix()) == sorted(KEYS)
+
+
+def test_keys_and_folders(index):
+    assert index.keys('/Notes/Work') == ['/Notes/Work']
+    assert index.keys('/Reading') == ['/Reading']
+    assert index.keys('/Notes') == []
+    assert index.is_folder('/Notes')
+    assert index.is_folder('/Notes/Work')
+    assert not index.is_folder('/Notes/Work x')
+    assert not index.is_folder('/Missing')
+    assert not PathIndex().is_folder('')
+
+
+def test_add_and_discard(index):
+    version = index.version
+    index.add('/Notes/Archive/Old')
+    assert index.version > version
+    assert index.children('/Notes') == ['Archive', 'Inbox', 'Work', 'Work x']
+    index.discard('/Notes/Archive/Old')
+    index.discard('/Notes/Archive/Old')
+    assert index.children('/Notes') == ['Inbox', 'Work', 'Work x']
+    assert len(index) == len(KEYS)
+
+
+def test_of_follows_mind_maps():
+    mind_maps = MindMaps()
+    mind_maps.add('/Notes/Inbox')
+    index = PathIndex.of(mind_maps)
+    mind_maps.add('/Notes/Work')
+    assert index.children('/Notes') == ['Inbox', 'Work']
+    del mind_maps['/Notes/Inbox']
+    mind_maps['/Notes/Work'].touch()
+    assert list(index.iter_prefix()) == ['/Notes/Work']
+    index.close()
+    mind_maps.add('/Reading')
+    assert index.count() == 1
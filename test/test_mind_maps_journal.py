@@ -0,0 +1,210 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import os
+import shutil
+from datetime import (datetime, timezone)
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+
+
+TZ = timezone.utc
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def fixed_now():
+    return datetime(2008, 3, 28, 8, 15, 46, 0, tzinfo=TZ)
+
+
+@pytest.fixture
+def mind_maps_file(tmpdir):
+    source = os.path.join(os.path.dirname(__file__), 'resources',
+                          'mind_maps_small.json')
+    target = os.path.join(str(tmpdir), 'mind_maps.json')
+    shutil.copy(source, target)
+    return target
+
+
+def journal_lines(mind_maps_file):
+    with open(mind_maps_file + '.journal', 'r') as handle:
+        return handle.readlines()
+
+
+def read(path):
+    with open(path, 'r') as handle:
+        return handle.read()
+
+
+# -----------------------------------------------------------------------------
+# JournaledMindMaps
+# -----------------------------------------------------------------------------
+@mock.patch('ithoughtsshare.mind_maps.utcnow')
+def test_changes_are_appended(mock_utcnow, mind_maps_file, fixed_now):
+    mock_utcnow.return_value = fixed_now
+    snapshot = read(mind_maps_file)
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    mind_maps['created/created'].touch()
+    del mind_maps['modified/other']
+    assert read(mind_maps_file) == snapshot
+    assert journal_lines(mind_maps_file) == [
+        '{"created": "2008-03-28T08:15:46+00:00", "key": "/Notes/New", '
+        '"modified": "2008-03-28T08:15:46+00:00", "op": "add"}\n',
+        '{"key": "created/created", '
+        '"modified": "2008-03-28T08:15:46+00:00", "op": "touch"}\n',
+        '{"key": "modified/other", "op": "delete"}\n']
+    assert mind_maps.journal_length == 3
+
+
+def test_touch_after_insert_is_appended(mind_maps_file, fixed_now):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_map = MindMap(fixed_now, fixed_now)
+    mind_maps['/Notes/New'] = mind_map
+    mind_map.touch()
+    assert journal_lines(mind_maps_file)[-1].endswith('"op": "touch"}\n')
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert reloaded['/Notes/New'].modified == mind_map.modified
+
+
+def test_loadf_replays_journal(mind_maps_file, fixed_now):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    mind_maps['created/created'].touch()
+    del mind_maps['modified/other']
+
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert dict(reloaded) == dict(mind_maps)
+    assert reloaded['created/created'].modified >= fixed_now
+    assert reloaded.journal_length == 3
+    assert len(MindMaps.loadf(mind_maps_file)) == 4
+
+
+def test_loadf_ignores_torn_last_record(mind_maps_file):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    with open(mind_maps.journal_filepath, 'a') as handle:
+        handle.write('{"key": "/Notes/Torn", "op": "ad')
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert '/Notes/New' in reloaded
+    assert '/Notes/Torn' not in reloaded
+
+
+@pytest.mark.parametrize('reload_first', [True, False])
+def test_append_after_torn_record(mind_maps_file, reload_first):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    with open(mind_maps.journal_filepath, 'a') as handle:
+        handle.write('{"key": "/Notes/Torn", "op": "ad')
+    if reload_first:
+        mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/C')
+    mind_maps.add('/Notes/D')
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert {'/Notes/New', '/Notes/C', '/Notes/D'} <= set(reloaded)
+    assert '/Notes/Torn' not in reloaded
+    assert reloaded.journal_length == 3
+
+
+def test_loadf_create(tmpdir):
+    mind_maps_file = os.path.join(str(tmpdir), 'mind_maps.json')
+    with pytest.raises(FileNotFoundError):
+        JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file, create=True)
+    mind_maps.add('/Notes/New')
+    assert not os.path.exists(mind_maps_file)
+    assert list(JournaledMindMaps.loadf(mind_maps_file)) == ['/Notes/New']
+
+
+def test_compact(mind_maps_file):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    mind_maps.compact()
+    assert mind_maps.journal_length == 0
+    assert journal_lines(mind_maps_file) == []
+    assert read(mind_maps_file) == mind_maps.dumps()
+    assert dict(JournaledMindMaps.loadf(mind_maps_file)) == dict(mind_maps)
+
+
+def test_compact_threshold(mind_maps_file):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file, compact_threshold=3)
+    mind_maps.add('/Notes/1')
+    mind_maps.add('/Notes/2')
+    assert len(MindMaps.loadf(mind_maps_file)) == 4
+    mind_maps.add('/Notes/3')
+    assert len(MindMaps.loadf(mind_maps_file)) == 7
+    assert mind_maps.journal_length == 0
+
+
+def test_replay_after_interrupted_compaction(mind_maps_file):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    del mind_maps['created/created']
+    mind_maps['created/other'].touch()
+    journal = read(mind_maps.journal_filepath)
+    mind_maps.compact()
+    with open(mind_maps.journal_filepath, 'w') as handle:
+        handle.write(journal)
+    assert dict(JournaledMindMaps.loadf(mind_maps_file)) == dict(mind_maps)
+
+
+def test_dumpf_elsewhere(mind_maps_file, tmpdir):
+    mind_maps = JournaledMindMaps.loadf(mind_maps_file)
+    mind_maps.add('/Notes/New')
+    other_file = os.path.join(str(tmpdir), 'other.json')
+    mind_maps.dumpf(other_file)
+    assert mind_maps.journal_length == 1
+    assert read(other_file) == mind_maps.dumps()
+
+
+def test_compact_keeps_other_writers_records(mind_maps_file):
+    first = JournaledMindMaps.loadf(mind_maps_file)
+    second = JournaledMindMaps.loadf(mind_maps_file)
+    first.add('/Notes/First')
+    second.add('/Notes/Second')
+    del second['created/created']
+    first.compact()
+    assert journal_lines(mind_maps_file) == []
+    assert '/Notes/Second' in first
+    assert 'created/created' not in first
+    assert dict(MindMaps.loadf(mind_maps_file)) == dict(first)
+    second.add('/Notes/Third')
+    second.compact()
+    assert sorted(JournaledMindMaps.loadf(mind_maps_file)) == sorted(
+        set(first) | {'/Notes/Third'})
+
+
+def test_compact_keeps_other_writers_deletes(mind_maps_file):
+    first = JournaledMindMaps.loadf(mind_maps_file)
+    first.add('/Notes/X')
+    second = JournaledMindMaps.loadf(mind_maps_file)
+    assert '/Notes/X' in second
+    del second['/Notes/X']
+    first.add('/Notes/Y')
+    first.compact()
+    assert '/Notes/X' not in first
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert '/Notes/X' not in reloaded
+    assert '/Notes/Y' in reloaded
+
+
+def test_touch_after_merge_is_kept(mind_maps_file):
+    first = JournaledMindMaps.loadf(mind_maps_file, lazy=True)
+    mind_map = first['created/created']
+    second = JournaledMindMaps.loadf(mind_maps_file)
+    second.add('/Notes/Other')
+    second.compact()
+    first.compact()
+    assert first['created/created'] is mind_map
+    assert '/Notes/Other' in first
+    mind_map.touch()
+    first.compact()
+    reloaded = JournaledMindMaps.loadf(mind_maps_file)
+    assert reloaded['created/created'].modified == mind_map.modified
@@ -0,0 +1,138 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+from datetime import (datetime, timezone)
+from unittest import mock
+import json
+
+import pytest
+
+from ithoughtsshare.mind_maps import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MindMap,
+    MindMaps,
+)
+from ithoughtsshare.mind_maps_cache import (
+    clear_cache,
+    get_index,
+    get_mind_maps,
+)
+from ithoughtsshare.mind_maps_import import import_maps
+from ithoughtsshare.mind_maps_recent import (
+    RecentMaps,
+    recent_path,
+)
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def mind_maps(tmpdir):
+    # '/c' is the most recently modified, '/a' the least.
+    mind_maps = MindMaps.loadf(str(tmpdir.join('mind-maps.json')),
+                               create=True)
+    for day, key in enumerate(('/a', '/b', '/c'), 1):
+        modified = datetime(2019, 1, day, tzinfo=timezone.utc)
+        mind_maps[key] = MindMap(modified, modified)
+    return mind_maps
+
+
+# -----------------------------------------------------------------------------
+# RecentMaps
+# -----------------------------------------------------------------------------
+def test_use_orders_by_last_use():
+    recent = RecentMaps()
+    recent.use('/a', 3)
+    recent.use('/b', 1)
+    recent.use('/b', 2)
+    assert recent.most_recent(2) == ['/a', '/b']
+    assert recent.most_used(2) == ['/b', '/a']
+    assert recent.uses('/b') == 2
+    assert recent.uses('/missing') == 0
+
+
+def test_use_evicts_least_recent():
+    recent = RecentMaps(capacity=2)
+    recent.use('/a', 1)
+    recent.use('/b', 2)
+    recent.use('/c', 3)
+    assert '/a' not in recent
+    assert len(recent) == 2
+
+
+def test_discard():
+    recent = RecentMaps()
+    recent.use('/a', 1)
+    recent.discard('/a')
+    recent.discard('/a')
+    assert not recent.most_recent(1)
+
+
+def test_of_seeds_from_mind_maps(mind_maps):
+    recent = RecentMaps.of(mind_maps, capacity=2)
+    assert recent.most_recent(3) == ['/c', '/b']
+    assert recent.uses('/c') == 0
+    assert recent.filepath == recent_path(mind_maps.filepath)
+
+
+def test_of_follows_mind_maps(mind_maps):
+    recent = RecentMaps.of(mind_maps)
+    mind_maps['/a'].touch()
+    mind_maps.add('/d')
+    del mind_maps['/b']
+    assert recent.most_recent(4) == ['/d', '/a', '/c']
+    assert recent.uses('/a') == 1
+    recent.close()
+    mind_maps['/c'].touch()
+    assert recent.most_recent(1) == ['/d']
+
+
+def test_of_loads_stored_file(mind_maps):
+    RecentMaps.of(mind_maps).close()
+    mind_maps['/a'].touch()
+    recent = RecentMaps.of(mind_maps)
+    assert recent.most_recent(1) == ['/c']
+
+
+@pytest.mark.parametrize('file_format', [FORMAT_JSON, FORMAT_BINARY])
+def test_of_seeds_without_decoding(mind_maps, file_format):
+    # pylint: disable=protected-access
+    mind_maps.dumpf(file_format=file_format)
+    lazy = MindMaps.loadf(mind_maps.filepath, lazy=True)
+    recent = RecentMaps.of(lazy, capacity=2)
+    assert recent.most_recent(3) == ['/c', '/b']
+    assert not any(isinstance(value, MindMap)
+                   for value in lazy._data.values())
+
+
+def test_flush_once_per_write(mind_maps):
+    mind_maps.dumpf()
+    cached = get_mind_maps(mind_maps.filepath)
+    recent = get_index(cached, RecentMaps)
+    with mock.patch.object(RecentMaps, 'dumpf',
+                           wraps=recent.dumpf) as dumpf:
+        import_maps(cached, (('/new/{}'.format(number), None)
+                             for number in range(20)))
+        assert dumpf.call_count == 1
+        cached['/a'].touch()
+        assert dumpf.call_count == 2
+    with open(recent.filepath, 'r') as handle:
+        stored = json.load(handle)
+    assert stored['/a'][1] == 1
+    assert '/new/19' in stored
+    clear_cache()
+
+
+def test_close_flushes(mind_maps):
+    recent = RecentMaps.of(mind_maps)
+    mind_maps['/a'].touch()
+    assert RecentMaps.loadf(recent.filepath).most_recent(1) == ['/c']
+    recent.close()
+    assert RecentMaps.loadf(recent.filepath).most_recent(1) == ['/a']
+
+
+def test_loadf_ignores_unreadable_file(tmpdir):
+    filepath = tmpdir.join('mind-maps.json.recent')
+    filepath.write('not json')
+    assert not RecentMaps.loadf(str(filepath))
+    assert not RecentMaps.loadf(str(tmpdir.join('missing')))
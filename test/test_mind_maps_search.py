@@ -0,0 +1,69 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import pytest
+
+from ithoughtsshare.mind_maps import MindMaps
+from ithoughtsshare.mind_maps_search import PathSearch
+
+
+KEYS = [
+    '/Reading/Travel Plans',
+    '/Notes/Work/Project Y',
+    '/Notes/Work/Project X',
+    '/Reading/Python',
+    '/Notes/Inbox',
+    '/Notes/Work',
+]
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def search():
+    return PathSearch(KEYS)
+
+
+# -----------------------------------------------------------------------------
+# PathSearch
+# -----------------------------------------------------------------------------
+def test_search_exact_shortest_first(search):
+    assert search.search('work') == [
+        '/Notes/Work', '/Notes/Work/Project X', '/Notes/Work/Project Y']
+    assert search.search('WORK  project y') == ['/Notes/Work/Project Y']
+    assert search.search('notes', limit=2) == ['/Notes/Work', '/Notes/Inbox']
+
+
+def test_search_short_terms(search):
+    assert search.search('py') == ['/Reading/Python']
+    assert search.search('x') == ['/Notes/Inbox', '/Notes/Work/Project X']
+
+
+def test_search_typos(search):
+    assert search.search('pythn') == ['/Reading/Python']
+    assert search.search('travle plans')[0] == '/Reading/Travel Plans'
+    assert search.search('zzzz') == []
+    assert search.search('  ') == []
+
+
+def test_search_add_and_discard(search):
+    search.add('/Notes/Archive')
+    search.add('/Notes/Archive')
+    assert search.search('archive') == ['/Notes/Archive']
+    search.discard('/Notes/Archive')
+    search.discard('/Notes/Archive')
+    assert search.search('archive') == []
+    assert len(search) == len(KEYS)
+
+
+def test_search_of_follows_mind_maps():
+    mind_maps = MindMaps()
+    mind_maps.add('/Notes/Inbox')
+    search = PathSearch.of(mind_maps)
+    mind_maps.add('/Notes/Work')
+    # Added after the index was built, so ranked after older keys.
+    assert search.search('notes') == ['/Notes/Inbox', '/Notes/Work']
+    del mind_maps['/Notes/Inbox']
+    assert search.search('notes') == ['/Notes/Work']
+    search.close()
+    mind_maps.add('/Notes/Later')
+    assert search.search('later') == []
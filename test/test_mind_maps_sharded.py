@@ -0,0 +1,155 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import json
+import os
+
+import pytest
+
+from ithoughtsshare.mind_maps import MindMaps
+from ithoughtsshare.mind_maps_cache import (
+    clear_cache,
+    get_mind_maps,
+)
+from ithoughtsshare.mind_maps_index import PathIndex
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+from ithoughtsshare.mind_maps_sharded import (
+    MANIFEST,
+    ShardedMindMaps,
+    main,
+    shard_filename,
+    top_folder,
+)
+
+
+KEYS = ['/Notes/Inbox', '/Notes/Work', '/Reading', 'Reading/Later', '/Work']
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def registry_file(tmpdir):
+    filepath = str(tmpdir.join('mind_maps.json'))
+    mind_maps = MindMaps(filepath=filepath)
+    for key in KEYS:
+        mind_maps.add(key)
+    mind_maps.dumpf()
+    return filepath
+
+
+@pytest.fixture
+def directory(registry_file, tmpdir):
+    directory = str(tmpdir.join('mind_maps'))
+    ShardedMindMaps.from_file(directory, registry_file)
+    return directory
+
+
+def manifest(directory):
+    with open(os.path.join(directory, MANIFEST), 'r') as handle:
+        return json.load(handle)['shards']
+
+
+# -----------------------------------------------------------------------------
+# ShardedMindMaps
+# -----------------------------------------------------------------------------
+def test_from_file(directory, registry_file):
+    assert manifest(directory) == {
+        'Notes': {'file': shard_filename('Notes'), 'count': 2},
+        'Reading': {'file': shard_filename('Reading'), 'count': 2},
+        'Work': {'file': shard_filename('Work'), 'count': 1}}
+    shard = MindMaps.loadf(os.path.join(directory, shard_filename('Notes')))
+    assert sorted(shard) == ['/Notes/Inbox', '/Notes/Work']
+    mind_maps = ShardedMindMaps.loadf(directory)
+    assert len(mind_maps) == 5
+    assert not mind_maps.loaded_shards
+    assert dict(mind_maps) == dict(MindMaps.loadf(registry_file))
+
+
+def test_from_file_journaled(tmpdir):
+    filepath = str(tmpdir.join('journaled.json'))
+    mind_maps = JournaledMindMaps.loadf(filepath, create=True)
+    mind_maps.add('/Work/A')
+    directory = str(tmpdir.join('only_journal'))
+    assert list(ShardedMindMaps.from_file(directory, filepath)) == ['/Work/A']
+    mind_maps.compact()
+    mind_maps.add('/Work/B')
+    directory = str(tmpdir.join('with_journal'))
+    sharded = ShardedMindMaps.from_file(directory, filepath)
+    assert sorted(sharded) == ['/Work/A', '/Work/B']
+    assert sorted(ShardedMindMaps.loadf(directory)) == ['/Work/A', '/Work/B']
+
+
+def test_loads_only_needed_shards(directory):
+    mind_maps = ShardedMindMaps.loadf(directory)
+    assert '/Reading' in mind_maps
+    assert mind_maps['Reading/Later']
+    with pytest.raises(KeyError):
+        mind_maps['/Missing/Map']  # pylint: disable=pointless-statement
+    assert '/Missing' not in mind_maps
+    assert mind_maps.loaded_shards == ['Reading']
+
+
+def test_changes_write_their_shard(directory):
+    mind_maps = ShardedMindMaps.loadf(directory)
+    events = []
+    mind_maps.subscribe(lambda event, key, _: events.append((event, key)))
+    mind_maps.add('/Notes/New')
+    mind_maps['/Notes/Inbox'].touch()
+    mind_maps.add('/Archive/Old')
+    del mind_maps['/Work']
+    assert events == [('add', '/Notes/New'), ('touch', '/Notes/Inbox'),
+                      ('add', '/Archive/Old'), ('delete', '/Work')]
+    assert mind_maps.loaded_shards == ['Archive', 'Notes', 'Work']
+    assert {folder: entry['count']
+            for folder, entry in manifest(directory).items()} == {
+                'Archive': 1, 'Notes': 3, 'Reading': 2}
+    reloaded = ShardedMindMaps.loadf(directory)
+    assert len(reloaded) == 6
+    assert dict(reloaded) == dict(mind_maps)
+
+
+def test_dumpf(directory, tmpdir):
+    mind_maps = ShardedMindMaps.loadf(directory)
+    mind_maps.add('/Notes/New')
+    mind_maps.dumpf()
+    shard_path = os.path.join(directory, shard_filename('Notes'))
+    assert os.path.getsize(shard_path + '.journal') == 0
+    assert '/Notes/New' in MindMaps.loadf(shard_path)
+    export = str(tmpdir.join('export.json'))
+    mind_maps.dumpf(export)
+    assert dict(MindMaps.loadf(export)) == dict(mind_maps)
+
+
+def test_path_index_of(directory):
+    mind_maps = ShardedMindMaps.loadf(directory)
+    index = PathIndex.of(mind_maps)
+    mind_maps.add('/Notes/New')
+    assert index.children('/Notes') == ['Inbox', 'New', 'Work']
+
+
+def test_get_mind_maps(directory):
+    mind_maps = get_mind_maps(directory)
+    assert isinstance(mind_maps, ShardedMindMaps)
+    mind_maps.add('/Notes/New')
+    assert get_mind_maps(directory) is mind_maps
+    ShardedMindMaps.loadf(directory).add('/Reading/Other')
+    assert '/Reading/Other' in get_mind_maps(directory)
+    clear_cache()
+
+
+def test_loadf_missing(tmpdir):
+    with pytest.raises(FileNotFoundError):
+        ShardedMindMaps.loadf(str(tmpdir.join('missing')))
+    assert not ShardedMindMaps.loadf(str(tmpdir), create=True)
+
+
+def test_top_folder_and_filename():
+    assert top_folder('/Notes/Inbox') == 'Notes'
+    assert top_folder('Reading') == 'Reading'
+    assert shard_filename('Notes') != shard_filename('notes')
+    assert '/' not in shard_filename('A/B')
+
+
+def test_main(registry_file, tmpdir):
+    directory = str(tmpdir.join('shards'))
+    assert main([registry_file, directory]) == 0
+    assert len(ShardedMindMaps.loadf(directory)) == len(KEYS)
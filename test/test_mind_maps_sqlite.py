@@ -0,0 +1,143 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import os
+from datetime import (datetime, timezone)
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare.mind_maps import (
+    MindMap,
+    MindMaps,
+    from_timestamp,
+    to_timestamp,
+)
+from ithoughtsshare.mind_maps_journal import JournaledMindMaps
+from ithoughtsshare.mind_maps_sqlite import SqliteMindMaps
+
+
+TZ = timezone.utc
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def fixed_now():
+    return datetime(2008, 3, 28, 8, 15, 46, 0, tzinfo=TZ)
+
+
+@pytest.fixture
+def json_file():
+    return os.path.join(os.path.dirname(__file__), 'resources',
+                        'mind_maps_small.json')
+
+
+@pytest.fixture
+def database_file(tmpdir):
+    return os.path.join(str(tmpdir), 'mind_maps.sqlite')
+
+
+@pytest.fixture
+def mind_maps(database_file, json_file):
+    mind_maps = SqliteMindMaps.from_json(database_file, json_file)
+    yield mind_maps
+    mind_maps.close()
+
+
+# -----------------------------------------------------------------------------
+# Timestamps
+# -----------------------------------------------------------------------------
+def test_timestamp_round_trip():
+    value = datetime(2001, 6, 25, 17, 53, 33, 78, tzinfo=TZ)
+    assert to_timestamp(value) == 993491613000078
+    assert from_timestamp(to_timestamp(value)) == value
+
+
+# -----------------------------------------------------------------------------
+# SqliteMindMaps
+# -----------------------------------------------------------------------------
+def test_loadf_missing(database_file):
+    with pytest.raises(FileNotFoundError):
+        SqliteMindMaps.loadf(database_file)
+    mind_maps = SqliteMindMaps.loadf(database_file, create=True)
+    assert not mind_maps
+    assert mind_maps.filepath == database_file
+    mind_maps.close()
+
+
+def test_import_matches_json(mind_maps, json_file):
+    expected = MindMaps.loadf(json_file)
+    assert list(mind_maps) == list(expected)
+    assert len(mind_maps) == 4
+    assert dict(mind_maps.items()) == dict(expected.items())
+    assert mind_maps.import_mind_maps(expected) == 0
+
+
+def test_import_journaled(database_file, json_file, tmpdir):
+    registry_file = str(tmpdir.join('journaled.json'))
+    registry = JournaledMindMaps.loadf(registry_file, create=True)
+    registry.add('/Notes/Journaled')
+    mind_maps = SqliteMindMaps.from_json(database_file, registry_file)
+    assert list(mind_maps) == ['/Notes/Journaled']
+    mind_maps.close()
+    registry = JournaledMindMaps.loadf(json_file)
+    registry.dumpf(registry_file)
+    registry = JournaledMindMaps.loadf(registry_file)
+    registry.add('/Notes/Also journaled')
+    mind_maps = SqliteMindMaps.from_json(database_file, registry_file)
+    assert len(mind_maps) == 6
+    assert '/Notes/Also journaled' in mind_maps
+    mind_maps.close()
+
+
+def test_lookup(mind_maps):
+    assert 'created/other' in mind_maps
+    assert 'missing' not in mind_maps
+    assert mind_maps['created/modified'].modified == datetime(
+        2002, 4, 17, 21, 45, 27, 84, tzinfo=TZ)
+    with pytest.raises(KeyError):
+        mind_maps['missing']  # pylint: disable=pointless-statement
+
+
+@mock.patch('ithoughtsshare.mind_maps.utcnow')
+def test_add_and_touch(mock_utcnow, mind_maps, database_file, fixed_now):
+    mock_utcnow.return_value = fixed_now.replace(year=2010)
+    mind_maps.add('new/map')
+    mock_utcnow.return_value = fixed_now.replace(year=2011)
+    mind_maps['created/created'].touch()
+    mind_maps.close()
+
+    reopened = SqliteMindMaps.loadf(database_file)
+    assert reopened['new/map'] == MindMap(fixed_now.replace(year=2010),
+                                          fixed_now.replace(year=2010))
+    assert reopened['created/created'].modified == fixed_now.replace(
+        year=2011)
+    assert reopened.most_recent(2) == ['created/created', 'new/map']
+    reopened.close()
+
+
+@mock.patch('ithoughtsshare.mind_maps.utcnow')
+def test_touch_after_set(mock_utcnow, mind_maps, fixed_now):
+    mind_map = MindMap(fixed_now, fixed_now)
+    mind_maps['new/map'] = mind_map
+    mock_utcnow.return_value = fixed_now.replace(year=2011)
+    mind_map.touch()
+    assert mind_maps['new/map'].modified == fixed_now.replace(year=2011)
+
+
+def test_set_and_delete(mind_maps, fixed_now):
+    with pytest.raises(TypeError):
+        mind_maps['created/other'] = MindMap(fixed_now, fixed_now)
+    with pytest.raises(TypeError):
+        mind_maps['new/map'] = {'created': fixed_now, 'modified': fixed_now}
+    del mind_maps['created/other']
+    assert 'created/other' not in mind_maps
+    with pytest.raises(KeyError):
+        del mind_maps['created/other']
+
+
+def test_dumpf_exports_json(mind_maps, json_file, tmpdir):
+    export_file = os.path.join(str(tmpdir), 'export.json')
+    mind_maps.dumpf(export_file)
+    with open(export_file, 'r') as handle, open(json_file, 'r') as expected:
+        assert handle.read() == expected.read()
@@ -0,0 +1,174 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+from concurrent.futures import ThreadPoolExecutor
+import os
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare.page_cache import (
+    CacheEntry,
+    PageCache,
+    entry_from_headers,
+    parse_cache_control,
+)
+from ithoughtsshare.web_page import (
+    PageContent,
+    WebPageNote,
+)
+
+
+URL = 'https://example.com/article'
+NOW = 1000000.0
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def content():
+    return PageContent('Title', ('First', 'Second'))
+
+
+@pytest.fixture
+def page_cache(tmpdir):
+    return PageCache(os.path.join(str(tmpdir), 'page_cache'))
+
+
+class FakeResponse():
+    def __init__(self, status_code=200, headers=None, body=b''):
+        self.status_code = status_code
+        self.headers = headers if headers else {}
+        self.encoding = 'utf-8'
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size):
+        for index in range(0, len(self.body), chunk_size):
+            yield self.body[index:index + chunk_size]
+
+
+# -----------------------------------------------------------------------------
+# Header parsing
+# -----------------------------------------------------------------------------
+def test_parse_cache_control():
+    assert not parse_cache_control('')
+    assert parse_cache_control('No-Cache, max-age="60" ,private') == {
+        'no-cache': '', 'max-age': '60', 'private': ''}
+
+
+def test_entry_from_headers_max_age(content):
+    entry = entry_from_headers(
+        URL, content, {'Cache-Control': 'max-age=60', 'Age': '10'}, now=NOW)
+    assert entry.expires == NOW + 50
+    assert entry.is_fresh(NOW)
+    assert not entry.is_fresh(NOW + 50)
+
+
+def test_entry_from_headers_expires(content):
+    entry = entry_from_headers(
+        URL, content, {'Expires': 'Thu, 01 Jan 1970 00:20:00 GMT'}, now=NOW)
+    assert entry is None
+    entry = entry_from_headers(
+        URL, content, {'Expires': 'Thu, 01 Jan 1970 00:20:00 GMT'}, now=0)
+    assert entry.expires == 1200
+
+
+def test_entry_from_headers_no_store(content):
+    headers = {'Cache-Control': 'no-store, max-age=60', 'ETag': '"x"'}
+    assert entry_from_headers(URL, content, headers, now=NOW) is None
+
+
+def test_entry_from_headers_no_cache(content):
+    headers = {'Cache-Control': 'no-cache, max-age=60', 'ETag': '"x"'}
+    entry = entry_from_headers(URL, content, headers, now=NOW)
+    assert not entry.is_fresh(NOW)
+    assert entry.validators() == {'If-None-Match': '"x"'}
+
+
+def test_entry_from_headers_nothing_to_revalidate(content):
+    assert entry_from_headers(URL, content, {}, now=NOW) is None
+
+
+# -----------------------------------------------------------------------------
+# PageCache
+# -----------------------------------------------------------------------------
+def test_page_cache_round_trip(page_cache, content):
+    entry = CacheEntry(URL, content, '"x"', 'Wed, 21 Oct 2015 07:28:00 GMT',
+                       NOW)
+    assert page_cache.get(URL) is None
+    page_cache.put(entry)
+    assert page_cache.get(URL) == entry
+    page_cache.discard(URL)
+    assert page_cache.get(URL) is None
+
+
+def test_page_cache_evicts_least_recently_used(page_cache, content):
+    # pylint: disable=protected-access
+    urls = ['{}/{}'.format(URL, index) for index in range(3)]
+    for index, url in enumerate(urls):
+        page_cache.put(CacheEntry(url, content, '"x"', None, None))
+        os.utime(page_cache._path(url), (index, index))
+    page_cache.max_bytes = 3 * os.path.getsize(page_cache._path(urls[0]))
+    page_cache.get(urls[0])
+    page_cache.put(CacheEntry(URL, content, '"x"', None, None))
+    assert page_cache.get(urls[1]) is None
+    assert page_cache.get(urls[0]) is not None
+    assert page_cache.get(urls[2]) is not None
+    assert page_cache.get(URL) is not None
+
+
+def test_page_cache_concurrent_puts(page_cache, content):
+    # pylint: disable=protected-access
+    urls = ['{}/{}'.format(URL, index) for index in range(5)]
+    page_cache.put(CacheEntry(URL, content, '"x"', None, None))
+    page_cache.max_bytes = 2 * os.path.getsize(page_cache._path(URL))
+    entries = [CacheEntry(url, content, '"x"', None, None)
+               for url in urls * 40]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(page_cache.put, entries))
+    assert not [name for name in os.listdir(page_cache.directory)
+                if name.endswith('.tmp')]
+
+
+# -----------------------------------------------------------------------------
+# WebPageNote.from_url()
+# -----------------------------------------------------------------------------
+@mock.patch('ithoughtsshare.web_page.get_session')
+def test_from_url_stores_and_revalidates(mock_get_session, page_cache):
+    mock_get = mock_get_session.return_value.get
+    mock_get.return_value = FakeResponse(
+        headers={'ETag': '"v1"', 'Cache-Control': 'no-cache'},
+        body=b'<title>Cached</title><p>Body</p>')
+    first = WebPageNote.from_url(URL, cache=page_cache)
+    assert first.raw_title == 'Cached'
+    assert mock_get.call_args[1]['headers'] == {}
+
+    mock_get.return_value = FakeResponse(
+        status_code=304, headers={'Cache-Control': 'max-age=60'})
+    second = WebPageNote.from_url(URL, cache=page_cache)
+    assert second.body == first.body
+    assert second.bytes_read == 0
+    assert mock_get.call_args[1]['headers'] == {'If-None-Match': '"v1"'}
+
+    mock_get.reset_mock()
+    third = WebPageNote.from_url(URL, cache=page_cache)
+    assert third.body == first.body
+    assert not mock_get.called
+
+
+def test_from_url_replaces_modified_page(page_cache):
+    session = mock.Mock()
+    mock_get = session.get
+    mock_get.return_value = FakeResponse(
+        headers={'ETag': '"v1"'}, body=b'<title>Old</title>')
+    WebPageNote.from_url(URL, cache=page_cache, session=session)
+    mock_get.return_value = FakeResponse(
+        headers={'ETag': '"v2"'}, body=b'<title>New</title>')
+    note = WebPageNote.from_url(URL, cache=page_cache, session=session)
+    assert note.raw_title == 'New'
+    assert page_cache.get(URL).etag == '"v2"'
@@ -1,4 +1,5 @@
 # pylint: disable=missing-docstring,redefined-outer-name
+import inspect
 from unittest.mock import Mock
 
 import pytest
@@ -221,3 +222,130 @@ def test_to_cancel(state, state_dispatcher, canceler):
     state_dispatcher.next_state('CANCEL')
     assert not state_dispatcher.is_end
     assert state_dispatcher.is_canceled
+
+
+# -----------------------------------------------------------------------------
+# Handler factories
+# -----------------------------------------------------------------------------
+def test_default_handlers_are_not_created_up_front():
+    # Would fail outside of Pythonista if any of the views were loaded.
+    state_dispatcher = StateDispatcher()
+    assert state_dispatcher.current_state == State.start
+
+
+def test_handler_factory_called_on_first_entry(state_data, finisher):
+    state_dispatcher = StateDispatcher(state_data=state_data,
+                                       finisher=finisher)
+    map_adder = Mock(MapAdder)
+    factory = Mock(return_value=map_adder)
+    state_dispatcher.register_factory(State.add_mind_map, factory)
+    assert not factory.called
+
+    # pylint: disable=protected-access
+    state_dispatcher._current_state = State.pick_mind_map
+    state_dispatcher.next_state('ADD_MIND_MAP')
+    factory.assert_called_once_with()
+    map_adder.handle.assert_called_once_with(state_data,
+                                             state_dispatcher.next_state)
+
+    state_dispatcher._current_state = State.pick_mind_map
+    state_dispatcher.next_state('ADD_MIND_MAP')
+    factory.assert_called_once_with()
+    assert map_adder.handle.call_count == 2
+    assert state_dispatcher.handler(State.add_mind_map) is map_adder
+
+
+def test_register_factory_replaces_handler(state_dispatcher, map_adder):
+    assert state_dispatcher.handler(State.add_mind_map) is map_adder
+    other = Mock(MapAdder)
+    state_dispatcher.register_factory(State.add_mind_map, lambda: other)
+    assert state_dispatcher.handler(State.add_mind_map) is other
+
+
+# -----------------------------------------------------------------------------
+# Run loop
+# -----------------------------------------------------------------------------
+def stack_depth():
+    depth = 0
+    frame = inspect.currentframe()
+    while frame:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+class CountingHandler():
+    # pylint: disable=too-few-public-methods
+    def __init__(self, rounds):
+        self.rounds = rounds
+        self.depths = []
+
+    def handle(self, state_data, callback):
+        # pylint: disable=unused-argument
+        self.depths.append(stack_depth())
+        self.rounds -= 1
+        callback('FORWARD' if self.rounds > 0 else 'DONE')
+
+
+class LoopingDispatcher(StateDispatcher):
+    state_map = {
+        State.start: {'FORWARD': 'LOOP'},
+        'LOOP': {'FORWARD': 'LOOP', 'DONE': State.end},
+    }
+
+
+def test_synchronous_transitions_keep_stack_depth(state_data):
+    handler = CountingHandler(rounds=5000)
+    state_dispatcher = LoopingDispatcher(state_data=state_data,
+                                         finisher=Mock(Finisher))
+    state_dispatcher.register_factory('LOOP', lambda: handler)
+    assert state_dispatcher.run_until_end() == State.end
+    assert handler.rounds == 0
+    assert len(set(handler.depths)) == 1
+
+
+def test_run_until_end_full_flow(state_dispatcher, initializer, map_picker,
+                                 url_editor, note_editor,
+                                 ithoughts_dispatcher, finisher):
+    # pylint: disable=too-many-arguments
+    for handler in (initializer, map_picker, url_editor, note_editor,
+                    ithoughts_dispatcher):
+        handler.handle.reset_mock(side_effect=True)
+        handler.handle.side_effect = (
+            lambda state_data, callback: callback('FORWARD'))
+    finisher.handle.reset_mock(side_effect=True)
+    assert state_dispatcher.run_until_end() == State.end
+    assert ithoughts_dispatcher.handle.called
+    assert finisher.handle.called
+
+
+def test_run_until_end_stops_on_waiting_handler(state_dispatcher,
+                                                initializer, map_picker):
+    initializer.handle.side_effect = (
+        lambda state_data, callback: callback('FORWARD'))
+    map_picker.handle.reset_mock(side_effect=True)
+    with pytest.raises(RuntimeError) as exception:
+        state_dispatcher.run_until_end()
+    assert State.pick_mind_map in str(exception.value)
+
+
+def test_run_until_end_canceled(state_dispatcher, initializer, canceler):
+    initializer.handle.side_effect = (
+        lambda state_data, callback: callback('CANCEL'))
+    canceler.handle.reset_mock(side_effect=True)
+    assert state_dispatcher.run_until_end() == State.cancel
+    assert state_dispatcher.is_canceled
+
+
+def test_failing_handler_drops_queued_steps(state_dispatcher, initializer,
+                                            map_picker):
+    def handle(state_data, callback):
+        # pylint: disable=unused-argument
+        callback('FORWARD')
+        raise ValueError('Broken')
+
+    initializer.handle.side_effect = handle
+    with pytest.raises(ValueError):
+        state_dispatcher.next_state('FORWARD')
+    assert state_dispatcher.current_state == State.initialize
+    assert not map_picker.handle.called
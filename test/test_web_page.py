@@ -0,0 +1,218 @@
+# pylint: disable=missing-docstring,redefined-outer-name
+import threading
+from unittest import mock
+
+import pytest
+
+from ithoughtsshare.web_page import (
+    FetchCancelled,
+    PageExtractor,
+    PagePrefetch,
+    ResponseReader,
+    WebPageNote,
+)
+
+
+URL = 'https://example.com/article'
+
+
+# -----------------------------------------------------------------------------
+# Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def html():
+    return (
+        '<html><head>\n'
+        '  <title>\n  The <b>Title</b> \n</title>\n'
+        '  <style>p { color: red; }</style>\n'
+        '</head><body>\n'
+        '<p>First &amp; <a href="#">foremost</a>.</p>\n'
+        '<p>   </p>\n'
+        '<div><p>Second<script>var x = 1;</script> block\n</div>\n'
+        '<p>Third <!-- hidden --> block<br>with a break</p>\n'
+        '<p>Outer <p>nested</p> tail</p>\n'
+        '<p>Fifth</p>\n'
+        '<p>Sixth, should be ignored</p>\n'
+        '</body></html>')
+
+
+def chunked(string, size):
+    return [string[i:i + size] for i in range(0, len(string), size)]
+
+
+# -----------------------------------------------------------------------------
+# WebPageNote
+# -----------------------------------------------------------------------------
+def test_web_page_note_soup(html):
+    note = WebPageNote(URL, html)
+    assert note.url == URL
+    assert note.raw_title == 'The Title'
+    assert note.title == '# The Title'
+    assert note.body == (
+        '## The Title\n\n'
+        'First & foremost.\n\n'
+        'Second block\n\n'
+        'Third  blockwith a break\n\n'
+        'Outer nested tail\n\n'
+        'nested\n\n'
+        '_[quick link](https://example.com/article)_')
+
+
+@pytest.mark.parametrize('size', (1, 3, 64, 100000))
+def test_web_page_note_from_chunks_matches_soup(html, size):
+    expected = WebPageNote(URL, html)
+    sample = WebPageNote.from_chunks(URL, chunked(html, size))
+    assert sample.title == expected.title
+    assert sample.body == expected.body
+
+
+def test_web_page_note_from_chunks_stops_early(html):
+    consumed = []
+
+    def chunks():
+        for chunk in chunked(html, 16):
+            consumed.append(chunk)
+            yield chunk
+        raise AssertionError('Should have stopped before the end')
+
+    sample = WebPageNote.from_chunks(URL, chunks())
+    assert sample.body == WebPageNote(URL, html).body
+    assert len(''.join(consumed)) < len(html)
+
+
+def test_web_page_note_from_chunks_no_title():
+    sample = WebPageNote.from_chunks(URL, ['<p>Only text</p>'])
+    assert sample.title == '# '
+    assert 'Only text' in sample.body
+
+
+# -----------------------------------------------------------------------------
+# PageExtractor
+# -----------------------------------------------------------------------------
+def test_page_extractor_done():
+    extractor = PageExtractor(max_blocks=2)
+    extractor.feed('<title>T</title><p>one</p>')
+    assert not extractor.done
+    extractor.feed('<p></p><p>two')
+    assert not extractor.done
+    extractor.feed('</p><p>three</p>')
+    assert extractor.done
+    assert extractor.content == ('T', ('one', 'two'))
+
+
+def test_page_extractor_whitespace_only_strings():
+    extractor = PageExtractor()
+    extractor.feed('<title>a </title><p>x<b> \n\t</b>y<pre> \t </pre>z</p>')
+    extractor.close()
+    assert extractor.content == ('a', ('x\ny \t z',))
+
+
+# -----------------------------------------------------------------------------
+# ResponseReader
+# -----------------------------------------------------------------------------
+class FakeResponse():
+    # pylint: disable=too-few-public-methods
+    def __init__(self, body, encoding='utf-8'):
+        self.body = body
+        self.encoding = encoding
+        self.chunks_read = 0
+
+    def iter_content(self, chunk_size):
+        for index in range(0, len(self.body), chunk_size):
+            self.chunks_read += 1
+            yield self.body[index:index + chunk_size]
+
+
+def test_response_reader_decodes_split_characters():
+    response = FakeResponse('<title>Café ü</title>'.encode('utf-8'))
+    reader = ResponseReader(response, chunk_size=1)
+    assert ''.join(reader) == '<title>Café ü</title>'
+    assert reader.bytes_read == len(response.body)
+    assert not reader.truncated
+
+
+def test_response_reader_budget():
+    response = FakeResponse(b'x' * 1000)
+    reader = ResponseReader(response, max_bytes=250, chunk_size=100)
+    assert ''.join(reader) == 'x' * 250
+    assert reader.bytes_read == 250
+    assert reader.truncated
+    assert response.chunks_read == 3
+
+
+def test_response_reader_unknown_encoding():
+    response = FakeResponse(b'abc', encoding='no-such-encoding')
+    assert ''.join(ResponseReader(response)) == 'abc'
+
+
+def test_response_reader_cancel():
+    cancel = threading.Event()
+    reader = iter(ResponseReader(FakeResponse(b'x' * 100), chunk_size=10,
+                                 cancel=cancel))
+    assert next(reader) == 'x' * 10
+    cancel.set()
+    with pytest.raises(FetchCancelled):
+        next(reader)
+
+
+def test_web_page_note_from_response_stops_early(html):
+    response = FakeResponse((html + '<p>padding</p>' * 10000).encode('utf-8'))
+    note = WebPageNote.from_response(URL, response, chunk_size=64)
+    assert note.body == WebPageNote(URL, html).body
+    assert note.bytes_read < len(html) + 64
+    assert note.bytes_read == 64 * response.chunks_read
+    assert set(note.timings) == {'fetch', 'extract'}
+
+
+def test_web_page_note_from_response_budget(html):
+    response = FakeResponse(html.encode('utf-8'))
+    note = WebPageNote.from_response(URL, response, max_bytes=40)
+    assert note.bytes_read == 40
+    assert note.raw_title.startswith('The')
+    assert 'First' not in note.body
+
+
+# -----------------------------------------------------------------------------
+# PagePrefetch
+# -----------------------------------------------------------------------------
+@mock.patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_page_prefetch_result(mock_from_url):
+    prefetch = PagePrefetch.start(URL, cache='cache')
+    assert prefetch.url == URL
+    assert prefetch.result(timeout=5) is mock_from_url.return_value
+    assert mock_from_url.call_args[0] == (URL,)
+    assert mock_from_url.call_args[1]['cache'] == 'cache'
+
+
+@mock.patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_page_prefetch_error(mock_from_url):
+    mock_from_url.side_effect = IOError('Connection refused')
+    prefetch = PagePrefetch.start(URL)
+    with pytest.raises(IOError):
+        prefetch.result(timeout=5)
+
+
+@mock.patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_page_prefetch_cancel_before_start(mock_from_url):
+    prefetch = PagePrefetch(URL)
+    prefetch.cancel()
+    prefetch.run()
+    assert not mock_from_url.called
+
+
+@mock.patch('ithoughtsshare.web_page.WebPageNote.from_url')
+def test_page_prefetch_cancel_while_running(mock_from_url):
+    started = threading.Event()
+
+    def from_url(url, cancel=None):
+        # pylint: disable=unused-argument
+        started.set()
+        cancel.wait(5)
+        raise FetchCancelled()
+
+    mock_from_url.side_effect = from_url
+    prefetch = PagePrefetch.start(URL)
+    assert started.wait(5)
+    prefetch.cancel()
+    with pytest.raises(FetchCancelled):
+        prefetch.result(timeout=5)